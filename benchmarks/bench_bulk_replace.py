@@ -0,0 +1,70 @@
+"""
+Benchmark de bulk_replace_files.
+
+Genera un lote de contratos .docx y mide el reemplazo masivo con 1, 2, 4... procesos
+(hasta WORD_MCP_BULK_WORKERS, por defecto el numero de nucleos), informando archivos
+por segundo y la aceleracion respecto a un solo proceso. El arranque de los procesos
+no se mide. Uso:
+
+    python benchmarks/bench_bulk_replace.py [numero_de_archivos]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document  # noqa: E402
+
+from bulk import BULK_WORKERS, bulk_replace, expand_paths, process_pool  # noqa: E402
+
+PARAGRAPHS_PER_FILE = 500
+REPLACEMENTS = [
+    {"find": "ACME Corp", "replace": "Globex S.A."},
+    {"find": r"(\d+) USD", "replace": r"\1 EUR", "regex": True},
+]
+
+
+def make_files(directory: str, count: int) -> None:
+    for i in range(count):
+        document = Document()
+        for j in range(PARAGRAPHS_PER_FILE):
+            document.add_paragraph(f"Clausula {j}: ACME Corp pagara {j * 10} USD al cliente {i}.")
+        document.save(os.path.join(directory, f"contrato_{i:04d}.docx"))
+
+
+def main() -> int:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 48
+    cores = os.cpu_count() or 1
+    # Cada llamada usa como mucho BULK_WORKERS procesos del pool compartido
+    worker_counts = sorted({1, *[n for n in (2, 4, 8, 16, 32) if n <= BULK_WORKERS], BULK_WORKERS})
+
+    root = tempfile.mkdtemp(prefix="bench-bulk-")
+    try:
+        source = os.path.join(root, "in")
+        os.makedirs(source)
+        make_files(source, count)
+        paths = expand_paths(os.path.join(source, "*.docx"))
+
+        print(f"{count} archivos, {PARAGRAPHS_PER_FILE} parrafos por archivo, {cores} nucleos")
+        print(f"{'procesos':>10} {'segundos':>10} {'archivos/s':>12} {'aceleracion':>12}")
+        baseline = None
+        # Arrancar el pool antes de medir
+        list(process_pool().map(abs, range(BULK_WORKERS)))
+        for workers in worker_counts:
+            output = os.path.join(root, f"out{workers}")
+            start = time.perf_counter()
+            results = bulk_replace(paths, REPLACEMENTS, output_dir=output, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            assert all(result["error"] is None and result["total"] for result in results)
+            baseline = baseline or elapsed
+            print(f"{workers:>10} {elapsed:>10.2f} {count / elapsed:>12.1f} {baseline / elapsed:>11.2f}x")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
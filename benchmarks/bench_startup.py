@@ -0,0 +1,125 @@
+"""
+Benchmark del arranque en frio del servidor.
+
+Cada medicion lanza un interprete nuevo (como hace un host que arranca un servidor
+stdio por conversacion) y mide el tiempo de importar server.py, el del primer
+documento (create_new_document + add_paragraph) y el total del proceso. Tambien
+comprueba que las dependencias pesadas de imagenes no se cargan al arrancar.
+
+El presupuesto se deriva de una linea base medida en la misma maquina (mediana mas la
+tolerancia) y el programa termina con codigo 1 si la mediana de importacion o del
+primer documento lo supera. Uso:
+
+    python benchmarks/bench_startup.py --save-baseline   # medir y guardar la linea base
+    python benchmarks/bench_startup.py [--runs 10]       # comparar con ella
+    python benchmarks/bench_startup.py --budget-ms 900   # presupuesto fijo para la importacion
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "startup_baseline.json")
+
+# Regresion admitida sobre la mediana de la linea base, mas un margen fijo para el ruido
+DEFAULT_TOLERANCE = 0.15
+NOISE_MS = 30
+
+# Medidas comparadas con la linea base
+BUDGETED = ("import_ms", "first_document_ms")
+
+# Modulos que solo deben cargarse cuando se usan imagenes
+LAZY_MODULES = ("cv2", "numpy")
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import server
+imported = time.perf_counter()
+server.create_new_document()
+server.add_paragraph("Primer parrafo")
+ready = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1e3,
+    "first_document_ms": (ready - imported) * 1e3,
+    "eager_modules": [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def measure(data_dir: str) -> dict:
+    env = dict(os.environ, WORD_MCP_DATA_DIR=data_dir, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, cwd=data_dir, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - start) * 1e3
+    return result
+
+
+def budgets(args) -> dict:
+    """Presupuesto (ms) de cada medida: fijo con --budget-ms o derivado de la linea base"""
+    if args.budget_ms is not None:
+        return {"import_ms": args.budget_ms}
+    if not os.path.exists(args.baseline):
+        return {}
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    return {key: baseline[key] * (1 + args.tolerance) + NOISE_MS for key in BUDGETED if key in baseline}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="numero de arranques medidos")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="archivo JSON de la linea base")
+    parser.add_argument("--save-baseline", action="store_true", help="guardar las medianas como nueva linea base")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="regresion admitida (0.15 = 15%%)")
+    parser.add_argument("--budget-ms", type=float, help="presupuesto fijo para la mediana de importacion (sin linea base)")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="bench-startup-")
+    try:
+        # El primer arranque calienta la cache de bytecode y del sistema de archivos
+        measure(data_dir)
+        runs = [measure(data_dir) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    medians = {key: statistics.median(run[key] for run in runs) for key in ("import_ms", "first_document_ms", "process_ms")}
+    print(f"{'medida':<22} {'mediana ms':>12} {'max ms':>10}")
+    for key, median in medians.items():
+        print(f"{key[:-3]:<22} {median:>12.1f} {max(run[key] for run in runs):>10.1f}")
+
+    failed = False
+    eager = sorted({name for run in runs for name in run["eager_modules"]})
+    if eager:
+        print(f"Modulos cargados al arrancar que deberian cargarse bajo demanda: {', '.join(eager)}")
+        failed = True
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(dict(medians, runs=args.runs, python=sys.version.split()[0]), f, indent=2)
+        print(f"Linea base guardada en {args.baseline}")
+        return 1 if failed else 0
+
+    limits = budgets(args)
+    if not limits:
+        print(f"No hay linea base en {args.baseline}; creela con --save-baseline")
+    for key, limit in limits.items():
+        if medians[key] > limit:
+            print(f"{key[:-3]} ({medians[key]:.1f} ms) supera el presupuesto de {limit:.0f} ms")
+            failed = True
+        else:
+            print(f"{key[:-3]} dentro del presupuesto de {limit:.0f} ms")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
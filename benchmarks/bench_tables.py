@@ -0,0 +1,56 @@
+"""
+Benchmark del constructor de tablas en bloque.
+
+Mide create_simple_table_with_data con tablas de 20 columnas desde 1.000 hasta
+100.000 celdas y comprueba que el coste por celda se mantiene constante
+(escalado lineal). Uso:
+
+    python benchmarks/bench_tables.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+COLS = 20
+CELL_COUNTS = [1_000, 10_000, 50_000, 100_000]
+
+# Tolerancia del coste por celda en la tabla mas grande respecto a la mas pequena
+MAX_PER_CELL_RATIO = 3.0
+
+
+def run_case(cells: int) -> float:
+    rows = cells // COLS
+    headers = [f"col{c}" for c in range(COLS)]
+    data = [[f"r{r}c{c}" for c in range(COLS)] for r in range(rows)]
+    server.create_new_document()
+
+    start = time.perf_counter()
+    table_id = server.create_simple_table_with_data(headers, data, alignments=["RIGHT"] * COLS, font_size=9)
+    elapsed = time.perf_counter() - start
+
+    assert len(server.live_objects.get(table_id).rows) == rows + 1
+    return elapsed
+
+
+def main() -> int:
+    per_cell = []
+    print(f"{'celdas':>10} {'segundos':>10} {'us/celda':>10}")
+    for cells in CELL_COUNTS:
+        elapsed = run_case(cells)
+        per_cell.append(elapsed / cells)
+        print(f"{cells:>10} {elapsed:>10.3f} {elapsed / cells * 1e6:>10.2f}")
+
+    ratio = per_cell[-1] / per_cell[0]
+    print(f"coste por celda {CELL_COUNTS[-1]} vs {CELL_COUNTS[0]}: x{ratio:.2f}")
+    if ratio > MAX_PER_CELL_RATIO:
+        print(f"FALLO: el escalado no es lineal (limite x{MAX_PER_CELL_RATIO})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Prueba de carga del servidor con transporte HTTP.
+
+Arranca el servidor (streamable HTTP o SSE) en un puerto libre y lanza N clientes
+simulados a la vez. Cada cliente abre su propia sesion, crea un documento, agrega
+parrafos y una tabla, busca su propio texto y guarda el archivo. Se informan las
+latencias por llamada, el throughput total y los errores, y se comprueba que cada
+sesion solo ve sus propios documentos. Uso:
+
+    python benchmarks/load_test.py --clients 16 --paragraphs 100
+    python benchmarks/load_test.py --url http://127.0.0.1:8000/mcp   # servidor ya arrancado
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from mcp import ClientSession  # noqa: E402
+from mcp.client.sse import sse_client  # noqa: E402
+from mcp.client.streamable_http import streamable_http_client  # noqa: E402
+
+TABLE_ROWS = 20
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def start_server(transport: str, port: int, data_dir: str) -> subprocess.Popen:
+    env = dict(os.environ, WORD_MCP_DATA_DIR=data_dir)
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "server.py"), "--transport", transport, "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El servidor termino al arrancar (codigo {process.returncode})")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("El servidor no respondio en 30 s")
+
+
+def _connect(transport: str, url: str):
+    return sse_client(url) if transport == "sse" else streamable_http_client(url)
+
+
+async def _call(session: ClientSession, latencies: List[float], name: str, arguments: Dict):
+    start = time.perf_counter()
+    result = await session.call_tool(name, arguments)
+    latencies.append(time.perf_counter() - start)
+    text = result.content[0].text if result.content else ""
+    if result.isError or text.startswith(("Error", "No se encontro")):
+        raise RuntimeError(f"{name}: {text}")
+    return result
+
+
+async def run_client(n: int, transport: str, url: str, paragraphs: int, output_dir: str) -> Dict:
+    latencies: List[float] = []
+    report = {"client": n, "calls": 0, "errors": [], "isolated": True, "latencies": latencies}
+    marker = f"cliente{n:04d}"
+    try:
+        async with _connect(transport, url) as streams:
+            async with ClientSession(streams[0], streams[1]) as session:
+                await session.initialize()
+                await _call(session, latencies, "create_new_document", {})
+                await _call(session, latencies, "add_heading", {"content": f"Informe {marker}", "level": 1})
+                for j in range(paragraphs):
+                    await _call(session, latencies, "add_paragraph", {"content": f"{marker} parrafo {j} de la prueba de carga"})
+                rows = [[marker, str(i), str(i * n)] for i in range(TABLE_ROWS)]
+                await _call(session, latencies, "create_simple_table_with_data",
+                            {"headers": ["Cliente", "Fila", "Valor"], "data": rows})
+
+                # Cada sesion solo debe ver su propio documento
+                # (el prefijo comun de las marcas detectaria parrafos de cualquier otro cliente)
+                found = await _call(session, latencies, "search_document", {"query": "cliente0", "limit": 1})
+                listed = await _call(session, latencies, "list_documents", {})
+                # Documento en blanco inicial de la sesion + el creado por el cliente
+                if json.loads(found.content[0].text)["total"] != 1 + paragraphs + TABLE_ROWS \
+                        or len(listed.structuredContent["result"]) != 2:
+                    report["isolated"] = False
+
+                await _call(session, latencies, "save_file", {"filename": os.path.join(output_dir, f"{marker}.docx")})
+    except Exception as e:
+        # Los errores dentro de los grupos de tareas del cliente llegan envueltos
+        while isinstance(e, BaseExceptionGroup) and len(e.exceptions) == 1:
+            e = e.exceptions[0]
+        report["errors"].append(f"{type(e).__name__}: {e}")
+    report["calls"] = len(latencies)
+    return report
+
+
+async def run(args) -> int:
+    output_dir = tempfile.mkdtemp(prefix="load-test-out-")
+    try:
+        start = time.perf_counter()
+        reports = await asyncio.gather(*(
+            run_client(n, args.transport, args.url, args.paragraphs, output_dir) for n in range(args.clients)
+        ))
+        elapsed = time.perf_counter() - start
+        written = len(os.listdir(output_dir))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    latencies = [value * 1e3 for report in reports for value in report["latencies"]]
+    calls = sum(report["calls"] for report in reports)
+    errors = [error for report in reports for error in report["errors"]]
+    leaks = [report["client"] for report in reports if not report["isolated"]]
+
+    print(f"{args.clients} clientes ({args.transport}), {args.paragraphs} parrafos por cliente")
+    print(f"llamadas: {calls}   tiempo: {elapsed:.2f} s   throughput: {calls / elapsed:.1f} llamadas/s")
+    print(f"latencia ms: p50 {_percentile(latencies, 50):.2f}   p95 {_percentile(latencies, 95):.2f}   "
+          f"p99 {_percentile(latencies, 99):.2f}   max {max(latencies, default=0):.2f}")
+    print(f"documentos guardados: {written}/{args.clients}   errores: {len(errors)}   "
+          f"sesiones no aisladas: {len(leaks)}")
+    for error in errors[:10]:
+        print(f"  {error}")
+    return 1 if errors or leaks or written != args.clients else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8, help="clientes simultaneos")
+    parser.add_argument("--paragraphs", type=int, default=50, help="parrafos que agrega cada cliente")
+    parser.add_argument("--transport", choices=["streamable-http", "sse"], default="streamable-http")
+    parser.add_argument("--url", help="servidor ya arrancado (por defecto se arranca uno en un puerto libre)")
+    args = parser.parse_args()
+
+    process = data_dir = None
+    if not args.url:
+        port = _free_port()
+        data_dir = tempfile.mkdtemp(prefix="load-test-")
+        process = start_server(args.transport, port, data_dir)
+        args.url = f"http://127.0.0.1:{port}" + ("/sse" if args.transport == "sse" else "/mcp")
+    try:
+        return asyncio.run(run(args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,408 @@
+"""
+Suite de benchmarks de las herramientas del servidor.
+
+Llama directamente a las funciones de server.py con cargas sinteticas a escala de
+produccion (10.000 parrafos, tablas de 1.000x50, 500 imagenes, 10.000 recursos,
+prompts de 1.000 variables, un informe Markdown de 100 paginas, la combinacion de
+100 documentos, un CSV de 100.000 filas, 100 imagenes sin optimizar) e informa, por
+operacion, percentiles de latencia y throughput, y por escenario el pico de memoria
+(RSS). Cada escenario se ejecuta en un proceso propio para que la memoria y las
+caches de uno no afecten a los demas.
+
+Los resultados se guardan en JSON y se comparan con una linea base: si una operacion
+es mas lenta o un escenario usa mas memoria que la linea base mas la tolerancia, el
+programa termina con codigo 1. Uso:
+
+    python benchmarks/run_benchmarks.py --save-baseline     # crear la linea base
+    python benchmarks/run_benchmarks.py                     # comparar con ella
+    python benchmarks/run_benchmarks.py --scale 0.1 --scenario paragraphs tables
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+DEFAULT_OUTPUT = os.path.join(ROOT, "benchmarks", "results.json")
+
+# Tolerancia por defecto antes de considerar una regresion (0.25 = 25% peor)
+DEFAULT_TOLERANCE = 0.25
+
+# Latencias por debajo de este valor (ms) se consideran ruido al comparar
+MIN_COMPARABLE_MS = 0.05
+
+
+def _rss_mb() -> float:
+    # ru_maxrss esta en KB en Linux y en bytes en macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], items_per_call: int = 1) -> Dict:
+    """Resumen de una lista de latencias en segundos"""
+    total = sum(latencies)
+    return {
+        "calls": len(latencies),
+        "mean_ms": total / len(latencies) * 1e3,
+        "p50_ms": _percentile(latencies, 50) * 1e3,
+        "p95_ms": _percentile(latencies, 95) * 1e3,
+        "p99_ms": _percentile(latencies, 99) * 1e3,
+        "max_ms": max(latencies) * 1e3,
+        "throughput_per_s": len(latencies) * items_per_call / total if total else None,
+    }
+
+
+def timed(function: Callable, calls, items_per_call: int = 1) -> Dict:
+    """Llamar a function con cada elemento de calls (tupla de argumentos) midiendo cada llamada"""
+    latencies = []
+    for args in calls:
+        start = time.perf_counter()
+        result = function(*args)
+        latencies.append(time.perf_counter() - start)
+        if isinstance(result, str) and result.startswith("Error"):
+            raise RuntimeError(result)
+    return summarize(latencies, items_per_call)
+
+
+# Escenarios: cada uno recibe el modulo server, la escala y un directorio temporal
+
+
+def scenario_paragraphs(server, scale: float, tmp: str) -> Dict:
+    count = max(1, int(10_000 * scale))
+    server.create_new_document()
+    ops = {
+        "add_paragraph": timed(
+            server.add_paragraph, ((f"Parrafo {i} con texto de ejemplo para el benchmark.",) for i in range(count))
+        )
+    }
+    handles = [server.add_paragraph(f"Parrafo con formato {i}. ") for i in range(max(1, count // 10))]
+    ops["add_run_to_paragraph"] = timed(
+        lambda p: server.add_run_to_paragraph(p, "texto en negrita", bold=True, color="blue"),
+        ((p,) for p in handles),
+    )
+    ops["search_document"] = timed(server.search_document, [("texto de ejemplo",)] * 20)
+    ops["save_file"] = timed(server.save_file, [(os.path.join(tmp, f"parrafos_{i}.docx"),) for i in range(5)])
+    return ops
+
+
+def scenario_tables(server, scale: float, tmp: str) -> Dict:
+    rows, cols = max(1, int(1_000 * scale)), 50
+    headers = [f"Columna {c}" for c in range(cols)]
+    data = [[f"f{r}c{c}" for c in range(cols)] for r in range(rows)]
+
+    def build():
+        server.create_new_document()
+        return server.create_simple_table_with_data(headers, data, alignments=["RIGHT"] * cols)
+
+    ops = {"create_simple_table_with_data": timed(build, [()] * 3, items_per_call=rows * cols)}
+    ops["save_file"] = timed(server.save_file, [(os.path.join(tmp, f"tabla_{i}.docx"),) for i in range(3)])
+    return ops
+
+
+def scenario_images(server, scale: float, tmp: str) -> Dict:
+    import cv2
+    import numpy as np
+
+    count = max(1, int(500 * scale))
+    rng = np.random.default_rng(0)
+    images = []
+    for i in range(count):
+        # Imagenes distintas de 1600x1200 (se reducen a 750 px de ancho a 150 dpi)
+        img = np.full((1200, 1600, 3), (i * 7 % 256, i * 13 % 256, i * 29 % 256), dtype=np.uint8)
+        img[::37, :, :] = rng.integers(0, 256, size=(1, 1600, 3), dtype=np.uint8)
+        images.append(cv2.imencode(".png", img)[1].tobytes())
+
+    server.create_new_document()
+    ops = {"add_picture": timed(server.add_picture, ((image,) for image in images))}
+    ops["save_file"] = timed(server.save_file, [(os.path.join(tmp, f"imagenes_{i}.docx"),) for i in range(2)])
+    return ops
+
+
+def scenario_resources(server, scale: float, tmp: str) -> Dict:
+    count = max(1, int(10_000 * scale))
+    ops = {
+        "save_resource": timed(
+            server.save_resource, ((f"recurso_{i:05d}", {"indice": i, "texto": "x" * 200}) for i in range(count))
+        ),
+        "get_resource": timed(server.get_resource, ((f"recurso_{i:05d}",) for i in range(count))),
+        "list_resources": timed(server.list_resources, [("recurso_", 100)] * 50),
+    }
+    batch = {f"lote_{i:05d}": f"contenido {i}" for i in range(count)}
+    ops["save_resources"] = timed(server.save_resources, [(batch,)], items_per_call=count)
+    return ops
+
+
+def scenario_prompts(server, scale: float, tmp: str) -> Dict:
+    variables = 1_000
+    renders = max(1, int(1_000 * scale))
+    template = " ".join(f"Campo {i}: {{var{i}}}." for i in range(variables))
+    values = {f"var{i}": f"valor {i}" for i in range(variables)}
+    server.save_prompt("benchmark", template)
+    return {
+        "render_prompt": timed(server.render_prompt, [("benchmark", values)] * renders),
+        "render_prompt_batch": timed(
+            server.render_prompt_batch, [("benchmark", [values] * 100)] * max(1, renders // 100), items_per_call=100
+        ),
+    }
+
+
+def sample_report(sections: int) -> str:
+    """Informe Markdown sintetico: unas 60 secciones equivalen a unas 100 paginas"""
+    parts = []
+    for s in range(sections):
+        parts.append(f"## Seccion {s}\n")
+        for p in range(8):
+            parts.append(
+                f"Parrafo {p} de la seccion {s} con **texto en negrita**, *cursiva*, `codigo` y un "
+                f"[enlace](https://example.com/{s}). " + "Texto de relleno para ocupar la pagina. " * 6 + "\n"
+            )
+        parts.append("".join(f"- Punto {i} con *detalle*\n" for i in range(5)))
+        parts.append("".join(f"{i + 1}. Paso {i}\n" for i in range(4)) + "   1. Subpaso\n")
+        parts.append("| Metrica | Valor | Cambio |\n|:--|--:|:-:|\n")
+        parts.append("".join(f"| fila {r} | {r * 1000} | +{r}% |\n" for r in range(8)))
+    return "\n".join(parts)
+
+
+def scenario_markdown(server, scale: float, tmp: str) -> Dict:
+    report = sample_report(max(1, int(60 * scale)))
+
+    def build():
+        server.create_new_document()
+        return server.add_markdown(report)
+
+    ops = {"add_markdown": timed(build, [()] * 5)}
+    ops["save_file"] = timed(server.save_file, [(os.path.join(tmp, f"informe_{i}.docx"),) for i in range(3)])
+    return ops
+
+
+def scenario_merge(server, scale: float, tmp: str) -> Dict:
+    chapters = []
+    for i in range(max(2, int(100 * scale))):
+        server.create_new_document()
+        server.add_markdown(sample_report(2))
+        chapters.append(os.path.join(tmp, f"capitulo_{i}.docx"))
+        server.save_file(chapters[-1])
+
+    def merge():
+        server.create_new_document()
+        return server.merge_documents(chapters)
+
+    ops = {"merge_documents": timed(merge, [()] * 3)}
+    ops["save_file"] = timed(server.save_file, [(os.path.join(tmp, f"libro_{i}.docx"),) for i in range(3)])
+    return ops
+
+
+def scenario_import(server, scale: float, tmp: str) -> Dict:
+    rows = max(1, int(100_000 * scale))
+    path = os.path.join(tmp, "datos.csv")
+    with open(path, "w") as f:
+        f.write("id,cliente,monto,cantidad,precio\n")
+        f.writelines(f"{i},Cliente {i % 977},{(i * 7919) % 2_000_000 - 1_000_000}.{i % 1000:03d},{i % 10_000},{i % 997}.5\n" for i in range(rows))
+
+    def build(create):
+        create()
+        return server.import_table(path, repeat_header=True)
+
+    ops = {
+        "import_table": timed(build, [(server.create_new_document,)] * 3, items_per_call=rows),
+        "import_table_streaming": timed(build, [(server.create_streaming_document,)] * 3, items_per_call=rows),
+    }
+    return ops
+
+
+def scenario_media(server, scale: float, tmp: str) -> Dict:
+    import cv2
+    import numpy as np
+    from docx import Document
+    from docx.shared import Inches
+
+    count = max(2, int(100 * scale))
+    rng = np.random.default_rng(0)
+    document = Document()
+    for i in range(count):
+        # Capturas de 2400x1600 guardadas sin comprimir y mostradas a 4 pulgadas
+        img = np.full((1600, 2400, 3), (i * 7 % 256, i * 13 % 256, i * 29 % 256), dtype=np.uint8)
+        img[::37, :, :] = rng.integers(0, 256, size=(1, 2400, 3), dtype=np.uint8)
+        path = os.path.join(tmp, f"captura_{i}.png")
+        cv2.imwrite(path, img, [cv2.IMWRITE_PNG_COMPRESSION, 0])
+        document.add_picture(path, width=Inches(4))
+    source = os.path.join(tmp, "pesado.docx")
+    document.save(source)
+    del document
+
+    def optimize():
+        # Solo un documento abierto a la vez: el pico de memoria es el de una optimizacion
+        for entry in server.list_documents():
+            server.close_document(entry["doc_id"])
+        server.open_document(source)
+        return server.optimize_media()
+
+    ops = {"optimize_media": timed(optimize, [()] * 3, items_per_call=count)}
+    ops["save_file"] = timed(server.save_file, [(os.path.join(tmp, f"ligero_{i}.docx"),) for i in range(2)])
+    return ops
+
+
+SCENARIOS = {
+    "paragraphs": scenario_paragraphs,
+    "tables": scenario_tables,
+    "images": scenario_images,
+    "resources": scenario_resources,
+    "prompts": scenario_prompts,
+    "markdown": scenario_markdown,
+    "merge": scenario_merge,
+    "import": scenario_import,
+    "media": scenario_media,
+}
+
+
+def run_scenario(name: str, scale: float) -> Dict:
+    """Ejecutar un escenario en este proceso (llamado desde el subproceso)"""
+    tmp = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    # Recursos y prompts del benchmark en un directorio temporal, no en el del servidor
+    os.environ["WORD_MCP_DATA_DIR"] = tmp
+    try:
+        import server
+
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        ops = SCENARIOS[name](server, scale, tmp)
+        wall = time.perf_counter() - start
+        return {
+            "wall_s": wall,
+            "peak_rss_mb": _rss_mb(),
+            "rss_growth_mb": _rss_mb() - rss_before,
+            "operations": ops,
+        }
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def run_in_subprocess(name: str, scale: float) -> Dict:
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", name, "--scale", str(scale)],
+        capture_output=True, text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"El escenario '{name}' fallo:\n{process.stderr}")
+    return json.loads(process.stdout)
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Lista de regresiones respecto a la linea base"""
+    regressions = []
+    if baseline.get("scale") != results.get("scale"):
+        return [f"la escala ({results.get('scale')}) no coincide con la de la linea base ({baseline.get('scale')})"]
+    for name, scenario in results["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        limit = base["rss_growth_mb"] * (1 + tolerance) + 10
+        if scenario["rss_growth_mb"] > limit:
+            regressions.append(
+                f"{name}: memoria {scenario['rss_growth_mb']:.1f} MB > {base['rss_growth_mb']:.1f} MB de la linea base"
+            )
+        for op, stats in scenario["operations"].items():
+            base_stats = base["operations"].get(op)
+            if base_stats is None:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                reference = max(base_stats[metric], MIN_COMPARABLE_MS)
+                if stats[metric] > reference * (1 + tolerance):
+                    regressions.append(
+                        f"{name}.{op}: {metric} {stats[metric]:.3f} ms > {base_stats[metric]:.3f} ms de la linea base "
+                        f"(x{stats[metric] / reference:.2f})"
+                    )
+    return regressions
+
+
+def print_report(results: Dict) -> None:
+    print(f"{'operacion':<44} {'llamadas':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ops/s':>12}")
+    for name, scenario in results["scenarios"].items():
+        for op, stats in scenario["operations"].items():
+            throughput = stats["throughput_per_s"] or 0
+            print(f"{name + '.' + op:<44} {stats['calls']:>8} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} "
+                  f"{stats['p99_ms']:>10.3f} {throughput:>12.1f}")
+        print(f"{name + ' (memoria)':<44} pico {scenario['peak_rss_mb']:.1f} MB, "
+              f"crecimiento {scenario['rss_growth_mb']:.1f} MB, {scenario['wall_s']:.1f} s")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", nargs="*", choices=sorted(SCENARIOS), help="escenarios a ejecutar (todos por defecto)")
+    parser.add_argument("--scale", type=float, default=1.0, help="factor sobre el tamano de las cargas (por defecto 1)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="archivo JSON de resultados")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="archivo JSON de la linea base")
+    parser.add_argument("--save-baseline", action="store_true", help="guardar los resultados como nueva linea base")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="regresion admitida (0.25 = 25%%)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, args.scale)))
+        return 0
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "scale": args.scale,
+        "scenarios": {},
+    }
+    for name in args.scenario or list(SCENARIOS):
+        print(f"Ejecutando {name}...", file=sys.stderr)
+        results["scenarios"][name] = run_in_subprocess(name, args.scale)
+
+    print_report(results)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Resultados guardados en {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Linea base guardada en {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No hay linea base en {args.baseline}; creela con --save-baseline")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nREGRESIONES ({len(regressions)}) respecto a {args.baseline}:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print(f"Sin regresiones respecto a {args.baseline} (tolerancia {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import glob
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from docx import Document
+
+from saving import atomic_save
+from search import compile_query, replace_matches, scan, text_roots
+
+# Numero de procesos para operaciones sobre muchos archivos, configurable por entorno
+BULK_WORKERS = int(os.environ.get("WORD_MCP_BULK_WORKERS", "0")) or os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def process_pool() -> ProcessPoolExecutor:
+    """
+    Pool de procesos compartido de BULK_WORKERS procesos, creado la primera vez que se
+    necesita y reutilizado entre llamadas (arrancar los procesos cuesta mas que procesar
+    un archivo pequeno). Se usa spawn para que los procesos no hereden los hilos ni el
+    estado del servidor. Si un proceso de trabajo muere, el pool se descarta y la
+    siguiente llamada crea uno nuevo.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=BULK_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def worker_count(max_workers: Optional[int]) -> int:
+    """Procesos que usa una llamada: max_workers (por defecto BULK_WORKERS), como mucho BULK_WORKERS"""
+    return max(1, min(max_workers or BULK_WORKERS, BULK_WORKERS))
+
+
+def run_tasks(fn: Callable, tasks: Iterable[tuple], max_workers: int = None) -> Iterator[Future]:
+    """
+    Ejecutar fn(*tarea) para cada tarea y devolver los futures ya terminados, en el
+    orden de las tareas (future.result() da el resultado o relanza el error).
+
+    Las tareas van al pool compartido y cada llamada tiene como mucho dos tareas
+    pendientes por proceso (worker_count(max_workers)), de modo que la memoria no crece
+    con el numero de tareas y las llamadas simultaneas se reparten el pool. Con un solo
+    proceso las tareas se ejecutan en este, sin pool.
+    """
+    workers = worker_count(max_workers)
+    if workers <= 1:
+        for task in tasks:
+            future = Future()
+            try:
+                future.set_result(fn(*task))
+            except Exception as e:
+                future.set_exception(e)
+            yield future
+        return
+
+    pool = process_pool()
+
+    def finished(future: Future) -> Future:
+        if isinstance(future.exception(), BrokenProcessPool):
+            _discard_pool(pool)
+        return future
+
+    pending = deque()
+    for task in tasks:
+        try:
+            pending.append(pool.submit(fn, *task))
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            raise
+        if len(pending) >= workers * 2:
+            yield finished(pending.popleft())
+    while pending:
+        yield finished(pending.popleft())
+
+
+def expand_paths(pattern: str) -> List[str]:
+    """Archivos .docx que coinciden con el patron glob (se ignoran los temporales ~$ de Word)"""
+    paths = glob.glob(os.path.expanduser(pattern), recursive=True)
+    return sorted(
+        path for path in paths
+        if path.endswith(".docx") and os.path.isfile(path) and not os.path.basename(path).startswith("~$")
+    )
+
+
+def output_path(path: str, base_dir: str, output_dir: Optional[str]) -> str:
+    """Ruta de salida conservando la estructura relativa a base_dir (el mismo archivo si no hay output_dir)"""
+    if not output_dir:
+        return path
+    return os.path.join(output_dir, os.path.relpath(path, base_dir))
+
+
+def compile_replacements(replacements: List[Dict]) -> List[tuple]:
+    """Validar y compilar [{"find", "replace", "regex", "case_sensitive", "whole_word"}, ...]"""
+    compiled = []
+    for i, spec in enumerate(replacements):
+        if not spec.get("find"):
+            raise ValueError(f"El reemplazo {i} no tiene 'find'")
+        regex = bool(spec.get("regex", False))
+        pattern, _ = compile_query(
+            spec["find"], regex, spec.get("case_sensitive", True), spec.get("whole_word", False)
+        )
+        compiled.append((pattern, str(spec.get("replace", "")), regex))
+    return compiled
+
+
+def replace_in_document(document, replacements: List[tuple]) -> List[int]:
+    """Aplicar los reemplazos en orden al cuerpo, encabezados y pies; retorna el conteo de cada uno"""
+    roots = text_roots(document)
+    counts = []
+    for pattern, replace, regex in replacements:
+        counts.append(sum(
+            sum(replace_matches(scan(root, pattern), replace, regex).values()) for root in roots
+        ))
+    return counts
+
+
+def replace_in_file(path: str, target: str, replacements: List[tuple], dry_run: bool = False) -> Dict:
+    """Procesar un archivo (se ejecuta en un proceso de trabajo); los errores se devuelven, no se lanzan"""
+    result = {"path": path, "output": None, "matches": [], "total": 0, "error": None}
+    try:
+        document = Document(path)
+        result["matches"] = replace_in_document(document, replacements)
+        result["total"] = sum(result["matches"])
+        # Los archivos sin coincidencias no se reescriben
+        if result["total"] and not dry_run:
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            atomic_save(document, target)
+            result["output"] = target
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def bulk_replace(paths: List[str], replacements: List[Dict], output_dir: str = None,
+                 max_workers: int = None, dry_run: bool = False) -> List[Dict]:
+    """
+    Aplicar los reemplazos a cada archivo, un documento por proceso de trabajo.
+    Los resultados se devuelven en el mismo orden que paths.
+    """
+    compiled = compile_replacements(replacements)
+    if not paths:
+        return []
+    base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    tasks = [
+        (path, output_path(os.path.abspath(path), base_dir, output_dir), compiled, dry_run)
+        for path in paths
+    ]
+
+    workers = 1 if len(tasks) == 1 else max_workers
+    return [future.result() for future in run_tasks(replace_in_file, tasks, workers)]
@@ -1,36 +1,130 @@
+import weakref
+from copy import deepcopy
+
+from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_COLOR_INDEX
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.shared import RGBColor
+
+# Colores soportados: indice de resaltado y color RGB equivalente para el texto
+COLORS = {
+    'black': (WD_COLOR_INDEX.BLACK, RGBColor(0x00, 0x00, 0x00)),
+    'blue': (WD_COLOR_INDEX.BLUE, RGBColor(0x00, 0x00, 0xFF)),
+    'green': (WD_COLOR_INDEX.BRIGHT_GREEN, RGBColor(0x00, 0xFF, 0x00)),
+    'dark blue': (WD_COLOR_INDEX.DARK_BLUE, RGBColor(0x00, 0x00, 0x80)),
+    'dark red': (WD_COLOR_INDEX.DARK_RED, RGBColor(0x80, 0x00, 0x00)),
+    'dark yellow': (WD_COLOR_INDEX.DARK_YELLOW, RGBColor(0x80, 0x80, 0x00)),
+    'dark green': (WD_COLOR_INDEX.GREEN, RGBColor(0x00, 0x80, 0x00)),
+    'pink': (WD_COLOR_INDEX.PINK, RGBColor(0xFF, 0x00, 0xFF)),
+    'red': (WD_COLOR_INDEX.RED, RGBColor(0xFF, 0x00, 0x00)),
+    'white': (WD_COLOR_INDEX.WHITE, RGBColor(0xFF, 0xFF, 0xFF)),
+    'teal': (WD_COLOR_INDEX.TEAL, RGBColor(0x00, 0x80, 0x80)),
+    'yellow': (WD_COLOR_INDEX.YELLOW, RGBColor(0xFF, 0xFF, 0x00)),
+    'violet': (WD_COLOR_INDEX.VIOLET, RGBColor(0x80, 0x00, 0x80)),
+    'gray25': (WD_COLOR_INDEX.GRAY_25, RGBColor(0xC0, 0xC0, 0xC0)),
+    'gray50': (WD_COLOR_INDEX.GRAY_50, RGBColor(0x80, 0x80, 0x80)),
+}
+
+
+def _lookup_color(color: str):
+    try:
+        return COLORS[color]
+    except KeyError:
+        raise ValueError(f"Color no soportado: {color}") from None
+
 
 def color_paragraph(paragraph, color:str):
-    # Get the style of the paragraph
-    if color == 'black':
-        color_element = WD_COLOR_INDEX.BLACK
-    elif color == 'blue':
-        color_element = WD_COLOR_INDEX.BLUE
-    elif color == 'green':
-        color_element = WD_COLOR_INDEX.BRIGHT_GREEN
-    elif color == 'dark blue':
-        color_element = WD_COLOR_INDEX.DARK_BLUE
-    elif color == 'dark red':
-        color_element = WD_COLOR_INDEX.DARK_RED
-    elif color == 'dark yellow':
-        color_element = WD_COLOR_INDEX.DARK_YELLOW
-    elif color == 'dark green':
-        color_element = WD_COLOR_INDEX.GREEN
-    elif color == 'pink':
-        color_element = WD_COLOR_INDEX.PINK
-    elif color == 'red':
-        color_element = WD_COLOR_INDEX.PINK
-    elif color == 'white':
-        color_element = WD_COLOR_INDEX.WHITE
-    elif color == 'teal':
-        color_element = WD_COLOR_INDEX.TEAL
-    elif color == 'yellow':
-        color_element = WD_COLOR_INDEX.YELLOW
-    elif color == 'violet':
-        color_element = WD_COLOR_INDEX.VIOLET
-    elif color == 'gray25':
-        color_element = WD_COLOR_INDEX.GRAY_25
-    elif color == 'gray50':
-        color_element = WD_COLOR_INDEX.GRAY_50
-    
-    return color_element
\ No newline at end of file
+    # Indice de color (WD_COLOR_INDEX) correspondiente al nombre
+    return _lookup_color(color)[0]
+
+
+def rgb_color(color: str) -> RGBColor:
+    # Color RGB del texto correspondiente al nombre
+    return _lookup_color(color)[1]
+
+
+class StyleRegistry:
+    """
+    Estilos de caracter de un documento, creados una sola vez por combinacion de
+    color de texto y resaltado y reutilizados desde una tabla de busqueda.
+
+    Tambien guarda plantillas de w:rPr por combinacion completa de formato, de modo
+    que dar formato a un run es copiar un elemento ya construido.
+    """
+
+    def __init__(self, styles):
+        self._styles_part = styles
+        # Los estilos existentes (p. ej. de un documento abierto) se reutilizan por nombre
+        self._by_name = {
+            style.name: style for style in styles if style.type == WD_STYLE_TYPE.CHARACTER
+        }
+        self._run_properties = {}
+
+    @staticmethod
+    def style_name(color: str = None, highlight: str = None) -> str:
+        if color is None:
+            return f"highlight_style_{highlight}"
+        if highlight is None:
+            return f"color_style_{color}"
+        return f"color_style_{color}_highlight_{highlight}"
+
+    def character_style(self, color: str = None, highlight: str = None):
+        """Obtener (o crear la primera vez) el estilo de caracter para la combinacion"""
+        if color is None and highlight is None:
+            return None
+        name = self.style_name(color, highlight)
+        style = self._by_name.get(name)
+        if style is None:
+            # Validar los colores antes de modificar styles.xml
+            rgb = rgb_color(color) if color is not None else None
+            highlight_index = color_paragraph(None, highlight) if highlight is not None else None
+            style = self._styles_part.add_style(name, WD_STYLE_TYPE.CHARACTER)
+            if rgb is not None:
+                style.font.color.rgb = rgb
+            if highlight_index is not None:
+                style.font.highlight_color = highlight_index
+            self._by_name[name] = style
+        return style
+
+    def run_properties(self, bold: bool = False, italic: bool = False, underline: bool = False,
+                       color: str = None, highlight: str = None):
+        """Plantilla w:rPr (compartida, no modificar) para la combinacion de formato"""
+        key = (bool(bold), bool(italic), bool(underline), color, highlight)
+        template = self._run_properties.get(key)
+        if template is None:
+            style = self.character_style(color=color, highlight=highlight)
+            # Mismo marcado que generan los setters de python-docx, en el orden del esquema
+            xml = f'<w:rStyle w:val="{style.style_id}"/>' if style is not None else ""
+            xml += "<w:b/>" if bold else '<w:b w:val="0"/>'
+            xml += "<w:i/>" if italic else '<w:i w:val="0"/>'
+            xml += '<w:u w:val="single"/>' if underline else '<w:u w:val="none"/>'
+            template = self._run_properties[key] = parse_xml(f"<w:rPr {nsdecls('w')}>{xml}</w:rPr>")
+        return template
+
+    def format_run(self, run, bold: bool = False, italic: bool = False, underline: bool = False,
+                   color: str = None, highlight: str = None) -> None:
+        """Reemplazar el formato de un run por la plantilla de la combinacion indicada"""
+        r = run._r
+        r._remove_rPr()
+        r.insert(0, deepcopy(self.run_properties(bold, italic, underline, color, highlight)))
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+
+def apply_character_style(run, style) -> None:
+    """Asignar un estilo de caracter a un run directamente por su style_id"""
+    run._r.style = style.style_id
+
+
+# Un registro por parte de documento; desaparece junto con el documento
+_registries = weakref.WeakKeyDictionary()
+
+
+def style_registry(part) -> StyleRegistry:
+    """Registro de estilos del documento al que pertenece la parte (p.part o document.part)"""
+    registry = _registries.get(part)
+    if registry is None:
+        registry = _registries[part] = StyleRegistry(part.document.styles)
+    return registry
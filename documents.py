@@ -0,0 +1,542 @@
+import os
+import tempfile
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Callable, Dict, List, Optional, Tuple
+
+from docx import Document
+from docx.opc.oxml import serialize_part_xml
+from docx.opc.part import Part, XmlPart
+from docx.package import Package
+
+# Presupuesto de memoria para documentos abiertos (en MB), configurable por entorno
+DEFAULT_MEMORY_BUDGET_MB = int(os.environ.get("WORD_MCP_MEMORY_BUDGET_MB", "512"))
+
+# Estimacion aproximada de bytes por elemento XML cargado en memoria por lxml
+BYTES_PER_ELEMENT = 400
+
+# Numero de documentos analizados que se conservan para abrirlos de nuevo sin leer el disco
+DOCUMENT_CACHE_SIZE = int(os.environ.get("WORD_MCP_DOCUMENT_CACHE_SIZE", "8"))
+
+
+def estimate_document_size(document) -> int:
+    """Estimar en bytes la memoria ocupada por un documento abierto"""
+    total = 0
+    for part in document.part.package.iter_parts():
+        if isinstance(part, XmlPart):
+            # Las partes aun compartidas con el documento en cache no ocupan memoria propia
+            element = part.__dict__.get("_own_element") if isinstance(part, _CopyOnAccess) else part._element
+            if element is not None:
+                total += sum(1 for _ in element.iter()) * BYTES_PER_ELEMENT
+        elif not getattr(part, "_shared_blob", False):
+            total += len(part.blob or b"")
+    return total
+
+
+class _CopyOnAccess:
+    """
+    Parte XML clonada que comparte el arbol del documento maestro hasta que se usa:
+    el elemento se copia la primera vez que se accede a el. Las partes que nunca se
+    tocan (encabezados, pies, comentarios...) se guardan serializando el maestro.
+    """
+
+    @property
+    def _element(self):
+        element = self.__dict__.get("_own_element")
+        if element is None:
+            element = self.__dict__["_own_element"] = deepcopy(self._master_element)
+        return element
+
+    @_element.setter
+    def _element(self, element):
+        self.__dict__["_own_element"] = element
+
+    @property
+    def blob(self):
+        if "_own_element" not in self.__dict__:
+            # El maestro no cambia: se serializa una sola vez para todos sus clones
+            master = self._master_part.__dict__
+            blob = master.get("_master_blob")
+            if blob is None:
+                blob = master["_master_blob"] = serialize_part_xml(self._master_element)
+            return blob
+        return serialize_part_xml(self._element)
+
+
+_copy_on_access_classes = {}
+
+
+def _clone_part(part, package):
+    if isinstance(part, XmlPart):
+        # Un clon sin tocar comparte el maestro original; si ya se modifico, el maestro es el
+        cls = type(part).__bases__[1] if isinstance(part, _CopyOnAccess) else type(part)
+        master = part
+        if isinstance(part, _CopyOnAccess) and "_own_element" not in part.__dict__:
+            master = part._master_part
+        lazy_cls = _copy_on_access_classes.get(cls)
+        if lazy_cls is None:
+            lazy_cls = _copy_on_access_classes[cls] = type(cls.__name__, (_CopyOnAccess, cls), {})
+        clone = lazy_cls.__new__(lazy_cls)
+        Part.__init__(clone, part.partname, part.content_type, package=package)
+        clone._master_part = master
+        clone._master_element = master._element
+        return clone
+    # Partes binarias (imagenes, miniaturas...): se comparten los bytes, que son inmutables
+    clone = type(part).load(part.partname, part.content_type, part.blob, package)
+    clone._shared_blob = True
+    return clone
+
+
+def clone_document(document):
+    """
+    Crear una copia independiente de un documento sin volver a leer ni analizar el
+    archivo: los datos binarios se comparten y cada parte XML se copia solo cuando
+    se usa por primera vez. El documento original no debe modificarse despues.
+    """
+    source = document.part.package
+    package = Package()
+    clones = {part: _clone_part(part, package) for part in source.iter_parts()}
+
+    for rel in source.rels.values():
+        target = rel.target_ref if rel.is_external else clones[rel.target_part]
+        package.rels.add_relationship(rel.reltype, target, rel.rId, rel.is_external)
+    for part, clone in clones.items():
+        for rel in part.rels.values():
+            target = rel.target_ref if rel.is_external else clones[rel.target_part]
+            clone.rels.add_relationship(rel.reltype, target, rel.rId, rel.is_external)
+
+    package.after_unmarshal()
+    return package.main_document_part.document
+
+
+_blank = None
+_blank_lock = threading.Lock()
+
+
+def blank_document():
+    """
+    Documento en blanco creado clonando la plantilla por defecto de python-docx, que se
+    analiza una sola vez por proceso (crear cada documento con Document() la vuelve a leer).
+    """
+    global _blank
+    with _blank_lock:
+        if _blank is None:
+            _blank = Document()
+    return clone_document(_blank)
+
+
+def warm_blank_document() -> threading.Thread:
+    """Analizar la plantilla en segundo plano para que el primer documento no espere por ella"""
+    thread = threading.Thread(target=blank_document, name="warm-blank-document", daemon=True)
+    thread.start()
+    return thread
+
+
+class DocumentCache:
+    """
+    Documentos analizados indexados por (ruta, mtime, tamano). Abrir de nuevo un
+    archivo sin cambios devuelve un clon del documento en cache, sin leer el disco.
+    """
+
+    def __init__(self, max_entries: int = DOCUMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._masters: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def open(self, filepath: str):
+        path = os.path.abspath(filepath)
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._masters.get(path)
+            if cached is not None and cached[0] == key:
+                self._masters.move_to_end(path)
+                self.hits += 1
+            else:
+                cached = None
+                self.misses += 1
+        if cached is not None:
+            return clone_document(cached[1])
+
+        master = Document(path)
+        if self.max_entries > 0:
+            with self._lock:
+                self._masters[path] = (key, master)
+                self._masters.move_to_end(path)
+                while len(self._masters) > self.max_entries:
+                    self._masters.popitem(last=False)
+        return clone_document(master)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._masters.clear()
+
+
+def _loaded_element(part):
+    """Elemento raiz de una parte XML, o None si es binaria o un clon que nunca se uso"""
+    if isinstance(part, _CopyOnAccess):
+        return part.__dict__.get("_own_element")
+    return part._element if isinstance(part, XmlPart) else None
+
+
+class Relocation:
+    """
+    Referencias a los elementos y partes de un documento que se desaloja. Antes de
+    liberarlo, address() traduce cada elemento a su direccion (parte y posicion en el
+    arbol, como los puntos de control del diario); despues de recargarlo, attach()
+    asocia las direcciones a los elementos y partes del documento nuevo.
+    """
+
+    def __init__(self, document):
+        self._addresses: Dict[object, Tuple[str, int]] = {}
+        for part in document.part.package.iter_parts():
+            element = _loaded_element(part)
+            if element is not None:
+                partname = str(part.partname)
+                for i, child in enumerate(element.iter()):
+                    self._addresses[child] = (partname, i)
+        self._parts: Dict[str, Part] = {}
+        self._elements: Dict[str, List] = {}
+
+    def address(self, element) -> Optional[Tuple[str, int]]:
+        """Direccion de un elemento, o None si no forma parte del documento"""
+        return self._addresses.get(element)
+
+    @staticmethod
+    def part_address(part) -> str:
+        return str(part.partname)
+
+    def release(self) -> None:
+        """Olvidar los elementos del documento desalojado para que pueda liberarse"""
+        self._addresses = {}
+
+    def attach(self, document) -> "Relocation":
+        self._parts = {str(part.partname): part for part in document.part.package.iter_parts()}
+        self._elements = {}
+        return self
+
+    def element(self, address: Tuple[str, int]):
+        """Elemento del documento recargado en esa direccion, o None si no existe"""
+        partname, i = address
+        elements = self._elements.get(partname)
+        if elements is None:
+            part = self._parts.get(partname)
+            elements = self._elements[partname] = list(part.element.iter()) if isinstance(part, XmlPart) else []
+        return elements[i] if i < len(elements) else None
+
+    def part(self, partname: str):
+        return self._parts.get(partname)
+
+
+def _element_of(obj):
+    # Section no tiene _element; su elemento es sectPr
+    element = getattr(obj, "_element", None)
+    return element if element is not None else obj._sectPr
+
+
+class _PartHandles:
+    """Objetos con identificador de un documento (guardados en su parte principal)"""
+
+    __slots__ = ("token", "objects", "by_element", "counter", "aliases")
+
+    def __init__(self, token: str):
+        self.token = token
+        self.objects: Dict[str, object] = {}
+        self.by_element: Dict[object, str] = {}
+        self.counter = 0
+        # Prefijos de documento de identificadores recuperados de otra ejecucion
+        self.aliases: List[str] = []
+
+
+class HandleTable:
+    """
+    Objetos vivos de python-docx (parrafos, runs, tablas, secciones...) accesibles por
+    un identificador compacto "<tipo>_<documento>_<n>", resuelto en O(1).
+
+    Los objetos se guardan en la propia parte del documento al que pertenecen y la
+    tabla solo mantiene una referencia debil a esa parte: cuando el documento se
+    cierra, sus objetos y sus identificadores desaparecen con el. Si se desaloja, los
+    identificadores se vuelven a asociar (con alias) a los elementos recargados.
+    Como apuntan a elementos y no a posiciones, los identificadores siguen siendo
+    validos aunque se inserten o eliminen otros elementos.
+    """
+
+    _ATTRIBUTE = "_mcp_live_objects"
+
+    def __init__(self):
+        self._owners: "weakref.WeakValueDictionary[str, object]" = weakref.WeakValueDictionary()
+        # Prefijos de documentos desalojados -> funcion que recarga el documento
+        self._parked: Dict[str, Callable[[], object]] = {}
+
+    def _handles(self, part, create: bool = True) -> Optional[_PartHandles]:
+        handles = part.__dict__.get(self._ATTRIBUTE)
+        if handles is None and create:
+            handles = part.__dict__[self._ATTRIBUTE] = _PartHandles(uuid.uuid4().hex[:8])
+            self._owners[handles.token] = part
+        return handles
+
+    def add(self, obj, prefix: str = "obj") -> str:
+        """Identificador del objeto; el mismo elemento recibe siempre el mismo identificador"""
+        handles = self._handles(obj.part)
+        element = _element_of(obj)
+        handle = handles.by_element.get(element)
+        if handle is None:
+            handles.counter += 1
+            handle = f"{prefix}_{handles.token}_{handles.counter:x}"
+            handles.by_element[element] = handle
+        handles.objects[handle] = obj
+        return handle
+
+    def get(self, handle: str):
+        """Objeto con ese identificador, o None si no existe o su documento ya no esta abierto"""
+        parts = handle.rsplit("_", 2)
+        part = self._owners.get(parts[1]) if len(parts) == 3 else None
+        load = self._parked.pop(parts[1], None) if part is None and len(parts) == 3 else None
+        if load is not None:
+            # Documento desalojado: al recargarlo sus identificadores vuelven a registrarse
+            try:
+                load()
+            except KeyError:
+                return None
+            part = self._owners.get(parts[1])
+        handles = self._handles(part, create=False) if part is not None else None
+        return handles.objects.get(handle) if handles is not None else None
+
+    def alias(self, handle: str, obj) -> None:
+        """
+        Hacer que un identificador de otra ejecucion (al recuperar un documento de su
+        diario) apunte a obj. El elemento conserva ese identificador en adelante.
+        """
+        handles = self._handles(obj.part)
+        token = handle.rsplit("_", 2)[1]
+        if token != handles.token and token not in handles.aliases:
+            handles.aliases.append(token)
+            self._owners[token] = obj.part
+            self._parked.pop(token, None)
+        handles.objects[handle] = obj
+        handles.by_element[_element_of(obj)] = handle
+
+    def elements(self, document) -> List[Tuple[str, object]]:
+        """(identificador, elemento) de los objetos con identificador de un documento"""
+        handles = self._handles(document.part, create=False)
+        if handles is None:
+            return []
+        return [(handle, _element_of(obj)) for handle, obj in list(handles.objects.items())]
+
+    def release(self, document, load: Callable[[], object] = None) -> None:
+        """
+        Olvidar todos los objetos de un documento. Si se desaloja, load() lo recarga la
+        proxima vez que se pide uno de sus identificadores.
+        """
+        handles = document.part.__dict__.pop(self._ATTRIBUTE, None)
+        if handles is not None:
+            for token in [handles.token, *handles.aliases]:
+                self._owners.pop(token, None)
+                if load is not None:
+                    self._parked[token] = load
+
+    def __len__(self) -> int:
+        tables = [self._handles(part, create=False) for part in list(self._owners.values())]
+        return sum(len(handles.objects) for handles in tables if handles is not None)
+
+
+class DocumentEntry:
+    """Documento registrado: en memoria o desalojado a disco"""
+
+    __slots__ = ("doc_id", "document", "source_path", "spill_path", "size", "dirty", "lock", "restore")
+
+    def __init__(self, doc_id: str, document, source_path: Optional[str] = None):
+        self.doc_id = doc_id
+        self.document = document
+        self.source_path = source_path
+        self.spill_path = None
+        self.size = 0
+        self.dirty = True
+        # Serializa las operaciones sobre este documento (reentrante para apply_operations)
+        self.lock = threading.RLock()
+        # Funcion que recibe el documento recargado (ver DocumentRegistry.on_evict)
+        self.restore = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.document is not None
+
+    def describe(self) -> Dict:
+        return {
+            "doc_id": self.doc_id,
+            "source_path": self.source_path,
+            "loaded": self.loaded,
+            "estimated_bytes": self.size,
+        }
+
+
+class DocumentRegistry:
+    """
+    Registro de documentos abiertos indexado por doc_id.
+
+    Los documentos se mantienen en orden LRU; cuando la memoria estimada supera
+    el presupuesto, los documentos inactivos se guardan en disco y se liberan.
+    Se recargan de forma transparente la proxima vez que se solicitan.
+
+    El registro puede usarse desde varios hilos: cada documento tiene su propio lock
+    (lock(doc_id)) y nunca se mide ni se desaloja un documento que otro hilo esta usando.
+
+    on_evict(doc_id, documento, relocation) se llama antes de liberar un documento
+    desalojado y retorna una funcion que recibe el documento al recargarlo, para
+    traducir a el (con relocation) lo que apuntaba al anterior.
+    """
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024, spill_dir: str = None,
+                 on_close: Callable[[str], None] = None,
+                 on_evict: Callable[[str, object, Relocation], Callable[[object], None]] = None):
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir or os.path.join(tempfile.gettempdir(), "word-mcp-server", "sessions")
+        self.active_id = None
+        # Se llama con el doc_id de cada documento que se cierra
+        self.on_close = on_close
+        self.on_evict = on_evict
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, DocumentEntry]" = OrderedDict()
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def register(self, document, source_path: str = None, activate: bool = True, doc_id: str = None) -> str:
+        """
+        Registrar un documento y devolver su doc_id (uno nuevo si no se indica). Con
+        document=None se registra un documento en blanco que solo se crea cuando se usa
+        por primera vez.
+        """
+        doc_id = doc_id or uuid.uuid4().hex[:12]
+        with self._lock:
+            self._entries[doc_id] = DocumentEntry(doc_id, document, source_path)
+            if activate:
+                self.active_id = doc_id
+            self._enforce_budget(keep=doc_id)
+        return doc_id
+
+    def get(self, doc_id: str = None):
+        """Obtener el documento (o el activo si doc_id es None), recargandolo si fue desalojado"""
+        if doc_id is None:
+            doc_id = self.active_id
+        if doc_id is None:
+            raise KeyError("No hay ningun documento abierto")
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is None:
+                raise KeyError(f"No se encontro el documento '{doc_id}'")
+
+            switched = next(reversed(self._entries)) != doc_id
+            self._entries.move_to_end(doc_id)
+            if not entry.loaded:
+                entry.document = Document(entry.spill_path) if entry.spill_path else blank_document()
+                entry.dirty = True
+                if entry.restore is not None:
+                    restore, entry.restore = entry.restore, None
+                    restore(entry.document)
+                switched = True
+            if switched:
+                self._enforce_budget(keep=doc_id)
+            return entry.document
+
+    def mark_dirty(self, doc_id: str) -> None:
+        """Anotar que el documento cambio: su tamano se vuelve a estimar en el siguiente control de memoria"""
+        with self._lock:
+            entry = self._entries.get(doc_id)
+        if entry is not None:
+            entry.dirty = True
+
+    def lock(self, doc_id: str) -> threading.RLock:
+        """Lock del documento, para serializar las operaciones que lo usan"""
+        with self._lock:
+            entry = self._entries.get(doc_id)
+        if entry is None:
+            raise KeyError(f"No se encontro el documento '{doc_id}'")
+        return entry.lock
+
+    def find(self, package) -> Optional[str]:
+        """doc_id del documento cargado al que pertenece el paquete, o None si no esta en este registro"""
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.loaded and entry.document.part.package is package:
+                    return entry.doc_id
+        return None
+
+    def close(self, doc_id: str):
+        """Cerrar un documento y eliminar su copia desalojada en disco; retorna el documento si estaba cargado"""
+        with self._lock:
+            entry = self._entries.pop(doc_id)
+            if self.active_id == doc_id:
+                self.active_id = next(reversed(self._entries)) if self._entries else None
+        discard = getattr(entry.document, "discard", None)
+        if discard is not None:
+            discard()
+        if entry.spill_path and os.path.exists(entry.spill_path):
+            os.remove(entry.spill_path)
+        if self.on_close is not None:
+            self.on_close(doc_id)
+        return entry.document
+
+    def close_all(self) -> None:
+        """Cerrar todos los documentos (al terminar la sesion a la que pertenece el registro)"""
+        for doc_id in list(self._entries):
+            self.close(doc_id)
+
+    def entries(self) -> List[DocumentEntry]:
+        with self._lock:
+            return list(self._entries.values())
+
+    def memory_usage(self) -> int:
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values() if entry.loaded)
+
+    def _evict(self, entry: DocumentEntry) -> None:
+        os.makedirs(self.spill_dir, exist_ok=True)
+        entry.spill_path = os.path.join(self.spill_dir, f"{entry.doc_id}.docx")
+        entry.document.save(entry.spill_path)
+        if self.on_evict is not None:
+            relocation = Relocation(entry.document)
+            restore = self.on_evict(entry.doc_id, entry.document, relocation)
+            relocation.release()
+
+            def attach(document, restore=restore, relocation=relocation):
+                relocation.attach(document)
+                restore(document)
+
+            entry.restore = attach
+        entry.document = None
+
+    def _enforce_budget(self, keep: str = None) -> None:
+        # Solo se recalcula el tamano de los documentos modificados desde la ultima vez;
+        # los que otro hilo esta modificando se miden en una llamada posterior
+        for entry in self._entries.values():
+            if entry.loaded and entry.dirty and entry.lock.acquire(blocking=False):
+                try:
+                    entry.size = estimate_document_size(entry.document)
+                    entry.dirty = False
+                finally:
+                    entry.lock.release()
+
+        usage = self.memory_usage()
+        for entry in list(self._entries.values()):
+            if usage <= self.memory_budget:
+                break
+            # Los documentos en modo streaming no pueden guardarse y recargarse
+            if not entry.loaded or entry.doc_id in (keep, self.active_id) or getattr(entry.document, "streaming", False):
+                continue
+            if not entry.lock.acquire(blocking=False):
+                continue
+            try:
+                self._evict(entry)
+            finally:
+                entry.lock.release()
+            usage -= entry.size
@@ -0,0 +1,185 @@
+import base64
+import binascii
+import json
+import weakref
+from collections import OrderedDict
+from itertools import chain
+from typing import Dict, Iterator, Optional, Tuple
+
+from docx.oxml.ns import qn
+
+from search import paragraph_text
+
+# Formatos de read_document
+FORMATS = ("markdown", "text")
+
+# Tamano aproximado (caracteres) del contenido de una pagina
+DEFAULT_MAX_CHARS = 20000
+
+# Posiciones de continuacion recordadas por documento (una por lector en curso)
+_POSITIONS_PER_DOCUMENT = 8
+
+_W_P = qn("w:p")
+_W_TBL = qn("w:tbl")
+_W_TR = qn("w:tr")
+_W_TC = qn("w:tc")
+_W_PPR = qn("w:pPr")
+_W_PSTYLE = qn("w:pStyle")
+_W_NUMPR = qn("w:numPr")
+_W_ILVL = qn("w:ilvl")
+_W_VAL = qn("w:val")
+_W_STYLE = qn("w:style")
+_W_NAME = qn("w:name")
+_W_STYLE_ID = qn("w:styleId")
+
+# part del documento -> {bloque: (elemento, numero de hijos del cuerpo al guardarlo)}
+_positions: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def style_names(document) -> Dict[str, str]:
+    """styleId -> nombre de los estilos de parrafo, en minusculas"""
+    return {
+        style.get(_W_STYLE_ID): (style.find(_W_NAME).get(_W_VAL) if style.find(_W_NAME) is not None else "").lower()
+        for style in document.styles.element.iterchildren(_W_STYLE)
+    }
+
+
+def _paragraph_prefix(p, styles: Dict[str, str], markdown: bool) -> str:
+    """Marca de titulo o de elemento de lista segun el estilo y la numeracion del parrafo"""
+    ppr = p.find(_W_PPR)
+    if ppr is None:
+        return ""
+    pstyle = ppr.find(_W_PSTYLE)
+    name = styles.get(pstyle.get(_W_VAL), "") if pstyle is not None else ""
+
+    if name == "title" or name.startswith("heading "):
+        level = name[8:]
+        return "#" * min(int(level) if level.isdigit() else 1, 6) + " " if markdown else ""
+
+    numpr = ppr.find(_W_NUMPR)
+    if numpr is None and not name.startswith("list"):
+        return ""
+    ilvl = numpr.find(_W_ILVL) if numpr is not None else None
+    depth = int(ilvl.get(_W_VAL, "0")) if ilvl is not None else 0
+    return "  " * depth + ("1. " if markdown and "number" in name else "- ")
+
+
+def _cell_text(tc, markdown: bool) -> str:
+    text = (("<br>" if markdown else " ").join(paragraph_text(p) for p in tc.iterchildren(_W_P))).strip()
+    return text.replace("|", "\\|").replace("\n", " ") if markdown else text.replace("\t", " ")
+
+
+def _row_text(tr, markdown: bool, header: bool) -> str:
+    cells = [_cell_text(tc, markdown) for tc in tr.iterchildren(_W_TC)]
+    if not markdown:
+        return "\t".join(cells)
+    line = "| " + " | ".join(cells) + " |"
+    # La primera fila hace de encabezado de la tabla Markdown
+    return line + "\n|" + " --- |" * len(cells) if header else line
+
+
+def _blocks_from(part, body, start: int) -> Iterator[Tuple[int, object]]:
+    """(indice, elemento) de los parrafos y tablas del cuerpo a partir del bloque start"""
+    saved = _positions.get(part, {}).get(start)
+    if saved is not None and saved[1] == len(body) and saved[0].getparent() is body:
+        # Continuar donde termino la pagina anterior sin recorrer los bloques ya leidos
+        index, elements = start, chain([saved[0]], saved[0].itersiblings())
+    else:
+        index, elements = 0, body.iterchildren()
+    for element in elements:
+        if element.tag != _W_P and element.tag != _W_TBL:
+            continue
+        if index >= start:
+            yield index, element
+        index += 1
+
+
+def _remember(part, body, block: int, element) -> None:
+    positions = _positions.get(part)
+    if positions is None:
+        positions = _positions[part] = OrderedDict()
+    positions[block] = (element, len(body))
+    positions.move_to_end(block)
+    while len(positions) > _POSITIONS_PER_DOCUMENT:
+        positions.popitem(last=False)
+
+
+def iter_chunks(document, fmt: str = "markdown", start: int = 0, row: int = 0) -> Iterator[Tuple[int, int, object, str]]:
+    """
+    Representacion del cuerpo como (bloque, fila, elemento, texto), generada bajo demanda.
+    Los parrafos producen un fragmento (fila -1) y las tablas uno por fila, de modo que
+    una tabla grande puede repartirse entre varias paginas. Los parrafos vacios no
+    producen fragmento pero cuentan como bloque.
+    """
+    markdown = fmt == "markdown"
+    styles = style_names(document)
+    body = document.element.body
+    for index, element in _blocks_from(document.part, body, start):
+        if element.tag == _W_P:
+            text = paragraph_text(element)
+            if text.strip():
+                yield index, -1, element, _paragraph_prefix(element, styles, markdown) + text
+            continue
+        first = row if index == start else 0
+        for r, tr in enumerate(element.iterchildren(_W_TR)):
+            if r >= first:
+                yield index, r, element, _row_text(tr, markdown, header=(r == 0))
+
+
+def read_page(document, fmt: str = "markdown", offset: int = 0, row: int = 0,
+              limit: int = 200, max_chars: int = DEFAULT_MAX_CHARS) -> Dict:
+    """
+    Una pagina de hasta limit bloques y unos max_chars caracteres (un parrafo o una fila
+    mas largos se devuelven completos). "next" es la posicion (bloque, fila) donde
+    continuar, o None si se llego al final del documento.
+    """
+    body = document.element.body
+    pieces = []
+    size = 0
+    blocks = 0
+    previous = None
+    position = None
+    for index, r, element, text in iter_chunks(document, fmt, offset, row):
+        new_block = index != previous
+        if pieces and (size + len(text) > max_chars or (new_block and blocks >= limit)):
+            position = (index, max(r, 0))
+            _remember(document.part, body, index, element)
+            break
+        # Bloques separados por una linea en blanco; filas de una misma tabla, por un salto
+        separator = "\n\n" if new_block else "\n"
+        pieces.append((separator if pieces else "") + text)
+        size += len(pieces[-1])
+        blocks += new_block
+        previous = index
+
+    return {
+        "content": "".join(pieces),
+        "offset": offset,
+        "blocks": blocks,
+        "next": position,
+        "done": position is None,
+    }
+
+
+def encode_token(doc_id: str, block: int, row: int, fmt: str) -> str:
+    data = json.dumps({"d": doc_id, "b": block, "r": row, "f": fmt}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Tuple[str, int, int, str]:
+    """(doc_id, bloque, fila, formato) de un token de read_document; ValueError si no es valido"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return data["d"], int(data["b"]), int(data["r"]), data["f"]
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeDecodeError):
+        raise ValueError(f"Token de lectura no valido: '{token}'")
+
+
+def token_document(token) -> Optional[str]:
+    """doc_id de un token de lectura, o None si no hay token o no es valido"""
+    if not isinstance(token, str) or not token:
+        return None
+    try:
+        return decode_token(token)[0]
+    except ValueError:
+        return None
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Union
+
+from docx.image.constants import MIME_TYPE
+from docx.image.exceptions import UnrecognizedImageError
+from docx.image.image import Image
+
+# Resolucion objetivo (pixeles por pulgada) al reducir imagenes, configurable por entorno
+DEFAULT_DPI = int(os.environ.get("WORD_MCP_IMAGE_DPI", "150"))
+
+# Bytes maximos de imagenes preparadas que se conservan para reutilizar (logos repetidos, etc.)
+PREPARED_CACHE_BYTES = 64 * 1024 * 1024
+
+JPEG_QUALITY = 90
+
+# Formatos que Word acepta tal cual y que se insertan sin recodificar
+PASSTHROUGH_TYPES = {MIME_TYPE.PNG, MIME_TYPE.JPEG}
+
+_prepared: "OrderedDict[tuple, bytes]" = OrderedDict()
+_prepared_lock = threading.Lock()
+_prepared_bytes = 0
+
+
+# cv2 y numpy se importan dentro de las funciones: cargarlos cuesta ~100 ms en el arranque
+# y solo se necesitan al decodificar, redimensionar o codificar imagenes
+
+
+def _encode(img: "np.ndarray", as_png: bool) -> bytes:
+    import cv2
+
+    if as_png:
+        is_success, buffer = cv2.imencode(".png", img)
+    else:
+        is_success, buffer = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not is_success:
+        raise ValueError("No se pudo codificar la imagen")
+    return buffer.tobytes()
+
+
+def _downscale(img: "np.ndarray", target_px: Optional[int]) -> "np.ndarray":
+    if not target_px or img.shape[1] <= target_px:
+        return img
+    import cv2
+
+    height = max(1, round(img.shape[0] * target_px / img.shape[1]))
+    return cv2.resize(img, (target_px, height), interpolation=cv2.INTER_AREA)
+
+
+def _prepare_encoded(data: bytes, target_px: Optional[int]) -> bytes:
+    try:
+        image = Image.from_blob(data)
+        content_type, px_width = image.content_type, image.px_width
+    except UnrecognizedImageError:
+        content_type, px_width = None, None
+
+    # PNG/JPEG que ya caben en el ancho objetivo se insertan sin decodificar
+    if content_type in PASSTHROUGH_TYPES and (not target_px or px_width <= target_px):
+        return data
+
+    import cv2
+    import numpy as np
+
+    is_jpeg = content_type == MIME_TYPE.JPEG
+    flags = cv2.IMREAD_COLOR if is_jpeg else cv2.IMREAD_UNCHANGED
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if img is None:
+        raise ValueError("No se pudo decodificar la imagen")
+    # JPEG se mantiene en JPEG; el resto se guarda en PNG para no perder calidad ni transparencia
+    return _encode(_downscale(img, target_px), as_png=not is_jpeg)
+
+
+def prepare_image(image, width: float, dpi: Optional[int] = DEFAULT_DPI) -> bytes:
+    """
+    Obtener los bytes a insertar para una imagen mostrada con `width` pulgadas de ancho.
+
+    - image: ruta a un archivo, bytes ya codificados o matriz de pixeles (numpy/lista)
+    - dpi: resolucion objetivo; la imagen se reduce a width * dpi pixeles de ancho
+      (None o 0 para no reducir)
+
+    El resultado se guarda en cache por hash de contenido, de modo que la misma imagen
+    se procesa una sola vez y produce siempre los mismos bytes (y por tanto una sola
+    parte multimedia en el documento).
+    """
+    target_px = round(width * dpi) if dpi else None
+
+    if isinstance(image, str):
+        with open(image, "rb") as f:
+            image = f.read()
+
+    if isinstance(image, (bytes, bytearray)):
+        data = bytes(image)
+        key = (hashlib.sha1(data).hexdigest(), target_px)
+    else:
+        import numpy as np
+
+        data = np.ascontiguousarray(np.array(image))
+        key = (hashlib.sha1(data.tobytes()).hexdigest(), data.shape, data.dtype.str, target_px)
+
+    with _prepared_lock:
+        prepared = _prepared.get(key)
+        if prepared is not None:
+            _prepared.move_to_end(key)
+            return prepared
+
+    if isinstance(data, bytes):
+        prepared = _prepare_encoded(data, target_px)
+    else:
+        # Matrices: JPEG salvo que tengan canal alfa
+        has_alpha = data.ndim == 3 and data.shape[2] == 4
+        prepared = _encode(_downscale(data, target_px), as_png=has_alpha)
+
+    global _prepared_bytes
+    with _prepared_lock:
+        if key not in _prepared:
+            _prepared[key] = prepared
+            _prepared_bytes += len(prepared)
+        while _prepared_bytes > PREPARED_CACHE_BYTES and len(_prepared) > 1:
+            _prepared_bytes -= len(_prepared.popitem(last=False)[1])
+    return prepared
+
+
+def recompress_image(data: bytes, content_type: str, target: Optional[tuple], jpeg_quality: int = JPEG_QUALITY) -> tuple:
+    """
+    Volver a codificar una imagen del documento, reducida a target (ancho, alto en
+    pixeles) si es mas grande. Se ejecuta en un proceso de trabajo (optimize_media).
+
+    PNG se mantiene en PNG (sin perdida, compresion maxima) y JPEG en JPEG, para no
+    cambiar el tipo de la parte. Retorna (bytes o None si el resultado no es menor,
+    tamano original, tamano final, motivo si se omite).
+    """
+    import cv2
+    import numpy as np
+
+    if content_type not in PASSTHROUGH_TYPES:
+        return None, None, None, "formato no soportado"
+    # Sin aplicar la orientacion EXIF: los pixeles quedan como los muestra el documento
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return None, None, None, "no se pudo decodificar"
+    height, width = img.shape[:2]
+
+    new_width, new_height = width, height
+    if target:
+        scale = max(target[0] / width, target[1] / height)
+        if scale < 1:
+            new_width, new_height = max(1, round(width * scale)), max(1, round(height * scale))
+            img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
+
+    if content_type == MIME_TYPE.JPEG:
+        params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+        is_success, buffer = cv2.imencode(".jpg", img, params)
+    else:
+        is_success, buffer = cv2.imencode(".png", img, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+    if not is_success:
+        return None, (width, height), None, "no se pudo codificar"
+    if buffer.nbytes >= len(data):
+        return None, (width, height), None, "no reduce el tamano"
+    return buffer.tobytes(), (width, height), (new_width, new_height), None
+
+
+def prepare_images(
+    images: Sequence,
+    widths: Union[float, Sequence[float]],
+    dpi: Optional[int] = DEFAULT_DPI,
+    max_workers: int = None,
+) -> List[bytes]:
+    """Preparar varias imagenes en paralelo (cv2 libera el GIL al decodificar y redimensionar)"""
+    if isinstance(widths, (int, float)):
+        widths = [widths] * len(images)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda args: prepare_image(args[0], args[1], dpi), zip(images, widths)))
@@ -0,0 +1,805 @@
+import re
+import string
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.oxml.numbering import CT_Num
+from docx.shared import Pt, RGBColor
+from docx.styles import BabelFish
+from docx.table import Table
+
+from streaming import append_to_body
+from tables import ALIGNMENTS, table_xml, text_xml
+
+# Tipos de bloque aceptados por add_markdown (entrada JSON)
+BLOCK_TYPES = ("heading", "paragraph", "list", "table", "quote", "code", "rule", "page_break")
+
+# Niveles de lista con estilo propio (List Bullet, List Bullet 2, List Bullet 3)
+LIST_LEVELS = 3
+
+# Tamano (pt) de los estilos de titulo que se crean si el documento no los tiene
+_HEADING_SIZES = {0: 26, 1: 16, 2: 13, 3: 12, 4: 11, 5: 11, 6: 11}
+
+# Estilos de caracter por formato de run; se crean si el documento no los tiene
+_RUN_STYLES = {
+    "strong": "Strong",
+    "emphasis": "Emphasis",
+    "strong_emphasis": "Strong Emphasis",
+    "code": "Macro Text Char",
+    "link": "Hyperlink",
+}
+
+_ATX = re.compile(r" {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+_SETEXT = re.compile(r" {0,3}(=+|-+)[ \t]*$")
+_RULE = re.compile(r" {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$")
+_FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
+_LIST_ITEM = re.compile(r"([ \t]*)([-*+]|\d{1,9}[.)])(?:[ \t]+(.*))?$")
+_QUOTE = re.compile(r" {0,3}> ?(.*)$")
+_TABLE_SEPARATOR = re.compile(r" {0,3}\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)*\|?[ \t]*$")
+_CELL_SPLIT = re.compile(r"(?<!\\)\|")
+
+_W_TBL = qn("w:tbl")
+
+# Caracteres que pueden iniciar marcado en linea
+_INLINE_SPECIAL = re.compile(r"[\\`*_\[<!]")
+_BACKTICKS = re.compile(r"`+")
+_AUTOLINK = re.compile(r"<((?:https?|mailto):[^<>\s]+)>")
+_LINK_TARGET = re.compile(r"\(\s*(<[^>]*>|[^\s()]*(?:\([^\s()]*\)[^\s()]*)*)(?:\s+(?:\"[^\"]*\"|'[^']*'))?\s*\)")
+
+_ASCII_PUNCTUATION = frozenset(string.punctuation)
+
+
+# SECCION PARSER - Markdown a bloques
+
+def _indent(prefix: str) -> int:
+    return len(prefix.expandtabs(4))
+
+
+def _split_row(line: str) -> List[str]:
+    """Celdas de una fila de tabla Markdown (| a | b |), admitiendo \\| dentro de una celda"""
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    return [cell.strip().replace("\\|", "|") for cell in _CELL_SPLIT.split(line)]
+
+
+def _column_alignment(spec: str) -> Optional[str]:
+    spec = spec.strip()
+    if spec.startswith(":") and spec.endswith(":"):
+        return "CENTER"
+    if spec.endswith(":"):
+        return "RIGHT"
+    if spec.startswith(":"):
+        return "LEFT"
+    return None
+
+
+def _join_lines(lines: List[str]) -> str:
+    """Unir las lineas de un parrafo; dos espacios o \\ al final de una linea son un salto de linea"""
+    parts = []
+    last = len(lines) - 1
+    for i, line in enumerate(lines):
+        line = line.strip() if i == last else line.lstrip()
+        if i == last:
+            parts.append(line)
+        elif line.endswith("\\") and not line.endswith("\\\\"):
+            parts.append(line[:-1] + "\n")
+        elif line.endswith("  "):
+            parts.append(line.rstrip() + "\n")
+        else:
+            parts.append(line.rstrip() + " ")
+    return "".join(parts)
+
+
+def _starts_block(line: str, next_line: Optional[str]) -> bool:
+    """La linea interrumpe un parrafo (titulo, bloque de codigo, cita, lista, regla o tabla)"""
+    return bool(
+        _ATX.match(line) or _FENCE.match(line) or _QUOTE.match(line) or _RULE.match(line)
+        or _LIST_ITEM.match(line)
+        or ("|" in line and next_line is not None and _TABLE_SEPARATOR.match(next_line))
+    )
+
+
+def parse_markdown(text: str) -> List[Dict]:
+    """
+    Convertir Markdown en bloques con el mismo formato que la entrada JSON de add_markdown:
+    titulos (# y subrayados), parrafos, listas anidadas con vinetas o numeradas, citas,
+    bloques de codigo, reglas horizontales y tablas con | (alineacion con :---:).
+    El formato en linea (**negrita**, *cursiva*, `codigo`, [enlaces](url)) se conserva
+    en el texto de cada bloque y se interpreta al generar el documento.
+    """
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    blocks: List[Dict] = []
+    paragraph: List[str] = []
+    items: List[Dict] = []
+    indents: List[int] = []
+
+    def end_paragraph():
+        if paragraph:
+            blocks.append({"type": "paragraph", "text": _join_lines(paragraph)})
+            paragraph.clear()
+
+    def end_list():
+        if items:
+            blocks.append({"type": "list", "items": list(items)})
+            items.clear()
+            indents.clear()
+
+    i = 0
+    count = len(lines)
+    while i < count:
+        line = lines[i]
+        next_line = lines[i + 1] if i + 1 < count else None
+
+        if not line.strip():
+            end_paragraph()
+            # Una linea en blanco dentro de una lista no la termina si sigue otro elemento
+            if items and not (next_line is not None and _LIST_ITEM.match(next_line) and not _RULE.match(next_line)):
+                end_list()
+            i += 1
+            continue
+
+        # Titulo subrayado (Setext): la linea anterior era un parrafo
+        if paragraph and not items and _SETEXT.match(line):
+            level = 1 if line.strip()[0] == "=" else 2
+            heading = _join_lines(paragraph)
+            paragraph.clear()
+            blocks.append({"type": "heading", "text": heading, "level": level})
+            i += 1
+            continue
+
+        fence = _FENCE.match(line)
+        if fence:
+            end_paragraph()
+            end_list()
+            marker = fence.group(1)
+            indent = _indent(line[:fence.start(1)])
+            code = []
+            i += 1
+            while i < count:
+                current = lines[i]
+                stripped = current.strip()
+                if stripped.startswith(marker[0] * len(marker)) and not stripped.strip(marker[0]):
+                    break
+                # Quitar la sangria de la apertura del bloque
+                code.append(current[min(indent, len(current) - len(current.lstrip(" "))):])
+                i += 1
+            blocks.append({"type": "code", "text": "\n".join(code)})
+            i += 1
+            continue
+
+        heading = _ATX.match(line)
+        if heading:
+            end_paragraph()
+            end_list()
+            blocks.append({"type": "heading", "text": (heading.group(2) or "").strip(), "level": len(heading.group(1))})
+            i += 1
+            continue
+
+        if _RULE.match(line):
+            end_paragraph()
+            end_list()
+            blocks.append({"type": "rule"})
+            i += 1
+            continue
+
+        if "|" in line and next_line is not None and _TABLE_SEPARATOR.match(next_line) and not items:
+            headers = _split_row(line)
+            specs = _split_row(next_line)
+            if len(specs) == len(headers):
+                end_paragraph()
+                rows = []
+                i += 2
+                while i < count and lines[i].strip() and "|" in lines[i]:
+                    rows.append(_split_row(lines[i]))
+                    i += 1
+                blocks.append({
+                    "type": "table",
+                    "headers": headers,
+                    "rows": rows,
+                    "alignments": [_column_alignment(spec) for spec in specs],
+                })
+                continue
+
+        quote = _QUOTE.match(line)
+        if quote:
+            end_paragraph()
+            end_list()
+            quoted: List[str] = []
+            while i < count:
+                match = _QUOTE.match(lines[i])
+                if match is None:
+                    break
+                if match.group(1).strip():
+                    quoted.append(match.group(1))
+                elif quoted:
+                    # Una linea ">" vacia separa parrafos de la cita
+                    blocks.append({"type": "quote", "text": _join_lines(quoted)})
+                    quoted = []
+                i += 1
+            if quoted:
+                blocks.append({"type": "quote", "text": _join_lines(quoted)})
+            continue
+
+        item = _LIST_ITEM.match(line)
+        if item:
+            end_paragraph()
+            indent = _indent(item.group(1))
+            ordered = item.group(2)[0].isdigit()
+            # Cambiar de vinetas a numeros (o al reves) en el primer nivel empieza otra lista
+            if items and indent <= indents[0] and ordered != items[0]["ordered"]:
+                end_list()
+            # Nivel segun la sangria respecto de los elementos anteriores de la lista
+            while indents and indent < indents[-1]:
+                indents.pop()
+            if not indents or indent > indents[-1]:
+                indents.append(indent)
+            item_lines = [item.group(3) or ""]
+            i += 1
+            # Lineas de continuacion del mismo elemento
+            while i < count and lines[i].strip():
+                following = lines[i + 1] if i + 1 < count else None
+                if _LIST_ITEM.match(lines[i]) or _starts_block(lines[i].lstrip(), following):
+                    break
+                item_lines.append(lines[i])
+                i += 1
+            items.append({
+                "text": _join_lines(item_lines),
+                "level": len(indents) - 1,
+                "ordered": ordered,
+            })
+            continue
+
+        if items:
+            # Texto sin sangria tras una lista: la lista termina
+            end_list()
+        paragraph.append(line)
+        i += 1
+
+    end_paragraph()
+    end_list()
+    return blocks
+
+
+# SECCION INLINE - formato dentro de un bloque
+
+def _is_punctuation(char: str) -> bool:
+    return char in _ASCII_PUNCTUATION or (char > "\x7f" and unicodedata.category(char).startswith("P"))
+
+
+def _delimiter(text: str, start: int, end: int) -> List:
+    """Delimitador de enfasis (* o _) con las reglas de apertura y cierre de CommonMark"""
+    char = text[start]
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    left = not after.isspace() and (not _is_punctuation(after) or before.isspace() or _is_punctuation(before))
+    right = not before.isspace() and (not _is_punctuation(before) or after.isspace() or _is_punctuation(after))
+    if char == "_":
+        # El guion bajo dentro de una palabra (snake_case) es literal
+        can_open = left and (not right or _is_punctuation(before))
+        can_close = right and (not left or _is_punctuation(after))
+    else:
+        can_open, can_close = left, right
+    return ["delim", char, end - start, can_open, can_close]
+
+
+def _find_link(text: str, start: int) -> Optional[Tuple[str, str, int]]:
+    """(texto, url, fin) de un enlace [texto](url) que empieza en start, o None"""
+    depth = 0
+    i = start
+    while i < len(text):
+        char = text[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+            if depth == 0:
+                target = _LINK_TARGET.match(text, i + 1)
+                if target is None:
+                    return None
+                url = target.group(1)
+                if url.startswith("<"):
+                    url = url[1:-1]
+                return text[start + 1:i], url, target.end()
+        i += 1
+    return None
+
+
+def _tokens(text: str) -> List[List]:
+    """Texto, codigo, enlaces y delimitadores de enfasis de un texto en linea"""
+    tokens: List[List] = []
+    plain: List[str] = []
+    position = 0
+    length = len(text)
+
+    def flush():
+        if plain:
+            tokens.append(["text", "".join(plain)])
+            plain.clear()
+
+    while position < length:
+        match = _INLINE_SPECIAL.search(text, position)
+        if match is None:
+            plain.append(text[position:])
+            break
+        start = match.start()
+        if start > position:
+            plain.append(text[position:start])
+        char = text[start]
+
+        if char == "\\":
+            following = text[start + 1:start + 2]
+            if following and following in _ASCII_PUNCTUATION:
+                plain.append(following)
+                position = start + 2
+            else:
+                plain.append("\\")
+                position = start + 1
+            continue
+
+        if char == "`":
+            opening = _BACKTICKS.match(text, start).group()
+            end = start + len(opening)
+            # El codigo termina en una secuencia de comillas invertidas de la misma longitud
+            closing = end
+            while True:
+                found = _BACKTICKS.search(text, closing)
+                if found is None or len(found.group()) == len(opening):
+                    break
+                closing = found.end()
+            if found is None:
+                plain.append(opening)
+                position = end
+                continue
+            code = text[end:found.start()]
+            if len(code) > 2 and code[0] == " " and code[-1] == " " and code.strip():
+                code = code[1:-1]
+            flush()
+            tokens.append(["code", code])
+            position = found.end()
+            continue
+
+        if char in "*_":
+            end = start + 1
+            while end < length and text[end] == char:
+                end += 1
+            flush()
+            tokens.append(_delimiter(text, start, end))
+            position = end
+            continue
+
+        if char == "<":
+            autolink = _AUTOLINK.match(text, start)
+            if autolink:
+                flush()
+                url = autolink.group(1)
+                tokens.append(["link", url[7:] if url.startswith("mailto:") else url, url])
+                position = autolink.end()
+                continue
+
+        if char == "[" or (char == "!" and text[start + 1:start + 2] == "["):
+            link = _find_link(text, start + (char == "!"))
+            if link is not None:
+                label, url, end = link
+                flush()
+                # Las imagenes en linea se convierten en un enlace con su texto alternativo
+                tokens.append(["link", plain_text(label) or url, url])
+                position = end
+                continue
+
+        plain.append(char)
+        position = start + 1
+
+    flush()
+    return tokens
+
+
+def inline_runs(text: str) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Runs (texto, formato, url) de un texto con marcado en linea. formato es None,
+    "strong", "emphasis", "strong_emphasis", "code" o "link". Los delimitadores que
+    no cierran se conservan como texto y los runs contiguos con el mismo formato se unen.
+    """
+    if _INLINE_SPECIAL.search(text) is None:
+        return [(text, None, None)] if text else []
+
+    tokens = _tokens(text)
+    # Enfasis: cada cierre se empareja con la apertura compatible mas cercana
+    strong = [0] * (len(tokens) + 1)
+    emphasis = [0] * (len(tokens) + 1)
+    openers: List[int] = []
+    for index, token in enumerate(tokens):
+        if token[0] != "delim":
+            continue
+        if token[4]:
+            j = len(openers) - 1
+            while j >= 0 and tokens[openers[j]][1] != token[1]:
+                j -= 1
+            while token[2] and j >= 0:
+                opener_index = openers[j]
+                opener = tokens[opener_index]
+                used = 2 if opener[2] >= 2 and token[2] >= 2 else 1
+                marks = strong if used == 2 else emphasis
+                marks[opener_index + 1] += 1
+                marks[index] -= 1
+                opener[2] -= used
+                token[2] -= used
+                # Los delimitadores entre la apertura y el cierre quedan como texto
+                del openers[j + 1:]
+                if not opener[2]:
+                    openers.pop()
+                    j -= 1
+                    while j >= 0 and tokens[openers[j]][1] != token[1]:
+                        j -= 1
+        if token[2] and token[3]:
+            openers.append(index)
+
+    runs: List[List] = []
+    bold = italic = 0
+    for index, token in enumerate(tokens):
+        bold += strong[index]
+        italic += emphasis[index]
+        kind = token[0]
+        if kind == "delim":
+            if not token[2]:
+                continue
+            value, url = token[1] * token[2], None
+        elif kind == "link":
+            value, url = token[1], token[2]
+        else:
+            value, url = token[1], None
+
+        if kind == "code":
+            fmt = "code"
+        elif kind == "link":
+            fmt = "link"
+        elif bold and italic:
+            fmt = "strong_emphasis"
+        elif bold:
+            fmt = "strong"
+        elif italic:
+            fmt = "emphasis"
+        else:
+            fmt = None
+
+        if runs and runs[-1][1] == fmt and runs[-1][2] == url:
+            runs[-1][0] += value
+        elif value:
+            runs.append([value, fmt, url])
+    return [tuple(run) for run in runs]
+
+
+def plain_text(text: str) -> str:
+    """Texto sin marcado en linea (celdas de tabla, texto de enlaces)"""
+    return "".join(run[0] for run in inline_runs(text))
+
+
+# SECCION BLOQUES JSON - validacion
+
+def _text(block: Dict, index: int, key: str = "text") -> str:
+    value = block.get(key, "")
+    if value is None:
+        return ""
+    if not isinstance(value, (str, int, float)):
+        raise ValueError(f"El bloque {index} tiene un '{key}' que no es texto")
+    return str(value)
+
+
+def normalize_blocks(blocks: List[Dict]) -> List[Dict]:
+    """
+    Validar los bloques JSON de add_markdown antes de modificar el documento y
+    completar los valores por defecto. Lanza ValueError indicando el bloque invalido.
+    """
+    normalized = []
+    for index, block in enumerate(blocks):
+        if not isinstance(block, dict):
+            raise ValueError(f"El bloque {index} no es un objeto")
+        kind = block.get("type")
+        if kind not in BLOCK_TYPES:
+            raise ValueError(f"Tipo de bloque no valido en el bloque {index}: '{kind}' (validos: {', '.join(BLOCK_TYPES)})")
+
+        if kind == "heading":
+            level = block.get("level", 1)
+            if not isinstance(level, int) or not 0 <= level <= 9:
+                raise ValueError(f"El bloque {index} tiene un nivel de titulo no valido: {level}")
+            normalized.append({"type": kind, "text": _text(block, index), "level": level})
+        elif kind in ("paragraph", "quote", "code"):
+            normalized.append({"type": kind, "text": _text(block, index)})
+        elif kind == "list":
+            ordered = bool(block.get("ordered", False))
+            items = []
+            for item in block.get("items") or []:
+                if isinstance(item, dict):
+                    level = item.get("level", 0)
+                    if not isinstance(level, int) or level < 0:
+                        raise ValueError(f"El bloque {index} tiene un nivel de lista no valido: {level}")
+                    items.append({
+                        "text": _text(item, index),
+                        "level": level,
+                        "ordered": bool(item.get("ordered", ordered)),
+                    })
+                else:
+                    items.append({"text": "" if item is None else str(item), "level": 0, "ordered": ordered})
+            normalized.append({"type": kind, "items": items})
+        elif kind == "table":
+            headers = [plain_text(str(cell)) for cell in block.get("headers") or []]
+            rows = [["" if cell is None else plain_text(str(cell)) for cell in row] for row in block.get("rows") or []]
+            cols = len(headers) or max((len(row) for row in rows), default=0)
+            if not cols:
+                raise ValueError(f"El bloque {index} es una tabla sin columnas")
+            alignments = block.get("alignments")
+            if alignments is not None:
+                if len(alignments) != cols:
+                    raise ValueError(f"El bloque {index} tiene {len(alignments)} alineaciones pero {cols} columnas")
+                alignments = [alignment.upper() if alignment else None for alignment in alignments]
+                for alignment in alignments:
+                    if alignment is not None and alignment not in ALIGNMENTS:
+                        raise ValueError(f"Alineacion no valida en el bloque {index}: {alignment}")
+            normalized.append({"type": kind, "headers": headers, "rows": rows, "cols": cols, "alignments": alignments})
+        else:
+            normalized.append({"type": kind})
+    return normalized
+
+
+# SECCION XML - bloques a WordprocessingML
+
+class _Styles:
+    """
+    Estilos de parrafo y de caracter que usa el contenido agregado, buscados una vez
+    por llamada. Los que faltan en el documento (p. ej. en un documento abierto) se
+    crean la primera vez, de modo que el formato queda en styles.xml y no en cada run.
+    """
+
+    def __init__(self, part):
+        self._styles = part.styles
+        # Nombre interno -> elemento w:style, leidos una sola vez (buscar por nombre en
+        # python-docx recorre todos los estilos en cada consulta)
+        self._by_name = {style.name_val: style for style in self._styles.element.style_lst}
+        self._ids: Dict[str, Optional[str]] = {}
+
+    def get(self, name: str):
+        """Elemento w:style con ese nombre, o None si no existe"""
+        return self._by_name.get(BabelFish.ui2internal(name))
+
+    def style_id(self, name: str) -> Optional[str]:
+        """styleId del estilo con ese nombre, o None si no existe"""
+        if name not in self._ids:
+            style = self.get(name)
+            self._ids[name] = style.styleId if style is not None else None
+        return self._ids[name]
+
+    def _add(self, name: str, style_type):
+        style = self._styles.add_style(name, style_type)
+        self._by_name[style.element.name_val] = style.element
+        self._ids.pop(name, None)
+        return style
+
+    def heading(self, level: int) -> str:
+        name = "Title" if level == 0 else f"Heading {level}"
+        style_id = self.style_id(name)
+        if style_id is None:
+            style = self._add(name, WD_STYLE_TYPE.PARAGRAPH)
+            style.base_style = self._styles.default(WD_STYLE_TYPE.PARAGRAPH)
+            style.font.bold = True
+            style.font.size = Pt(_HEADING_SIZES.get(level, 11))
+            style.paragraph_format.keep_with_next = True
+            style_id = style.style_id
+        return style_id
+
+    def quote(self) -> str:
+        style_id = self.style_id("Quote")
+        if style_id is None:
+            style = self._add("Quote", WD_STYLE_TYPE.PARAGRAPH)
+            style.base_style = self._styles.default(WD_STYLE_TYPE.PARAGRAPH)
+            style.font.italic = True
+            style.paragraph_format.left_indent = Pt(36)
+            style_id = style.style_id
+        return style_id
+
+    def code(self) -> str:
+        style_id = self.style_id("macro")
+        if style_id is None:
+            style = self._add("macro", WD_STYLE_TYPE.PARAGRAPH)
+            style.base_style = self._styles.default(WD_STYLE_TYPE.PARAGRAPH)
+            style.font.name = "Courier New"
+            style.font.size = Pt(10)
+            style.paragraph_format.space_after = Pt(0)
+            style_id = style.style_id
+        return style_id
+
+    def run(self, fmt: str) -> str:
+        """styleId del estilo de caracter de un formato de run"""
+        name = _RUN_STYLES[fmt]
+        style_id = self.style_id(name)
+        if style_id is None:
+            style = self._add(name, WD_STYLE_TYPE.CHARACTER)
+            font = style.font
+            if fmt in ("strong", "strong_emphasis"):
+                font.bold = True
+            if fmt in ("emphasis", "strong_emphasis"):
+                font.italic = True
+            if fmt == "code":
+                font.name = "Courier New"
+            if fmt == "link":
+                font.color.rgb = RGBColor(0x05, 0x63, 0xC1)
+                font.underline = True
+            style_id = style.style_id
+        return style_id
+
+
+class _Writer:
+    """Genera el XML de los bloques en una sola pasada y lo inserta al final del cuerpo"""
+
+    def __init__(self, document):
+        self.document = document
+        self.part = document.part
+        self.styles = _Styles(self.part)
+        self.pending: List[str] = []
+        self.paragraphs = 0
+        self.tables = []
+        self.elements = []
+        self._table_width = None
+        self._links: Dict[str, str] = {}
+        self._numbering = None
+        self._next_num_id = 1
+        # Estilo de lista -> (abstractNumId, ilvl) de su numeracion, o None si no tiene
+        self._list_numbering: Dict[str, Optional[Tuple[str, int]]] = {}
+
+    # Runs y parrafos
+
+    def runs_xml(self, text: str) -> str:
+        parts = []
+        for value, fmt, url in inline_runs(text):
+            if fmt is None:
+                parts.append(f"<w:r>{text_xml(value)}</w:r>")
+                continue
+            run = f'<w:r><w:rPr><w:rStyle w:val="{self.styles.run(fmt)}"/></w:rPr>{text_xml(value)}</w:r>'
+            if fmt == "link":
+                # Los enlaces repetidos comparten la misma relacion
+                r_id = self._links.get(url)
+                if r_id is None:
+                    r_id = self._links[url] = self.part.relate_to(url, RT.HYPERLINK, is_external=True)
+                run = f'<w:hyperlink r:id="{r_id}" w:history="1">{run}</w:hyperlink>'
+            parts.append(run)
+        return "".join(parts)
+
+    def paragraph(self, content: str, style_id: Optional[str] = None, properties: str = "") -> None:
+        style = f'<w:pStyle w:val="{style_id}"/>' if style_id else ""
+        ppr = f"<w:pPr>{style}{properties}</w:pPr>" if style or properties else ""
+        self.pending.append(f"<w:p>{ppr}{content}</w:p>")
+        self.paragraphs += 1
+
+    # Listas numeradas: cada lista empieza en 1
+
+    def _restart(self, name: str) -> str:
+        """numPr de una nueva instancia de la numeracion del estilo, reiniciada en 1"""
+        if name not in self._list_numbering:
+            ppr = self.styles.get(name).pPr
+            numpr = ppr.numPr if ppr is not None else None
+            if numpr is None or numpr.numId is None:
+                self._list_numbering[name] = None
+            else:
+                if self._numbering is None:
+                    self._numbering = self.part.numbering_part.element
+                    # Siguiente numId libre, calculado una vez (add_num recorre todas las w:num)
+                    self._next_num_id = max(map(int, self._numbering.xpath("./w:num/@w:numId")), default=0) + 1
+                num = self._numbering.num_having_numId(numpr.numId.val)
+                ilvl = numpr.ilvl.val if numpr.ilvl is not None else 0
+                self._list_numbering[name] = (num.abstractNumId.val, ilvl)
+        numbering = self._list_numbering[name]
+        if numbering is None:
+            return ""
+
+        abstract_num_id, ilvl = numbering
+        num = CT_Num.new(self._next_num_id, abstract_num_id)
+        num.add_lvlOverride(ilvl=ilvl).add_startOverride(1)
+        self._numbering._insert_num(num)
+        self._next_num_id += 1
+        return f'<w:numPr><w:ilvl w:val="{ilvl}"/><w:numId w:val="{num.numId}"/></w:numPr>'
+
+    def list(self, items: List[Dict]) -> None:
+        numbering: Dict[int, Optional[str]] = {}
+        counters: Dict[int, int] = {}
+        for item in items:
+            level = item["level"]
+            ordered = item["ordered"]
+            # Una sublista nueva reinicia la numeracion de los niveles mas profundos
+            for deeper in [key for key in counters if key > level]:
+                del counters[deeper]
+                numbering.pop(deeper, None)
+            counters[level] = counters.get(level, 0) + 1
+
+            style_level = min(level, LIST_LEVELS - 1)
+            name = ("List Number" if ordered else "List Bullet") + (f" {style_level + 1}" if style_level else "")
+            style_id = self.styles.style_id(name)
+            content = self.runs_xml(item["text"])
+            if style_id is None:
+                # Sin estilos de lista: marca como texto y sangria por nivel
+                marker = f"{counters[level]}. " if ordered else "• "
+                indent = f'<w:ind w:left="{360 * (level + 1)}" w:hanging="360"/>'
+                self.paragraph(f"<w:r>{text_xml(marker)}</w:r>{content}", None, indent)
+                continue
+
+            numpr = ""
+            if ordered:
+                if numbering.get(level) is None:
+                    numbering[level] = self._restart(name)
+                numpr = numbering[level]
+            else:
+                numbering[level] = None
+            self.paragraph(content, style_id, numpr)
+
+    # Insercion en el documento
+
+    def flush(self) -> None:
+        """Analizar el XML pendiente una sola vez e insertarlo al final del cuerpo"""
+        if not self.pending:
+            return
+        fragment = parse_xml(f"<w:body {nsdecls('w', 'r')}>{''.join(self.pending)}</w:body>")
+        self.pending.clear()
+        elements = list(fragment)
+        append_to_body(self.document, elements)
+        self.elements.extend(elements)
+        body = self.part.document._body
+        self.tables.extend(Table(element, body) for element in elements if element.tag == _W_TBL)
+
+    def table(self, block: Dict) -> None:
+        if self._table_width is None:
+            # Ancho disponible de la ultima seccion, como document.add_table, calculado una vez
+            self._table_width = self.part.document._block_width
+        alignments = block["alignments"]
+        # styleId directo: table.style busca el estilo por nombre cada vez
+        self.pending.append(table_xml(
+            block["headers"] or None,
+            block["rows"],
+            block["cols"],
+            self._table_width,
+            self.styles.style_id("Table Grid"),
+            alignments=alignments,
+            header_alignment=alignments if alignments else "CENTER",
+        ))
+
+    def write(self, blocks: List[Dict]) -> None:
+        for block in blocks:
+            kind = block["type"]
+            if kind == "heading":
+                self.paragraph(self.runs_xml(block["text"]), self.styles.heading(block["level"]))
+            elif kind == "paragraph":
+                self.paragraph(self.runs_xml(block["text"]))
+            elif kind == "quote":
+                self.paragraph(self.runs_xml(block["text"]), self.styles.quote())
+            elif kind == "code":
+                text = block["text"]
+                self.paragraph(f"<w:r>{text_xml(text)}</w:r>" if text else "", self.styles.code())
+            elif kind == "list":
+                self.list(block["items"])
+            elif kind == "table":
+                self.table(block)
+            elif kind == "rule":
+                self.paragraph("", None, '<w:pBdr><w:bottom w:val="single" w:sz="6" w:space="1" w:color="auto"/></w:pBdr>')
+            elif kind == "page_break":
+                self.pending.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+                self.paragraphs += 1
+        self.flush()
+
+
+def append_blocks(document, blocks: List[Dict]) -> Dict:
+    """
+    Agregar al final del cuerpo los bloques (de parse_markdown o normalize_blocks).
+    Parrafos y tablas se generan como un unico fragmento XML, con
+    estilos de parrafo y de caracter en lugar de formato directo por run.
+
+    Retorna {"paragraphs", "tables" (objetos Table), "elements" (w:p y w:tbl agregados)}.
+    """
+    writer = _Writer(document)
+    writer.write(blocks)
+    return {"paragraphs": writer.paragraphs, "tables": writer.tables, "elements": writer.elements}
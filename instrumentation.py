@@ -0,0 +1,223 @@
+import bisect
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict
+
+# Nivel de log, destino (archivo; por defecto stderr) y fraccion de llamadas registradas en DEBUG
+LOG_LEVEL = os.environ.get("WORD_MCP_LOG_LEVEL", "WARNING").upper()
+LOG_FILE = os.environ.get("WORD_MCP_LOG_FILE")
+LOG_SAMPLE_RATE = float(os.environ.get("WORD_MCP_LOG_SAMPLE_RATE", "1.0"))
+
+# Limites superiores (ms) de los intervalos del histograma de latencia
+LATENCY_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+# Elementos de una lista que se miden al estimar el tamano de un argumento o resultado
+_SIZE_SAMPLE = 64
+
+logger = logging.getLogger("word_mcp")
+
+
+class JsonFormatter(logging.Formatter):
+    """Una linea JSON por registro, con los campos pasados en extra={"fields": {...}}"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Dejar pasar solo una fraccion de los registros DEBUG; los demas niveles pasan siempre"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+def configure_logging(level: str = LOG_LEVEL, filename: str = LOG_FILE, sample_rate: float = LOG_SAMPLE_RATE) -> None:
+    """
+    Enviar los logs del servidor a stderr (o a un archivo) en formato JSON.
+    Nunca se escribe en stdout, que es el canal del protocolo en modo stdio.
+    """
+    handler = logging.FileHandler(filename, encoding="utf-8") if filename else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    handler.addFilter(SamplingFilter(sample_rate))
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def log_event(level: int, event: str, exc_info=None, **fields) -> None:
+    if logger.isEnabledFor(level):
+        logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+
+def is_error_result(value) -> bool:
+    # Las herramientas informan los errores devolviendo un mensaje en lugar de lanzar excepciones
+    return isinstance(value, str) and value.startswith(("Error", "No se encontro"))
+
+
+def payload_size(value, depth: int = 0) -> int:
+    """
+    Tamano aproximado en bytes de un argumento o resultado, con coste acotado: de las
+    listas largas solo se miden los primeros elementos y se extrapola.
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return 8
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if depth >= 3:
+        return 8
+    if isinstance(value, dict):
+        items = list(value.items())
+        sample = items[:_SIZE_SAMPLE]
+        size = sum(payload_size(k, depth + 1) + payload_size(v, depth + 1) for k, v in sample)
+        return size * len(items) // len(sample) if sample else 2
+    if isinstance(value, (list, tuple)):
+        sample = value[:_SIZE_SAMPLE]
+        size = sum(payload_size(item, depth + 1) for item in sample)
+        return size * len(value) // len(sample) if sample else 2
+    # Objetos de python-docx y otros: no cruzan la frontera JSON como datos
+    return 8
+
+
+class ToolStats:
+    __slots__ = ("calls", "errors", "total_ms", "max_ms", "buckets", "args_bytes", "args_max", "result_bytes", "result_max")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.args_bytes = 0
+        self.args_max = 0
+        self.result_bytes = 0
+        self.result_max = 0
+
+    def percentile(self, q: float) -> float:
+        """Percentil estimado como el limite superior del intervalo que lo contiene"""
+        if not self.calls:
+            return 0.0
+        target = q / 100 * self.calls
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target and count:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 3),
+            "histogram_ms": {
+                (f"<={bound}" if i < len(LATENCY_BUCKETS_MS) else f">{LATENCY_BUCKETS_MS[-1]}"): count
+                for i, (bound, count) in enumerate(zip(LATENCY_BUCKETS_MS + [None], self.buckets)) if count
+            },
+            "args_bytes": {"total": self.args_bytes, "max": self.args_max},
+            "result_bytes": {"total": self.result_bytes, "max": self.result_max},
+        }
+
+
+class ToolMetrics:
+    """Contadores, histogramas de latencia y tamanos de argumentos/resultados por herramienta"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._tools: Dict[str, ToolStats] = {}
+
+    def record(self, name: str, elapsed_ms: float, error: bool, args_bytes: int, result_bytes: int) -> None:
+        with self._lock:
+            stats = self._tools.get(name)
+            if stats is None:
+                stats = self._tools[name] = ToolStats()
+            stats.calls += 1
+            stats.errors += error
+            stats.total_ms += elapsed_ms
+            if elapsed_ms > stats.max_ms:
+                stats.max_ms = elapsed_ms
+            stats.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+            stats.args_bytes += args_bytes
+            stats.result_bytes += result_bytes
+            if args_bytes > stats.args_max:
+                stats.args_max = args_bytes
+            if result_bytes > stats.result_max:
+                stats.result_max = result_bytes
+
+    def wrap(self, fn):
+        """Envolver una herramienta: mide cada llamada y registra errores y muestras en el log"""
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                elapsed_ms = (time.perf_counter() - start) * 1e3
+                self.record(name, elapsed_ms, True, payload_size(args) + payload_size(kwargs), 0)
+                log_event(logging.WARNING, "tool_exception", exc_info=True, tool=name, duration_ms=round(elapsed_ms, 3))
+                raise
+            elapsed_ms = (time.perf_counter() - start) * 1e3
+            error = is_error_result(result)
+            self.record(name, elapsed_ms, error, payload_size(args) + payload_size(kwargs), payload_size(result))
+            if error:
+                log_event(logging.WARNING, "tool_error", tool=name, duration_ms=round(elapsed_ms, 3), result=result)
+            else:
+                log_event(logging.DEBUG, "tool_call", tool=name, duration_ms=round(elapsed_ms, 3))
+            return result
+
+        return wrapper
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: stats.describe() for name, stats in sorted(self._tools.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tools.clear()
+            self.started_at = time.time()
+
+
+def instrument(mcp, metrics: ToolMetrics) -> None:
+    """
+    Hacer que @mcp.tool() registre y devuelva la version instrumentada de cada herramienta,
+    de modo que tambien las llamadas directas desde Python (y desde apply_operations) se miden.
+    """
+    register = mcp.tool
+
+    def tool(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+
+        def decorate(fn):
+            wrapped = metrics.wrap(fn)
+            decorator(wrapped)
+            return wrapped
+
+        return decorate
+
+    mcp.tool = tool
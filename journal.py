@@ -0,0 +1,689 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from copy import deepcopy
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from docx import Document
+from docx.oxml.ns import qn
+from lxml import etree
+
+from documents import blank_document
+from instrumentation import log_event
+from saving import snapshot_document, write_snapshot
+
+# Operaciones registradas entre dos puntos de control (acota el tiempo de recuperacion)
+CHECKPOINT_EVERY = int(os.environ.get("WORD_MCP_JOURNAL_CHECKPOINT", "500"))
+
+# Operaciones que pueden deshacerse por documento
+UNDO_DEPTH = int(os.environ.get("WORD_MCP_UNDO_DEPTH", "100"))
+
+# fsync de cada registro: sin el, un registro sobrevive a la caida del proceso pero no a la del sistema
+JOURNAL_FSYNC = os.environ.get("WORD_MCP_JOURNAL_FSYNC", "0") == "1"
+
+# Dias que se conservan los diarios de documentos que nadie recupero
+RETENTION_DAYS = float(os.environ.get("WORD_MCP_JOURNAL_RETENTION_DAYS", "7"))
+
+_W_SECTPR = qn("w:sectPr")
+
+# Texto de un elemento segun lxml (las clases de python-docx redefinen .text)
+_TEXT = etree.ElementBase.text
+
+_META = "meta.json"
+_MEDIA = "media"
+
+
+# Cambios de una operacion y sus inversas
+
+def _last_child(parent):
+    """Ultimo hijo de parent sin contar el sectPr final del cuerpo"""
+    for child in parent.iterchildren(reversed=True):
+        if child.tag != _W_SECTPR:
+            return child
+    return None
+
+
+def _swap(live, other) -> None:
+    """
+    Intercambiar el contenido de dos elementos. Los hijos que coinciden por posicion y
+    etiqueta se intercambian recursivamente y el resto se mueve de un arbol al otro,
+    sin copias: los elementos (y los identificadores de parrafos y runs) conservan su
+    identidad al deshacer y al rehacer.
+    """
+    attrib = dict(live.attrib)
+    live.attrib.clear()
+    live.attrib.update(other.attrib)
+    other.attrib.clear()
+    other.attrib.update(attrib)
+    text = _TEXT.__get__(live)
+    _TEXT.__set__(live, _TEXT.__get__(other))
+    _TEXT.__set__(other, text)
+
+    mine, theirs = list(live), list(other)
+    new_mine, new_theirs = [], []
+    for i in range(max(len(mine), len(theirs))):
+        a = mine[i] if i < len(mine) else None
+        b = theirs[i] if i < len(theirs) else None
+        if a is not None and b is not None and a.tag == b.tag and isinstance(a.tag, str):
+            _swap(a, b)
+            a.tail, b.tail = b.tail, a.tail
+            new_mine.append(a)
+            new_theirs.append(b)
+            continue
+        if b is not None:
+            new_mine.append(b)
+        if a is not None:
+            new_theirs.append(a)
+    live[:] = new_mine
+    other[:] = new_theirs
+
+
+def _detach(element, relocation):
+    """
+    Direccion de un elemento de un documento que se desaloja. Los que ya no estan en el
+    arbol se copian: aunque esten sueltos, lxml conservaria el documento anterior.
+    """
+    if element is None:
+        return None
+    address = relocation.address(element)
+    return address if address is not None else deepcopy(element)
+
+
+def _attach(value, relocation):
+    return relocation.element(value) if isinstance(value, tuple) else value
+
+
+class _Inserted:
+    """Elementos que una operacion agrego al final de parent"""
+
+    __slots__ = ("parent", "anchor", "elements")
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.anchor = _last_child(parent)
+        self.elements = []
+
+    def finish(self) -> None:
+        following = self.anchor.itersiblings() if self.anchor is not None else self.parent.iterchildren()
+        self.elements = [element for element in following if element.tag != _W_SECTPR]
+
+    def undo(self) -> List:
+        for element in self.elements:
+            self.parent.remove(element)
+        return []
+
+    def redo(self) -> List:
+        if self.anchor is not None:
+            previous = self.anchor
+            for element in self.elements:
+                previous.addnext(element)
+                previous = element
+        else:
+            self.parent[0:0] = self.elements
+        return self.elements
+
+    def detach(self, relocation) -> None:
+        self.parent = _detach(self.parent, relocation)
+        self.anchor = _detach(self.anchor, relocation)
+        self.elements = [_detach(element, relocation) for element in self.elements]
+
+    def attach(self, relocation) -> None:
+        self.parent = _attach(self.parent, relocation)
+        self.anchor = _attach(self.anchor, relocation)
+        self.elements = [_attach(element, relocation) for element in self.elements]
+
+
+class _Modified:
+    """Elemento modificado por una operacion; state guarda el contenido del estado contrario"""
+
+    __slots__ = ("element", "state")
+
+    def __init__(self, element):
+        self.element = element
+        self.state = deepcopy(element)
+
+    def finish(self) -> None:
+        pass
+
+    def undo(self) -> List:
+        _swap(self.element, self.state)
+        return [self.element]
+
+    redo = undo
+
+    def detach(self, relocation) -> None:
+        # state es una copia con su propio arbol
+        self.element = _detach(self.element, relocation)
+
+    def attach(self, relocation) -> None:
+        self.element = _attach(self.element, relocation)
+
+
+class _BlobReplaced:
+    """Parte binaria (imagen) cuyo contenido reemplaza una operacion; blob guarda el del estado contrario"""
+
+    __slots__ = ("part", "blob")
+
+    def __init__(self, part):
+        self.part = part
+        self.blob = part.blob
+
+    def finish(self) -> None:
+        pass
+
+    def undo(self) -> List:
+        self.part._blob, self.blob = self.blob, self.part._blob
+        # ImagePart conserva las dimensiones leidas del contenido anterior
+        if hasattr(self.part, "_image"):
+            self.part._image = None
+        return []
+
+    redo = undo
+
+    def detach(self, relocation) -> None:
+        self.part = relocation.part_address(self.part)
+
+    def attach(self, relocation) -> None:
+        self.part = relocation.part(self.part)
+
+
+class Change:
+    """
+    Cambios de una operacion sobre el XML del documento, con lo necesario para
+    deshacerla y rehacerla: los elementos agregados (se quitan y se vuelven a poner),
+    una copia de los elementos modificados tomada antes de la operacion y el contenido
+    anterior de las imagenes reemplazadas. Las partes auxiliares que la operacion
+    agrego (estilos, imagenes) se conservan.
+    """
+
+    __slots__ = ("op", "actions", "checkpointed")
+
+    def __init__(self, op: str):
+        self.op = op
+        self.actions = []
+        # La operacion es anterior al ultimo punto de control (el diario ya no la contiene)
+        self.checkpointed = False
+
+    def inserted(self, parent) -> None:
+        """Antes de la operacion: registrar que agregara elementos al final de parent"""
+        self.actions.append(_Inserted(parent))
+
+    def modified(self, element) -> None:
+        """Antes de la operacion: registrar que modificara element"""
+        self.actions.append(_Modified(element))
+
+    def blob_replaced(self, part) -> None:
+        """Antes de la operacion: registrar que reemplazara el contenido de part"""
+        self.actions.append(_BlobReplaced(part))
+
+    def finish(self) -> None:
+        for action in self.actions:
+            action.finish()
+
+    def undo(self) -> List:
+        """Deshacer; retorna los elementos cuyo texto cambio"""
+        return [element for action in reversed(self.actions) for element in action.undo()]
+
+    def redo(self) -> List:
+        return [element for action in self.actions for element in action.redo()]
+
+    def detach(self, relocation) -> None:
+        """Cambiar los elementos y partes por su direccion en el documento que se desaloja"""
+        for action in self.actions:
+            action.detach(relocation)
+
+    def attach(self, relocation) -> None:
+        """Volver a asociar las direcciones a los elementos y partes del documento recargado"""
+        for action in self.actions:
+            action.attach(relocation)
+
+
+# Diario en disco
+
+def _process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _write_json(path: str, data) -> None:
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def _read_json(path: str, default=None):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _modified(directory: str) -> float:
+    """Fecha del ultimo cambio de un diario (la del directorio no cambia al agregar registros)"""
+    return max((entry.stat().st_mtime for entry in os.scandir(directory)), default=os.path.getmtime(directory))
+
+
+def _numbered(directory: str, prefix: str, suffix: str) -> List[Tuple[int, str]]:
+    """(numero, ruta) de los archivos <prefix><numero><suffix>, en orden"""
+    found = []
+    for name in os.listdir(directory):
+        number = name[len(prefix):-len(suffix)]
+        if name.startswith(prefix) and name.endswith(suffix) and number.isdigit():
+            found.append((int(number), os.path.join(directory, name)))
+    return sorted(found)
+
+
+class _DocumentState:
+    """Diario y pilas de deshacer/rehacer de un documento"""
+
+    __slots__ = ("doc_id", "directory", "part", "seq", "segment", "since_checkpoint", "undo", "redo", "replaying")
+
+    def __init__(self, doc_id: str, directory: Optional[str], part, seq: int = 0):
+        self.doc_id = doc_id
+        self.directory = directory
+        self.part = part
+        self.seq = seq
+        # Los registros se escriben en journal-<seq del primero>.jsonl
+        self.segment = os.path.join(directory, f"journal-{seq}.jsonl") if directory else None
+        self.since_checkpoint = 0
+        self.undo = deque(maxlen=UNDO_DEPTH)
+        self.redo = []
+        self.replaying = False
+
+
+class Journal:
+    """
+    Diario de operaciones por documento, para recuperar el trabajo si el proceso
+    termina sin guardar y para deshacer y rehacer.
+
+    Cada operacion que modifica un documento agrega una linea JSON (herramienta,
+    argumentos e identificadores devueltos) a <directorio>/<doc_id>/journal-<n>.jsonl.
+    Cada CHECKPOINT_EVERY operaciones el documento se guarda como checkpoint-<n>.docx
+    (en un hilo, a partir de una instantanea) y los registros anteriores se borran,
+    de modo que recuperar un documento es abrir el ultimo punto de control y volver
+    a ejecutar como mucho CHECKPOINT_EVERY operaciones.
+
+    Deshacer aplica la inversa de la operacion (ver Change) en lugar de guardar
+    copias del documento. Los puntos de control no afectan a las pilas de deshacer y
+    rehacer: deshacer o rehacer una operacion anterior al ultimo punto de control,
+    que el diario ya no puede volver a aplicar, crea un punto de control nuevo.
+
+    Con directory=None no se escribe nada en disco y solo se ofrece deshacer/rehacer.
+    """
+
+    def __init__(self, directory: Optional[str], elements_of: Callable[[object], Iterable[Tuple[str, object]]],
+                 checkpoint_every: int = CHECKPOINT_EVERY):
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        # (identificador, elemento) de los objetos con identificador de un documento
+        self._elements_of = elements_of
+        self._states: Dict[str, _DocumentState] = {}
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-checkpoint")
+
+    def _path(self, doc_id: str, *names: str) -> str:
+        return os.path.join(self.directory, doc_id, *names)
+
+    def _claim(self, doc_id: str, source_path: str = None) -> str:
+        directory = self._path(doc_id)
+        os.makedirs(os.path.join(directory, _MEDIA), exist_ok=True)
+        meta = _read_json(os.path.join(directory, _META), {"doc_id": doc_id, "source_path": source_path})
+        meta["pid"] = os.getpid()
+        _write_json(os.path.join(directory, _META), meta)
+        return directory
+
+    def _state(self, doc_id: str, document) -> _DocumentState:
+        with self._lock:
+            state = self._states.get(doc_id)
+            if state is None:
+                directory = self._claim(doc_id) if self.directory else None
+                state = self._states[doc_id] = _DocumentState(doc_id, directory, document.part)
+        if state.part is not document.part:
+            # Los cambios guardados apuntan a otro arbol (un documento recargado sin attach())
+            state.part = document.part
+            state.undo.clear()
+            state.redo.clear()
+        return state
+
+    # Registro
+
+    def opened(self, doc_id: str, source_path: str) -> None:
+        """Conservar una copia del archivo abierto como punto de control inicial del documento"""
+        if not self.directory:
+            return
+        try:
+            directory = self._claim(doc_id, os.path.abspath(source_path))
+            shutil.copyfile(source_path, os.path.join(directory, "checkpoint-0.docx"))
+        except OSError:
+            # Sin copia del original el documento no podra recuperarse, pero sigue abierto
+            log_event(logging.WARNING, "journal_open_failed", exc_info=True, doc_id=doc_id, source_path=source_path)
+
+    def _append(self, state: _DocumentState, record: Dict) -> None:
+        if state.replaying or state.directory is None:
+            return
+        record["seq"] = state.seq
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+        with open(state.segment, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            if JOURNAL_FSYNC:
+                f.flush()
+                os.fsync(f.fileno())
+        state.seq += 1
+        state.since_checkpoint += 1
+
+    def record(self, doc_id: str, document, op: str, arguments: Dict, result, change: Change,
+               files: Iterable[str] = ()) -> None:
+        """Registrar una operacion ya aplicada; arguments debe contener solo valores serializables o imagenes"""
+        change.finish()
+        state = self._state(doc_id, document)
+        if not state.replaying and state.directory is not None:
+            record = {"op": op, "args": self._encode(state, arguments, files)}
+            if result is not None:
+                record["result"] = result
+            self._append(state, record)
+        state.undo.append(change)
+        state.redo.clear()
+        if state.directory and not state.replaying and state.since_checkpoint >= self.checkpoint_every:
+            self.checkpoint(doc_id, document)
+
+    def saved(self, doc_id: str, filename: str) -> None:
+        """Anotar que el documento se guardo (para informar de los cambios pendientes al recuperar)"""
+        state = self._states.get(doc_id)
+        if state is None or state.directory is None:
+            return
+        meta = _read_json(os.path.join(state.directory, _META), {})
+        meta.update(saved_path=os.path.abspath(filename), saved_seq=state.seq)
+        _write_json(os.path.join(state.directory, _META), meta)
+
+    def _encode(self, state: _DocumentState, arguments: Dict, files: Iterable[str]) -> Dict:
+        # Las imagenes se copian al diario: el archivo original puede cambiar o desaparecer
+        encoded = {}
+        for name, value in arguments.items():
+            if name in files and isinstance(value, list):
+                value = [self._media(state, item) for item in value]
+            elif name in files or isinstance(value, (bytes, bytearray)):
+                value = self._media(state, value)
+            encoded[name] = value
+        return encoded
+
+    def _media(self, state: _DocumentState, value):
+        if state.directory is None:
+            return value
+        if isinstance(value, str) and os.path.isfile(value):
+            # Los archivos (imagenes, datos de una tabla) se copian por bloques, sin leerlos completos
+            name = _file_sha1(value) + os.path.splitext(value)[1]
+            path = os.path.join(state.directory, _MEDIA, name)
+            if not os.path.exists(path):
+                shutil.copyfile(value, path)
+            # Se devuelve como ruta aunque sea un .npy (los $media .npy son matrices)
+            return {"$file": name}
+        if isinstance(value, (bytes, bytearray)):
+            data, extension = bytes(value), ""
+        elif type(value).__module__ == "numpy":
+            import numpy as np
+            data, extension = value, ".npy"
+        else:
+            return value
+        payload = data.tobytes() if extension == ".npy" else data
+        name = hashlib.sha1(payload).hexdigest() + extension
+        path = os.path.join(state.directory, _MEDIA, name)
+        if not os.path.exists(path):
+            if extension == ".npy":
+                np.save(path, data)
+            else:
+                with open(path, "wb") as f:
+                    f.write(data)
+        return {"$media": name}
+
+    def arguments(self, doc_id: str, record: Dict) -> Dict:
+        """Argumentos de un registro del diario, con las imagenes leidas de vuelta"""
+        def decode(value):
+            if isinstance(value, list):
+                return [decode(item) for item in value]
+            if isinstance(value, dict) and set(value) == {"$file"}:
+                return self._path(doc_id, _MEDIA, value["$file"])
+            if isinstance(value, dict) and set(value) == {"$media"}:
+                path = self._path(doc_id, _MEDIA, value["$media"])
+                if path.endswith(".npy"):
+                    import numpy as np
+                    return np.load(path)
+                if "." in value["$media"]:
+                    return path
+                with open(path, "rb") as f:
+                    return f.read()
+            return value
+
+        return {name: decode(value) for name, value in record.get("args", {}).items()}
+
+    # Deshacer y rehacer
+
+    def undo(self, doc_id: str, document) -> Optional[Tuple[Change, List]]:
+        """
+        Deshacer la ultima operacion del documento. Retorna (cambio, elementos cuyo texto
+        cambio), o None si no hay nada que deshacer.
+        """
+        return self._move(doc_id, document, "undo")
+
+    def redo(self, doc_id: str, document) -> Optional[Tuple[Change, List]]:
+        return self._move(doc_id, document, "redo")
+
+    def _move(self, doc_id: str, document, direction: str) -> Optional[Tuple[Change, List]]:
+        state = self._state(doc_id, document)
+        source, target = (state.undo, state.redo) if direction == "undo" else (state.redo, state.undo)
+        if not source:
+            return None
+        change = source.pop()
+        touched = getattr(change, direction)()
+        target.append(change)
+        self._append(state, {"op": "$" + direction})
+        if change.checkpointed and state.directory and not state.replaying:
+            # Al recuperar no habria una operacion que deshacer: el resultado pasa a ser el punto de control
+            self.checkpoint(doc_id, document)
+        return change, touched
+
+    def can_undo(self, doc_id: str) -> Tuple[int, int]:
+        """(operaciones que pueden deshacerse, operaciones que pueden rehacerse)"""
+        state = self._states.get(doc_id)
+        return (len(state.undo), len(state.redo)) if state is not None else (0, 0)
+
+    # Desalojo
+
+    def detach(self, doc_id: str, relocation) -> None:
+        """Antes de desalojar el documento: el historial pasa a apuntar a direcciones"""
+        state = self._states.get(doc_id)
+        if state is None:
+            return
+        for change in (*state.undo, *state.redo):
+            change.detach(relocation)
+        state.part = None
+
+    def attach(self, doc_id: str, document, relocation) -> None:
+        """Al recargar el documento desalojado: el historial vuelve a apuntar a sus elementos"""
+        state = self._states.get(doc_id)
+        if state is None:
+            return
+        for change in (*state.undo, *state.redo):
+            change.attach(relocation)
+        state.part = document.part
+
+    # Puntos de control
+
+    def checkpoint(self, doc_id: str, document) -> None:
+        """
+        Guardar el estado actual como punto de control y empezar un segmento nuevo del
+        diario. La instantanea se toma aqui (con el documento bloqueado por la llamada);
+        la escritura y el borrado de los registros anteriores se hacen en otro hilo.
+        """
+        state = self._state(doc_id, document)
+        if state.directory is None:
+            return
+        items = snapshot_document(document)
+        ordinals = {element: i for i, element in enumerate(document.element.iter())}
+        handles = {}
+        for handle, element in self._elements_of(document):
+            if element in ordinals:
+                handles[handle] = ordinals[element]
+
+        seq = state.seq
+        state.segment = os.path.join(state.directory, f"journal-{seq}.jsonl")
+        state.since_checkpoint = 0
+        for change in (*state.undo, *state.redo):
+            change.checkpointed = True
+        self._writer.submit(self._write_checkpoint, state.directory, seq, items, handles)
+
+    def _write_checkpoint(self, directory: str, seq: int, items, handles: Dict[str, int]) -> None:
+        try:
+            # Primero los identificadores: un checkpoint-<n>.docx existente siempre esta completo
+            _write_json(os.path.join(directory, f"handles-{seq}.json"), handles)
+            write_snapshot(items, os.path.join(directory, f"checkpoint-{seq}.docx"))
+            for prefix, suffix in (("checkpoint-", ".docx"), ("handles-", ".json"), ("journal-", ".jsonl")):
+                for number, path in _numbered(directory, prefix, suffix):
+                    if number < seq:
+                        os.remove(path)
+        except OSError:
+            # El documento se cerro mientras tanto, o el disco fallo: el diario anterior sigue valido
+            log_event(logging.WARNING, "journal_checkpoint_failed", exc_info=True, directory=directory, seq=seq)
+
+    def flush(self) -> None:
+        """Esperar a que terminen los puntos de control pendientes"""
+        self._writer.submit(lambda: None).result()
+
+    # Ciclo de vida
+
+    def release(self, doc_id: str) -> None:
+        """Olvidar el estado en memoria de un documento (el diario en disco se conserva)"""
+        with self._lock:
+            self._states.pop(doc_id, None)
+
+    def discard(self, doc_id: str) -> None:
+        """Olvidar un documento cerrado a proposito y borrar su diario"""
+        self.release(doc_id)
+        if self.directory:
+            self._writer.submit(shutil.rmtree, self._path(doc_id), True)
+
+    # Recuperacion
+
+    def _recoverable(self, doc_id: str, meta: Dict) -> bool:
+        if doc_id in self._states:
+            return False
+        pid = meta.get("pid")
+        return pid == os.getpid() or not isinstance(pid, int) or not _process_alive(pid)
+
+    def _records(self, doc_id: str, start: int) -> Iterable[Dict]:
+        for number, path in _numbered(self._path(doc_id), "journal-", ".jsonl"):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Linea incompleta: el proceso termino mientras la escribia
+                        break
+                    if record["seq"] >= start:
+                        yield record
+
+    def _checkpoint_seq(self, doc_id: str) -> Tuple[int, Optional[str]]:
+        checkpoints = _numbered(self._path(doc_id), "checkpoint-", ".docx")
+        return checkpoints[-1] if checkpoints else (0, None)
+
+    def recoverable(self) -> List[Dict]:
+        """Documentos con diario que ningun proceso en marcha esta usando"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        found = []
+        for entry in os.scandir(self.directory):
+            meta = _read_json(os.path.join(entry.path, _META))
+            if meta is None or not self._recoverable(entry.name, meta):
+                continue
+            start, _ = self._checkpoint_seq(entry.name)
+            last = start - 1
+            for record in self._records(entry.name, start):
+                last = record["seq"]
+            found.append({
+                "doc_id": entry.name,
+                "source_path": meta.get("source_path"),
+                "saved_path": meta.get("saved_path"),
+                "unsaved_changes": last >= meta.get("saved_seq", 0),
+                "modified": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(_modified(entry.path))),
+            })
+        return found
+
+    def load(self, doc_id: str):
+        """
+        Abrir el ultimo punto de control de un documento del diario y tomar posesion de
+        el. Retorna (documento, {identificador: elemento} del punto de control, registros
+        posteriores, ruta de origen). Los registros se vuelven a aplicar con replay().
+        """
+        meta = _read_json(self._path(doc_id, _META))
+        if meta is None or not self._recoverable(doc_id, meta):
+            raise KeyError(f"No se encontro un diario recuperable para el documento '{doc_id}'")
+        start, checkpoint = self._checkpoint_seq(doc_id)
+        document = Document(checkpoint) if checkpoint else blank_document()
+
+        handles = {}
+        ordinals = _read_json(self._path(doc_id, f"handles-{start}.json"), {})
+        if ordinals:
+            elements = list(document.element.iter())
+            handles = {handle: elements[i] for handle, i in ordinals.items() if i < len(elements)}
+
+        records = list(self._records(doc_id, start))
+        with self._lock:
+            self._claim(doc_id)
+            # Los registros nuevos van a un segmento nuevo: el ultimo puede terminar en una linea incompleta
+            seq = records[-1]["seq"] + 1 if records else start
+            self._states[doc_id] = _DocumentState(doc_id, self._path(doc_id), document.part, seq)
+            self._states[doc_id].since_checkpoint = len(records)
+        return document, handles, records, meta.get("source_path")
+
+    @contextmanager
+    def replaying(self, doc_id: str):
+        """Volver a aplicar registros del diario sin escribirlos de nuevo"""
+        state = self._states[doc_id]
+        state.replaying = True
+        try:
+            yield
+        finally:
+            state.replaying = False
+
+    def prune(self, max_age_days: float = RETENTION_DAYS) -> int:
+        """Borrar los diarios recuperables sin cambios desde hace mas de max_age_days"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return 0
+        limit = time.time() - max_age_days * 86400
+        removed = 0
+        for entry in os.scandir(self.directory):
+            meta = _read_json(os.path.join(entry.path, _META))
+            if meta is not None and self._recoverable(entry.name, meta) and _modified(entry.path) < limit:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        return removed
@@ -0,0 +1,179 @@
+import csv
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from docx import Document
+from docx.oxml.ns import qn
+
+from bulk import run_tasks
+from documents import clone_document
+from merge import SourcePackage
+from saving import atomic_save
+from search import paragraph_text, replace_in_paragraph, text_roots
+from templates import PLACEHOLDER, CompiledTemplate
+
+# Registros que procesa cada tarea enviada a un proceso de trabajo
+MERGE_BATCH_SIZE = 32
+
+# Errores que se detallan en el resultado (el resto solo se cuentan)
+MAX_REPORTED_ERRORS = 100
+
+_W_P = qn("w:p")
+
+# Plantillas analizadas que se conservan en cada proceso (las usadas mas recientemente)
+_TEMPLATE_CACHE_SIZE = 4
+
+# Plantillas analizadas en este proceso: ruta -> ((mtime, tamano), documento, ubicaciones)
+_templates: "OrderedDict[str, Tuple]" = OrderedDict()
+
+
+def load_template(path: str):
+    """
+    Documento plantilla analizado una sola vez por proceso (mientras el archivo no cambie
+    y este entre las _TEMPLATE_CACHE_SIZE usadas mas recientemente), junto con la
+    ubicacion de los parrafos que contienen variables: una lista por raiz de text_roots
+    con los indices de esos parrafos.
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _templates.get(path)
+    if cached is not None and cached[0] == key:
+        _templates.move_to_end(path)
+        return cached[1], cached[2]
+
+    document = Document(path)
+    locations = [
+        [i for i, p in enumerate(root.iter(_W_P)) if PLACEHOLDER.search(paragraph_text(p))]
+        for root in text_roots(document)
+    ]
+    _templates[path] = (key, document, locations)
+    _templates.move_to_end(path)
+    while len(_templates) > _TEMPLATE_CACHE_SIZE:
+        _templates.popitem(last=False)
+    return document, locations
+
+
+def render_document(master, locations: List[List[int]], record: Dict):
+    """Clonar la plantilla y sustituir sus variables {nombre}; las que faltan en record se dejan tal cual"""
+    document = clone_document(master)
+    for root, indices in zip(text_roots(document), locations):
+        if not indices:
+            continue
+        paragraphs = list(root.iter(_W_P))
+        for i in indices:
+            p = paragraphs[i]
+            spans = [
+                (match.start(), match.end(), _format_value(record[match.group(1)]))
+                for match in PLACEHOLDER.finditer(paragraph_text(p))
+                if match.group(1) in record
+            ]
+            if spans:
+                replace_in_paragraph(p, spans)
+    return document
+
+
+def _format_value(value) -> str:
+    return "" if value is None else str(value)
+
+
+def merge_batch(template_path: str, batch: List[Tuple[int, Dict, str]]) -> Tuple[int, List[Dict]]:
+    """Generar y escribir los documentos de un lote (se ejecuta en un proceso de trabajo)"""
+    written = 0
+    errors = []
+    try:
+        master, locations = load_template(template_path)
+    except Exception as e:
+        return 0, [{"record": n, "error": f"{type(e).__name__}: {e}"} for n, _, _ in batch]
+    for n, record, target in batch:
+        try:
+            atomic_save(render_document(master, locations, record), target)
+            written += 1
+        except Exception as e:
+            errors.append({"record": n, "error": f"{type(e).__name__}: {e}"})
+    return written, errors
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """
+    Registros de un archivo CSV (con encabezados), JSON (lista de objetos) o JSON Lines.
+    CSV y JSON Lines se leen de forma incremental.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+    elif extension in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif extension == ".json":
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f)
+        if not isinstance(records, list):
+            raise ValueError("El archivo JSON debe contener una lista de objetos")
+        yield from records
+    else:
+        raise ValueError(f"Formato de datos no soportado: {extension} (use .csv, .json o .jsonl)")
+
+
+def _output_names(records: Iterable[Dict], output_dir: str, filename: str) -> Iterator[Tuple[int, Dict, str]]:
+    """(numero, registro, ruta) con nombres unicos; {n} es el numero de registro desde 1"""
+    name_template = CompiledTemplate(filename)
+    used = set()
+    for n, record in enumerate(records, 1):
+        if not isinstance(record, dict):
+            raise ValueError(f"El registro {n} no es un objeto")
+        values = {key: _format_value(value).replace("/", "_").replace(os.sep, "_") for key, value in record.items()}
+        name = name_template.render({"n": n, **values})
+        if not name.endswith(".docx"):
+            name += ".docx"
+        if name in used:
+            name = f"{name[:-5]}_{n}.docx"
+        used.add(name)
+        yield n, record, os.path.join(output_dir, name)
+
+
+def _batches(items: Iterator, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def mail_merge(template_path: str, records: Iterable[Dict], output_dir: str,
+               filename: str = "documento_{n}.docx", max_workers: int = None) -> Dict:
+    """
+    Generar un documento por registro a partir de la plantilla.
+
+    Los registros se envian a los procesos de trabajo por lotes y nunca hay mas de dos
+    lotes pendientes por proceso, de modo que la memoria no crece con el numero de
+    registros. Cada documento se escribe a disco en cuanto se genera.
+    """
+    template_path = os.path.abspath(template_path)
+    # Validar la plantilla antes de repartir el trabajo, sin analizarla: la analiza
+    # cada proceso de trabajo
+    with SourcePackage(template_path):
+        pass
+    os.makedirs(output_dir, exist_ok=True)
+
+    batches = _batches(_output_names(records, output_dir, filename), MERGE_BATCH_SIZE)
+    summary = {"records": 0, "written": 0, "failed": 0, "errors": [], "output_dir": output_dir}
+
+    def tasks():
+        for batch in batches:
+            summary["records"] += len(batch)
+            yield template_path, batch
+
+    for future in run_tasks(merge_batch, tasks(), max_workers):
+        written, errors = future.result()
+        summary["written"] += written
+        summary["failed"] += len(errors)
+        summary["errors"].extend(errors[:MAX_REPORTED_ERRORS - len(summary["errors"])])
+    return summary
@@ -0,0 +1,128 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+from docx.opc.part import XmlPart
+from docx.oxml.ns import qn
+from docx.parts.image import ImagePart
+from lxml import etree
+
+from bulk import run_tasks
+from images import DEFAULT_DPI, JPEG_QUALITY, recompress_image
+
+_EMU_PER_INCH = 914400
+
+_R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_R_EMBED = qn("r:embed")
+_DRAWINGS = (qn("wp:inline"), qn("wp:anchor"))
+_WP_EXTENT = qn("wp:extent")
+_A_SRC_RECT = qn("a:srcRect")
+
+# Atributos r:id, r:embed, r:link... de un elemento y sus descendientes
+_RELATIONSHIP_ATTRIBUTES = etree.XPath(".//@*[namespace-uri()=$ns]")
+
+
+def image_parts(document) -> List[ImagePart]:
+    return [part for part in document.part.package.iter_parts() if isinstance(part, ImagePart)]
+
+
+def _blip_extent(blip) -> Optional[Tuple[float, float]]:
+    """Tamano (EMU) de la imagen completa de un a:blip segun su dibujo, contando el recorte"""
+    drawing = next(blip.iterancestors(*_DRAWINGS), None)
+    extent = drawing.find(_WP_EXTENT) if drawing is not None else None
+    if extent is None:
+        return None
+    try:
+        cx, cy = int(extent.get("cx")), int(extent.get("cy"))
+        crop = blip.getparent().find(_A_SRC_RECT)
+        if crop is not None:
+            # Recorte en milesimas de porcentaje por lado: lo visible es una fraccion de la imagen
+            cx /= max(1 - (int(crop.get("l", 0)) + int(crop.get("r", 0))) / 100000, 0.01)
+            cy /= max(1 - (int(crop.get("t", 0)) + int(crop.get("b", 0))) / 100000, 0.01)
+    except (TypeError, ValueError):
+        return None
+    return cx, cy
+
+
+def display_extents(document) -> Dict[ImagePart, Optional[Tuple[float, float]]]:
+    """
+    Tamano maximo (ancho y alto en EMU) con que se muestra cada imagen en el documento,
+    en cuerpo, encabezados y pies. None si alguna referencia a la imagen no lo indica
+    (imagenes VML, partes que python-docx no analiza): esas imagenes no se reducen.
+    """
+    extents: Dict[ImagePart, Optional[Tuple[float, float]]] = {}
+    for part in document.part.package.iter_parts():
+        images = {
+            rId: rel.target_part for rId, rel in part.rels.items()
+            if not rel.is_external and isinstance(rel.target_part, ImagePart)
+        }
+        if not images:
+            continue
+        if not isinstance(part, XmlPart):
+            for image in images.values():
+                extents[image] = None
+            continue
+        for attribute in _RELATIONSHIP_ATTRIBUTES(part.element, ns=_R_NS):
+            image = images.get(str(attribute))
+            if image is None:
+                continue
+            extent = _blip_extent(attribute.getparent()) if attribute.attrname == _R_EMBED else None
+            previous = extents.get(image, extent)
+            if extent is None or previous is None:
+                extents[image] = None
+            else:
+                extents[image] = (max(extent[0], previous[0]), max(extent[1], previous[1]))
+    return extents
+
+
+def _outcome(call) -> tuple:
+    """Resultado de recompress_image; una imagen que falla se omite sin detener las demas"""
+    try:
+        return call()
+    except Exception as e:
+        return None, None, None, f"error: {e}"
+
+
+def optimize_images(document, dpi: Optional[int] = DEFAULT_DPI, jpeg_quality: int = JPEG_QUALITY,
+                    max_workers: int = None) -> Dict:
+    """
+    Volver a comprimir las imagenes del documento en procesos de trabajo, reducidas al
+    mayor tamano con que se muestran (a dpi pixeles por pulgada; None o 0 para no
+    reducir). Las partes cuyo resultado no es menor quedan como estan.
+
+    Nunca hay mas de dos imagenes pendientes por proceso, de modo que la memoria no
+    crece con el numero de imagenes. Retorna el detalle por parte y los totales.
+    """
+    extents = display_extents(document)
+    parts = image_parts(document)
+    tasks = []
+    for part in parts:
+        extent = extents.get(part)
+        target = None
+        if extent is not None and dpi:
+            target = tuple(max(1, math.ceil(emu / _EMU_PER_INCH * dpi)) for emu in extent)
+        tasks.append((part.blob, part.content_type, target, jpeg_quality))
+
+    summary = {"images": len(parts), "optimized": 0, "bytes_before": 0, "bytes_after": 0, "bytes_saved": 0, "parts": []}
+
+    def collect(part, result):
+        blob, size, new_size, reason = result
+        before = len(part.blob)
+        entry = {"part": str(part.partname), "content_type": part.content_type, "before": before}
+        if blob is None:
+            entry.update(after=before, saved=0, skipped=reason)
+        else:
+            part._blob = blob
+            # Las dimensiones de la imagen se vuelven a leer del nuevo contenido
+            part._image = None
+            entry.update(after=len(blob), saved=before - len(blob), resized=size != new_size, pixels=list(new_size))
+            summary["optimized"] += 1
+        summary["bytes_before"] += before
+        summary["bytes_after"] += entry["after"]
+        summary["parts"].append(entry)
+
+    workers = 1 if len(tasks) <= 1 else max_workers
+    for part, future in zip(parts, run_tasks(recompress_image, tasks, workers)):
+        collect(part, _outcome(future.result))
+
+    summary["bytes_saved"] = summary["bytes_before"] - summary["bytes_after"]
+    return summary
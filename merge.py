@@ -0,0 +1,579 @@
+import hashlib
+import posixpath
+import re
+import zipfile
+from copy import deepcopy
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.opc.part import PartFactory
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.parts.image import ImagePart
+from docx.parts.numbering import NumberingPart
+from lxml import etree
+
+from streaming import append_to_body, is_streaming
+
+_R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+_RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_W_VAL = qn("w:val")
+_W_ID = qn("w:id")
+_W_NUM_ID = qn("w:numId")
+_W_ABSTRACT_NUM_ID = qn("w:abstractNumId")
+_W_NUM = qn("w:num")
+_W_ABSTRACT_NUM = qn("w:abstractNum")
+_W_NUM_ID_MAC = qn("w:numIdMacAtCleanup")
+_W_LVL_OVERRIDE = qn("w:lvlOverride")
+_STYLE_REFS = (qn("w:pStyle"), qn("w:rStyle"), qn("w:tblStyle"))
+_STYLE_LINKS = (qn("w:basedOn"), qn("w:next"), qn("w:link"))
+_BOOKMARKS = (qn("w:bookmarkStart"), qn("w:bookmarkEnd"))
+_DOC_PR = qn("wp:docPr")
+
+# Referencias a notas al pie, notas finales y comentarios (sus partes no se combinan)
+# y marcas de rango de los comentarios
+_NOTE_REFS = (qn("w:footnoteReference"), qn("w:endnoteReference"), qn("w:commentReference"))
+_COMMENT_RANGES = (qn("w:commentRangeStart"), qn("w:commentRangeEnd"))
+
+# Partes equivalentes (mismo contenido y relaciones) salvo el identificador de la definicion
+_ABSTRACT_NUM_NOISE = re.compile(rb'<w:nsid [^>]*/>|<w:tmpl [^>]*/>| w:abstractNumId="\d+"')
+_PARTNAME_NUMBER = re.compile(r"\d*(\.[^./]+)$")
+_RID_NUMBER = re.compile(r"rId(\d+)$")
+
+# Atributos r:id, r:embed, r:link... de un elemento y sus descendientes
+_RELATIONSHIP_ATTRIBUTES = etree.XPath(".//@*[namespace-uri()=$ns]")
+
+_PAGE_BREAK = f'<w:p {nsdecls("w")}><w:r><w:br w:type="page"/></w:r></w:p>'
+
+# Estilos y numeracion de origen ya analizados que se conservan (por contenido)
+_SOURCE_CACHE_SIZE = 8
+
+
+def _max_int(values, default: int = 0) -> int:
+    numbers = [int(value) for value in values if value is not None and value.lstrip("-").isdigit()]
+    return max(numbers, default=default)
+
+
+class SourcePackage:
+    """
+    Lectura bajo demanda de un .docx de origen.
+
+    A diferencia de Document(path), que descomprime y analiza todas las partes del
+    paquete, solo se leen las partes que el contenido agregado usa: el cuerpo siempre,
+    los estilos y la numeracion solo si hacen falta, y las imagenes u otras partes
+    referenciadas por sus relaciones.
+    """
+
+    def __init__(self, path: str):
+        self._zip = zipfile.ZipFile(path)
+        self._members = {info.filename: info for info in self._zip.infolist()}
+        self._rels: Dict[str, Dict[str, Tuple[str, str, bool]]] = {}
+        try:
+            self._load_content_types()
+            self.document = self.related("/", RT.OFFICE_DOCUMENT)
+        except Exception:
+            self._zip.close()
+            raise
+        if self.document is None:
+            self._zip.close()
+            raise ValueError("el archivo no contiene un documento de Word")
+
+    def _load_content_types(self) -> None:
+        types = etree.fromstring(self._zip.read("[Content_Types].xml"))
+        self._defaults = {
+            default.get("Extension").lower(): default.get("ContentType")
+            for default in types.iterchildren(f"{{{_CT_NS}}}Default")
+        }
+        self._overrides = {
+            override.get("PartName").lower(): override.get("ContentType")
+            for override in types.iterchildren(f"{{{_CT_NS}}}Override")
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._zip.close()
+
+    def content_type(self, partname: str) -> str:
+        content_type = self._overrides.get(partname.lower())
+        if content_type is None:
+            content_type = self._defaults.get(posixpath.splitext(partname)[1][1:].lower(), "")
+        return content_type
+
+    def blob(self, partname: str) -> bytes:
+        return self._zip.read(partname[1:])
+
+    def key(self, partname: str) -> Tuple[int, int]:
+        """Identificador del contenido de una parte sin descomprimirla (CRC y tamano del zip)"""
+        info = self._members[partname[1:]]
+        return info.CRC, info.file_size
+
+    def rels(self, partname: str) -> Dict[str, Tuple[str, str, bool]]:
+        """rId -> (tipo, nombre de la parte destino o referencia externa, es externa)"""
+        if partname not in self._rels:
+            directory, name = posixpath.split(partname)
+            member = posixpath.join(directory, "_rels", f"{name}.rels")[1:]
+            rels = {}
+            if member in self._members:
+                for rel in etree.fromstring(self._zip.read(member)).iterchildren(f"{{{_RELS_NS}}}Relationship"):
+                    target = rel.get("Target")
+                    is_external = rel.get("TargetMode") == "External"
+                    if not is_external:
+                        target = posixpath.normpath(posixpath.join(directory, target))
+                        if target[1:] not in self._members:
+                            continue
+                    rels[rel.get("Id")] = (rel.get("Type"), target, is_external)
+            self._rels[partname] = rels
+        return self._rels[partname]
+
+    def related(self, partname: str, reltype: str) -> Optional[str]:
+        for rel_type, target, is_external in self.rels(partname).values():
+            if rel_type == reltype and not is_external:
+                return target
+        return None
+
+
+class DocumentMerger:
+    """
+    Agrega al final de un documento el cuerpo de otros .docx, uno por uno.
+
+    Las tablas de busqueda del documento destino (estilos, definiciones de numeracion,
+    imagenes por hash, partes y relaciones) se construyen una sola vez y se actualizan
+    con cada documento agregado, de modo que combinar N documentos es lineal en el
+    tamano total. Cada documento de origen se abre, se mueve su contenido y se libera
+    antes de abrir el siguiente; de cada uno solo se analizan las partes que su
+    contenido usa, y los estilos y la numeracion de una plantilla compartida por
+    varios origenes se analizan una sola vez.
+
+    - Estilos: se reutiliza el estilo del destino con el mismo styleId o nombre; solo
+      se copian los estilos usados que no existen.
+    - Numeracion: las definiciones (w:abstractNum) iguales se reutilizan; cada lista
+      del origen obtiene su propia instancia (w:num) para no continuar la numeracion
+      de otra, salvo la numeracion de los estilos reutilizados.
+    - Imagenes y demas partes: se copian una sola vez por contenido (hash) y se
+      reasignan los identificadores de relacion (r:id, r:embed...).
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.part = document.part
+        self.package = self.part.package
+        self.stats = {
+            "documents": 0, "blocks": 0, "styles_added": 0, "numbering_added": 0,
+            "media_added": 0, "media_reused": 0, "parts_added": 0, "notes_omitted": 0,
+        }
+
+        # Estilos del destino por styleId y por nombre
+        self._styles = self.part.styles.element
+        self._style_ids = {}
+        self._style_names = {}
+        for style in self._styles.style_lst:
+            self._style_ids[style.styleId] = style
+            self._style_names[style.name_val] = style.styleId
+
+        # Numeracion del destino: se prepara la primera vez que un origen la usa
+        self._numbering = None
+        self._abstract_nums: Dict[bytes, str] = {}
+        self._next_abstract_num_id = 0
+        self._next_num_id = 1
+
+        # Partes del paquete destino: nombres usados e imagenes y partes por contenido
+        self._partnames = {str(part.partname) for part in self.package.iter_parts()}
+        self._partname_counters: Dict[str, int] = {}
+        self._images: Dict[str, ImagePart] = {
+            part.sha1: part for part in self.package.iter_parts() if isinstance(part, ImagePart)
+        }
+        self._parts: Dict[Tuple, object] = {}
+        self._source_cache: Dict[Tuple, object] = {}
+
+        # Relaciones del documento destino: (tipo, destino) -> rId
+        self._rels: Dict[Tuple, str] = {}
+        for rel in self.part.rels.values():
+            target = rel.target_ref if rel.is_external else rel.target_part
+            self._rels[(rel.reltype, target)] = rel.rId
+        self._next_rid = _max_int(
+            match.group(1) for match in (_RID_NUMBER.match(rId) for rId in self.part.rels) if match
+        ) + 1
+
+        # Identificadores que deben ser unicos en el cuerpo (marcadores y dibujos)
+        body = self.part.element.body
+        self._next_bookmark_id = _max_int(el.get(_W_ID) for el in body.iter(*_BOOKMARKS)) + 1
+        self._next_drawing_id = _max_int(el.get("id") for el in body.iter(_DOC_PR)) + 1
+        self._has_content = len(body) > (1 if body.sectPr is not None else 0) or bool(
+            getattr(document, "elements_written", 0)
+        )
+
+        # Inversas de los cambios hechos fuera del cuerpo (ver rollback)
+        self._undo: List[Callable[[], object]] = []
+
+    # Partes y relaciones
+
+    def _partname(self, source_name: str) -> PackURI:
+        """Nombre libre con la misma forma que el de la parte de origen (/word/media/imageN.png)"""
+        template = _PARTNAME_NUMBER.sub(lambda m: "%d" + m.group(1), source_name, count=1)
+        n = self._partname_counters.get(template, 1)
+        while template % n in self._partnames:
+            n += 1
+        self._partname_counters[template] = n + 1
+        name = template % n
+        self._partnames.add(name)
+        return PackURI(name)
+
+    def _import_image(self, source: SourcePackage, partname: str) -> ImagePart:
+        blob = source.blob(partname)
+        sha1 = hashlib.sha1(blob).hexdigest()
+        image = self._images.get(sha1)
+        if image is not None:
+            self.stats["media_reused"] += 1
+            return image
+        image = ImagePart(self._partname(partname), source.content_type(partname), blob)
+        # Visible para add_picture, que reutiliza las imagenes por hash
+        self.package.image_parts.append(image)
+        self._undo.append(partial(self.package.image_parts._image_parts.remove, image))
+        self._images[sha1] = image
+        self.stats["media_added"] += 1
+        return image
+
+    def _import_part(self, source: SourcePackage, partname: str, reltype: str, imported: Dict, visiting: set):
+        """Parte del destino equivalente a una parte de origen (copiada una vez por contenido)"""
+        if partname in imported:
+            return imported[partname]
+        if reltype == RT.IMAGE:
+            part = imported[partname] = self._import_image(source, partname)
+            return part
+
+        visiting.add(partname)
+        rels = []
+        for rId, (rel_type, target, is_external) in source.rels(partname).items():
+            if is_external:
+                rels.append((rId, rel_type, target, True))
+            elif target not in visiting:
+                rels.append((rId, rel_type, self._import_part(source, target, rel_type, imported, visiting), False))
+        visiting.discard(partname)
+
+        blob = source.blob(partname)
+        content_type = source.content_type(partname)
+        targets = tuple((rId, rel_type, target if is_external else id(target)) for rId, rel_type, target, is_external in rels)
+        key = (content_type, hashlib.sha1(blob).digest(), targets)
+        part = self._parts.get(key)
+        if part is None:
+            part = PartFactory(self._partname(partname), content_type, reltype, blob, self.package)
+            # Las relaciones conservan sus rId: el XML de la parte copiada no cambia
+            for rId, rel_type, target, is_external in rels:
+                part.load_rel(rel_type, target, rId, is_external)
+            self._parts[key] = part
+            self.stats["parts_added"] += 1
+        imported[partname] = part
+        return part
+
+    def _relate(self, reltype: str, target, is_external: bool) -> str:
+        """rId de la relacion del documento destino, agregandola si no existe"""
+        key = (reltype, target)
+        rId = self._rels.get(key)
+        if rId is None:
+            rId = f"rId{self._next_rid}"
+            self._next_rid += 1
+            self.part.load_rel(reltype, target, rId, is_external)
+            self._rels[key] = rId
+            # Las partes copiadas solo son alcanzables por sus relaciones: quitarlas las descarta
+            self._undo.append(partial(self.part.rels.pop, rId, None))
+        return rId
+
+    def _remap_relationships(self, source: SourcePackage, elements) -> None:
+        """Reasignar los atributos r:* del contenido a relaciones del documento destino"""
+        source_rels = source.rels(source.document)
+        rid_map: Dict[str, Optional[str]] = {}
+        imported: Dict = {}
+        for element in elements:
+            for value in _RELATIONSHIP_ATTRIBUTES(element, ns=_R_NS):
+                owner = value.getparent()
+                rId = str(value)
+                if rId not in rid_map:
+                    rel = source_rels.get(rId)
+                    if rel is None:
+                        rid_map[rId] = None
+                    elif rel[2]:
+                        rid_map[rId] = self._relate(rel[0], rel[1], True)
+                    else:
+                        target = self._import_part(source, rel[1], rel[0], imported, {source.document})
+                        rid_map[rId] = self._relate(rel[0], target, False)
+                if rid_map[rId] is not None:
+                    owner.set(value.attrname, rid_map[rId])
+
+    # Estilos y numeracion de origen
+
+    def _source_part(self, source: SourcePackage, reltype: str, parse):
+        """Estilos o numeracion de un origen, analizados una vez por contenido"""
+        partname = source.related(source.document, reltype)
+        if partname is None:
+            return None
+        key = (reltype, source.key(partname))
+        if key not in self._source_cache:
+            if len(self._source_cache) >= _SOURCE_CACHE_SIZE:
+                del self._source_cache[next(iter(self._source_cache))]
+            self._source_cache[key] = parse(parse_xml(source.blob(partname)))
+        return self._source_cache[key]
+
+    @staticmethod
+    def _parse_styles(element) -> Dict:
+        return {style.styleId: style for style in element.style_lst}
+
+    @staticmethod
+    def _parse_numbering(element) -> Tuple[Dict, Dict]:
+        nums = {num.get(_W_NUM_ID): num for num in element.iterchildren(_W_NUM)}
+        abstracts = {abstract.get(_W_ABSTRACT_NUM_ID): abstract for abstract in element.iterchildren(_W_ABSTRACT_NUM)}
+        return nums, abstracts
+
+    # Estilos
+
+    def _style_map(self, source_styles: Dict, used: set) -> Tuple[Dict[str, str], List]:
+        """styleId de origen -> styleId del destino, y los estilos de origen que hay que copiar"""
+        # Estilos usados y aquellos de los que dependen (basedOn, next, link)
+        pending = [style_id for style_id in used if style_id in source_styles]
+        needed = set(pending)
+        mapping = {style_id: style_id for style_id in used if style_id not in source_styles}
+        while pending:
+            style = source_styles[pending.pop()]
+            for link in style.iterchildren(*_STYLE_LINKS):
+                linked = link.get(_W_VAL)
+                if linked in source_styles and linked not in needed:
+                    needed.add(linked)
+                    pending.append(linked)
+
+        copies = []
+        for style_id in needed:
+            style = source_styles[style_id]
+            if style_id in self._style_ids:
+                mapping[style_id] = style_id
+            elif style.name_val in self._style_names:
+                mapping[style_id] = self._style_names[style.name_val]
+            else:
+                mapping[style_id] = style_id
+                copies.append(style)
+        return mapping, copies
+
+    def _add_styles(self, copies: List, mapping: Dict[str, str], num_map: Dict[str, str]) -> None:
+        for source in copies:
+            style = deepcopy(source)
+            for link in style.iterchildren(*_STYLE_LINKS):
+                link.set(_W_VAL, mapping.get(link.get(_W_VAL), link.get(_W_VAL)))
+            for num_id in style.iter(_W_NUM_ID):
+                num_id.set(_W_VAL, num_map.get(num_id.get(_W_VAL), num_id.get(_W_VAL)))
+            self._styles.append(style)
+            self._undo.append(partial(self._styles.remove, style))
+            self._style_ids[style.styleId] = style
+            self._style_names[style.name_val] = style.styleId
+            self.stats["styles_added"] += 1
+
+    # Numeracion
+
+    def _target_numbering(self):
+        if self._numbering is None:
+            try:
+                numbering = self.part.numbering_part.element
+            except NotImplementedError:
+                # python-docx no crea la parte de numeracion: se agrega una vacia
+                part = NumberingPart.load(
+                    self.package.next_partname("/word/numbering%d.xml"), CT.WML_NUMBERING,
+                    f"<w:numbering {nsdecls('w')}/>".encode(), self.package,
+                )
+                rId = self.part.relate_to(part, RT.NUMBERING)
+                self._undo.append(partial(self.part.rels.pop, rId, None))
+                numbering = part.element
+            for abstract in numbering.iterchildren(_W_ABSTRACT_NUM):
+                self._abstract_nums.setdefault(self._signature(abstract), abstract.get(_W_ABSTRACT_NUM_ID))
+            self._next_abstract_num_id = _max_int(
+                abstract.get(_W_ABSTRACT_NUM_ID) for abstract in numbering.iterchildren(_W_ABSTRACT_NUM)
+            ) + 1
+            self._next_num_id = _max_int(num.get(_W_NUM_ID) for num in numbering.iterchildren(_W_NUM)) + 1
+            self._numbering = numbering
+        return self._numbering
+
+    @staticmethod
+    def _signature(abstract) -> bytes:
+        return _ABSTRACT_NUM_NOISE.sub(b"", etree.tostring(abstract))
+
+    def _insert_abstract_num(self, abstract) -> None:
+        numbering = self._numbering
+        # Las definiciones van antes de las instancias w:num
+        following = numbering.find(_W_NUM)
+        if following is None:
+            following = numbering.find(_W_NUM_ID_MAC)
+        if following is None:
+            numbering.append(abstract)
+        else:
+            following.addprevious(abstract)
+        self._undo.append(partial(numbering.remove, abstract))
+
+    def _num_map(self, source_numbering, num_ids: set, reused_style_nums: Dict[str, str]) -> Dict[str, str]:
+        """numId de origen -> numId del destino, copiando definiciones e instancias nuevas"""
+        mapping = {"0": "0"}
+        if source_numbering is None:
+            return mapping
+        source_nums, source_abstracts = source_numbering
+        abstract_map: Dict[str, str] = {}
+        for num_id in num_ids:
+            if num_id in mapping or num_id not in source_nums:
+                continue
+            if num_id in reused_style_nums:
+                # Numeracion de un estilo que ya existe en el destino: la del destino
+                mapping[num_id] = reused_style_nums[num_id]
+                continue
+
+            numbering = self._target_numbering()
+            num = source_nums[num_id]
+            abstract_id = num.find(_W_ABSTRACT_NUM_ID).get(_W_VAL)
+            if abstract_id not in abstract_map:
+                abstract = source_abstracts.get(abstract_id)
+                if abstract is None:
+                    continue
+                signature = self._signature(abstract)
+                target_id = self._abstract_nums.get(signature)
+                if target_id is None:
+                    target_id = str(self._next_abstract_num_id)
+                    self._next_abstract_num_id += 1
+                    copy = deepcopy(abstract)
+                    copy.set(_W_ABSTRACT_NUM_ID, target_id)
+                    self._insert_abstract_num(copy)
+                    self._abstract_nums[signature] = target_id
+                    self.stats["numbering_added"] += 1
+                abstract_map[abstract_id] = target_id
+
+            new_id = str(self._next_num_id)
+            self._next_num_id += 1
+            overrides = "".join(
+                etree.tostring(override, encoding="unicode") for override in num.iterchildren(_W_LVL_OVERRIDE)
+            )
+            copy = parse_xml(
+                f'<w:num {nsdecls("w")} w:numId="{new_id}"><w:abstractNumId w:val="{abstract_map[abstract_id]}"/>'
+                f"{overrides}</w:num>"
+            )
+            following = numbering.find(_W_NUM_ID_MAC)
+            if following is None:
+                numbering.append(copy)
+            else:
+                following.addprevious(copy)
+            self._undo.append(partial(numbering.remove, copy))
+            mapping[num_id] = new_id
+        return mapping
+
+    def rollback(self) -> None:
+        """
+        Quitar del destino los estilos, numeraciones, imagenes, partes y relaciones que
+        se agregaron (no el contenido del cuerpo). El merger no puede usarse despues.
+        """
+        while self._undo:
+            self._undo.pop()()
+
+    # Documento de origen
+
+    def append(self, path: str, page_break: bool = True) -> List:
+        """Agregar el cuerpo del documento en path; retorna los elementos agregados al cuerpo"""
+        with SourcePackage(path) as source:
+            return self._append(source, page_break)
+
+    def _append(self, source: SourcePackage, page_break: bool) -> List:
+        body = parse_xml(source.blob(source.document)).body
+        elements = [element for element in body if element is not body.sectPr]
+
+        # Las notas y comentarios quedarian sin destino: se quitan sus referencias
+        for element in elements:
+            for reference in list(element.iter(*_NOTE_REFS, *_COMMENT_RANGES)):
+                reference.getparent().remove(reference)
+                if reference.tag in _NOTE_REFS:
+                    self.stats["notes_omitted"] += 1
+
+        # Estilos usados y numeracion referenciada
+        used_styles = set()
+        num_ids = set()
+        for element in elements:
+            for reference in element.iter(*_STYLE_REFS):
+                used_styles.add(reference.get(_W_VAL))
+            for num_id in element.iter(_W_NUM_ID):
+                num_ids.add(num_id.get(_W_VAL))
+        # Los estilos de origen solo hacen falta si alguno no existe en el destino o si
+        # hay numeracion explicita (que puede ser la de un estilo)
+        source_styles = {}
+        if used_styles - self._style_ids.keys() or num_ids - {"0"}:
+            source_styles = self._source_part(source, RT.STYLES, self._parse_styles) or {}
+        style_map, copies = self._style_map(source_styles, used_styles)
+
+        # Numeracion de los estilos: la de los copiados se copia, la de los reutilizados es la del destino
+        reused_style_nums = {}
+        copied = {style.styleId for style in copies}
+        for style_id, target_id in style_map.items():
+            if style_id not in source_styles:
+                continue
+            source_num = source_styles[style_id].find(f"{qn('w:pPr')}/{qn('w:numPr')}/{qn('w:numId')}")
+            if source_num is None:
+                continue
+            num_ids.add(source_num.get(_W_VAL))
+            if style_id in copied:
+                continue
+            target_num = self._style_ids[target_id].find(f"{qn('w:pPr')}/{qn('w:numPr')}/{qn('w:numId')}")
+            if target_num is not None:
+                reused_style_nums[source_num.get(_W_VAL)] = target_num.get(_W_VAL)
+
+        source_numbering = None
+        if num_ids - {"0"}:
+            source_numbering = self._source_part(source, RT.NUMBERING, self._parse_numbering)
+        num_map = self._num_map(source_numbering, num_ids - {"0"}, reused_style_nums)
+        self._add_styles(copies, style_map, num_map)
+
+        # Reasignar estilos, numeracion, relaciones e identificadores unicos del contenido
+        bookmarks = {}
+        for element in elements:
+            for reference in element.iter(*_STYLE_REFS):
+                value = reference.get(_W_VAL)
+                if style_map.get(value, value) != value:
+                    reference.set(_W_VAL, style_map[value])
+            for num_id in element.iter(_W_NUM_ID):
+                value = num_id.get(_W_VAL)
+                if value in num_map:
+                    num_id.set(_W_VAL, num_map[value])
+            for bookmark in element.iter(*_BOOKMARKS):
+                old = bookmark.get(_W_ID)
+                if old not in bookmarks:
+                    bookmarks[old] = str(self._next_bookmark_id)
+                    self._next_bookmark_id += 1
+                bookmark.set(_W_ID, bookmarks[old])
+            for doc_pr in element.iter(_DOC_PR):
+                doc_pr.set("id", str(self._next_drawing_id))
+                self._next_drawing_id += 1
+        self._remap_relationships(source, elements)
+
+        if page_break and self._has_content:
+            elements.insert(0, parse_xml(_PAGE_BREAK))
+        append_to_body(self.document, elements)
+        self._has_content = self._has_content or bool(elements)
+        self.stats["documents"] += 1
+        self.stats["blocks"] += len(elements)
+        return elements
+
+
+def merge_files(document, paths: List[str], page_breaks: bool = True) -> Tuple[Dict, List]:
+    """
+    Agregar en orden el contenido de los .docx en paths al final del documento.
+    Retorna (estadisticas, elementos agregados al cuerpo). Si un archivo falla se
+    quitan los elementos ya agregados y los estilos, numeraciones, imagenes y partes
+    importados de los archivos anteriores, y se relanza el error. En modo streaming
+    el contenido ya se escribio y no se deshace nada.
+    """
+    merger = DocumentMerger(document)
+    added = []
+    try:
+        for path in paths:
+            added.extend(merger.append(path, page_breaks))
+    except Exception:
+        if not is_streaming(document):
+            for element in added:
+                element.getparent().remove(element)
+            merger.rollback()
+        raise
+    return merger.stats, added
@@ -0,0 +1,254 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Tipos de recurso guardados en la columna type
+TEXT = "text"
+JSON = "json"
+DOCX_FILE = "docx_file"
+FILE_PATH = "file_path"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resources_type ON resources (type);
+CREATE INDEX IF NOT EXISTS resources_updated_at ON resources (updated_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def encode_resource(content: Any) -> Tuple[str, str]:
+    """Clasificar un recurso y serializarlo igual que los antiguos archivos JSON"""
+    if isinstance(content, str) and os.path.exists(content) and not os.path.isdir(content):
+        # Para archivos solo se guarda la referencia
+        return (DOCX_FILE if content.endswith('.docx') else FILE_PATH), json.dumps(content, ensure_ascii=False)
+    if isinstance(content, (dict, list)):
+        return JSON, json.dumps(content, ensure_ascii=False)
+    return TEXT, json.dumps(str(content), ensure_ascii=False)
+
+
+def decode_resource(resource_type: str, content: str) -> Any:
+    value = json.loads(content)
+    if resource_type in (DOCX_FILE, FILE_PATH):
+        return {"content": value, "type": resource_type}
+    return value
+
+
+class ResourceStore:
+    """
+    Almacen de recursos en una unica base SQLite (modo WAL), con indices por id,
+    tipo y fecha de actualizacion. Las escrituras en lote usan una sola transaccion.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _write(self, sql: str, rows: List[Tuple], extra: Tuple = None) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(sql, rows)
+                if extra is not None:
+                    self._conn.execute(*extra)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def put_many(self, resources: Iterable[Tuple[str, Any]]) -> int:
+        """Guardar varios recursos en una sola transaccion; retorna cuantos se guardaron"""
+        now = time.time()
+        rows = [(resource_id, *encode_resource(content), now, now) for resource_id, content in resources]
+        self._write(
+            "INSERT INTO resources (id, type, content, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET type = excluded.type, content = excluded.content, "
+            "updated_at = excluded.updated_at",
+            rows,
+        )
+        return len(rows)
+
+    def put(self, resource_id: str, content: Any) -> None:
+        self.put_many([(resource_id, content)])
+
+    def get(self, resource_id: str) -> Optional[Tuple[str, Any]]:
+        """Retorna (tipo, contenido) o None si no existe"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT type, content FROM resources WHERE id = ?", (resource_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], decode_resource(*row)
+
+    def delete(self, resource_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM resources WHERE id = ?", (resource_id,))
+        return cursor.rowcount > 0
+
+    def list_ids(self, prefix: str = None, limit: int = None, after: str = None) -> List[str]:
+        """Identificadores en orden alfabetico, filtrados por prefijo y paginados por cursor (after)"""
+        query = "SELECT id FROM resources WHERE 1 = 1"
+        params: List[Any] = []
+        if prefix:
+            # Rango sobre la clave primaria en lugar de LIKE, para usar el indice
+            query += " AND id >= ? AND id < ?"
+            params += [prefix, prefix + "\U0010ffff"]
+        if after is not None:
+            query += " AND id > ?"
+            params.append(after)
+        query += " ORDER BY id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query, params)]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM resources").fetchone()[0]
+
+    def migrate_json_files(self, directory: str) -> int:
+        """
+        Importar una sola vez los antiguos archivos <id>.json del directorio.
+        Los archivos no se modifican ni se eliminan.
+        """
+        with self._lock:
+            done = self._conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        if done:
+            return 0
+
+        now = time.time()
+        rows = []
+        for path in glob.glob(os.path.join(glob.escape(directory), "*.json")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            # Mismos formatos que escribia save_resource
+            if isinstance(data, dict) and data.get("type") in (DOCX_FILE, FILE_PATH) and set(data) == {"content", "type"}:
+                resource_type, content = data["type"], data["content"]
+            elif isinstance(data, dict) and set(data) == {"content"}:
+                content = data["content"]
+                resource_type = TEXT if isinstance(content, str) else JSON
+            else:
+                resource_type, content = JSON, data
+            stat = os.stat(path)
+            rows.append((os.path.basename(path)[:-5], resource_type, json.dumps(content, ensure_ascii=False),
+                         stat.st_mtime, stat.st_mtime))
+
+        self._write(
+            "INSERT OR IGNORE INTO resources (id, type, content, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            rows,
+            extra=("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(now),)),
+        )
+        return len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def approximate_size(value) -> int:
+    """Tamano aproximado en bytes de un recurso serializable"""
+    if isinstance(value, str):
+        return len(value) + 50
+    if isinstance(value, dict):
+        return 64 + sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(approximate_size(item) for item in value)
+    return 32
+
+
+class ResourceCache:
+    """
+    Cache LRU de recursos serializables, acotada por numero de entradas y por tamano
+    aproximado, con contadores de aciertos, fallos y desalojos.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: str, value: Any) -> None:
+        size = approximate_size(value)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            # Un recurso mas grande que toda la cache no se guarda en memoria
+            if size > self.max_bytes:
+                return
+            self._items[key] = (value, size)
+            self._size += size
+            while len(self._items) > self.max_entries or self._size > self.max_bytes:
+                self._size -= self._items.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def update(self, items: Dict[str, Any]) -> None:
+        for key, value in items.items():
+            self.put(key, value)
+
+    def pop(self, key: str, default=None):
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None:
+                return default
+            self._size -= item[1]
+            return item[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._items),
+            "bytes": self._size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,176 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from docx.opc.phys_pkg import PhysPkgWriter
+from docx.opc.pkgwriter import _ContentTypesItem
+
+# Numero de hilos que serializan documentos en segundo plano
+SAVE_WORKERS = int(os.environ.get("WORD_MCP_SAVE_WORKERS", "2"))
+
+# Trabajos terminados que se conservan para consultar su estado
+MAX_JOB_HISTORY = 1000
+
+# mkstemp crea el archivo con permisos 0600; el resultado final usa los permisos habituales
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+
+def _temp_path(filename: str) -> str:
+    # El temporal se crea en el mismo directorio para que os.replace sea atomico
+    fd, temp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(filename)}.", suffix=".tmp", dir=os.path.dirname(filename) or "."
+    )
+    os.close(fd)
+    os.chmod(temp_path, FILE_MODE)
+    return temp_path
+
+
+def _replace_atomically(write, filename: str) -> None:
+    """Escribir con write(ruta_temporal) y mover el resultado a filename en un solo paso"""
+    temp_path = _temp_path(filename)
+    try:
+        write(temp_path)
+        with open(temp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, filename)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def atomic_save(document, filename: str) -> None:
+    """Guardar un documento sin dejar nunca un archivo truncado en filename"""
+    _replace_atomically(document.save, filename)
+
+
+def snapshot_document(document) -> List[Tuple[str, bytes]]:
+    """
+    Capturar el estado actual del paquete como lista de (uri, bytes).
+
+    Las partes XML se serializan aqui porque lxml no permite leer el arbol desde otro
+    hilo mientras se modifica (y copiarlo con deepcopy resulta mas lento que
+    serializarlo); las partes binarias se comparten porque son inmutables. La
+    compresion, la escritura a disco y el fsync quedan para el hilo de trabajo.
+    """
+    package = document.part.package
+    parts = list(package.iter_parts())
+    for part in parts:
+        part.before_marshal()
+
+    items = [
+        (CONTENT_TYPES_URI, _ContentTypesItem.from_parts(parts).blob),
+        (PACKAGE_URI.rels_uri, package.rels.xml),
+    ]
+    for part in parts:
+        items.append((part.partname, part.blob))
+        if len(part.rels):
+            items.append((part.partname.rels_uri, part.rels.xml))
+    return items
+
+
+def write_snapshot(items: List[Tuple[str, bytes]], filename: str) -> None:
+    def write(path):
+        writer = PhysPkgWriter(path)
+        for uri, blob in items:
+            writer.write(uri, blob)
+        writer.close()
+
+    _replace_atomically(write, filename)
+
+
+class SaveJob:
+    __slots__ = ("job_id", "key", "filename", "status", "error", "snapshot", "coalesced",
+                 "created_at", "finished_at", "done")
+
+    def __init__(self, key: Tuple, filename: str, snapshot):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.filename = filename
+        self.status = "pending"
+        self.error = None
+        self.snapshot = snapshot
+        self.coalesced = 0
+        self.created_at = time.time()
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def describe(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "coalesced_saves": self.coalesced,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class SaveManager:
+    """
+    Guardados en segundo plano.
+
+    Cada guardado toma una instantanea del documento y se serializa en un hilo de
+    trabajo. Los guardados del mismo documento al mismo archivo que aun no han
+    empezado se combinan: solo se escribe la instantanea mas reciente.
+    """
+
+    def __init__(self, max_workers: int = SAVE_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="save")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, SaveJob] = {}
+        self._pending: Dict[Tuple, SaveJob] = {}
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+
+    def submit(self, document, doc_id: str, filename: str) -> SaveJob:
+        key = (doc_id, os.path.abspath(filename))
+        snapshot = snapshot_document(document)
+        with self._lock:
+            job = self._pending.get(key)
+            if job is not None:
+                job.snapshot = snapshot
+                job.coalesced += 1
+                return job
+            job = SaveJob(key, filename, snapshot)
+            self._prune()
+            self._jobs[job.job_id] = job
+            self._pending[key] = job
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        self._executor.submit(self._run, job, key_lock)
+        return job
+
+    def _run(self, job: SaveJob, key_lock: threading.Lock) -> None:
+        # Los guardados al mismo destino se escriben en orden, uno a la vez
+        with key_lock:
+            with self._lock:
+                self._pending.pop(job.key, None)
+                snapshot, job.snapshot = job.snapshot, None
+                job.status = "running"
+            try:
+                write_snapshot(snapshot, job.filename)
+                job.status = "done"
+            except Exception as e:
+                job.status = "error"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                job.done.set()
+
+    def _prune(self) -> None:
+        # Olvidar los trabajos terminados mas antiguos
+        excess = len(self._jobs) - MAX_JOB_HISTORY
+        if excess < 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done.is_set()][:excess + 1]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> SaveJob:
+        return self._jobs[job_id]
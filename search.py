@@ -0,0 +1,343 @@
+import re
+import weakref
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.oxml.ns import qn
+from lxml import etree
+
+_NAMESPACES = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
+
+# Elementos de texto de un parrafo, en orden; los parrafos de cuadros de texto
+# anidados se indexan por separado
+_TEXT_NODES = etree.XPath(
+    "(./w:r | ./w:hyperlink/w:r | ./w:ins/w:r | ./w:smartTag/w:r)"
+    "/*[self::w:t or self::w:tab or self::w:br or self::w:cr]",
+    namespaces=_NAMESPACES,
+)
+
+_W_P = qn("w:p")
+_W_T = qn("w:t")
+_W_TAB = qn("w:tab")
+_W_TBL = qn("w:tbl")
+_W_TC = qn("w:tc")
+_W_BODY = qn("w:body")
+# Partes con texto ademas del cuerpo
+_TEXT_PARTS = (CT.WML_HEADER, CT.WML_FOOTER)
+
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+_WORD = re.compile(r"\w+")
+
+
+def _tokens(text: str) -> Set[str]:
+    return set(_WORD.findall(text.lower()))
+
+
+def _segments(p) -> List[tuple]:
+    """Lista de (elemento, texto) de un parrafo; tabulaciones y saltos cuentan como un caracter"""
+    segments = []
+    for node in _TEXT_NODES(p):
+        if node.tag == _W_T:
+            segments.append((node, node.text or ""))
+        else:
+            segments.append((node, "\t" if node.tag == _W_TAB else "\n"))
+    return segments
+
+
+def paragraph_text(p) -> str:
+    """Texto de un parrafo tal como se indexa y se busca"""
+    return "".join(segment for _, segment in _segments(p))
+
+
+def _set_text(t, text: str) -> None:
+    t.text = text
+    if text != text.strip():
+        t.set(_XML_SPACE, "preserve")
+
+
+class _Block:
+    """Parrafo indexado (del cuerpo o de una celda)"""
+
+    __slots__ = ("p", "text", "seq")
+
+    def __init__(self, p, text: str, seq: int):
+        self.p = p
+        self.text = text
+        self.seq = seq
+
+
+class TextIndex:
+    """
+    Indice invertido (palabra -> parrafos) del cuerpo de un documento, incluidas
+    las celdas de tablas.
+
+    Se construye la primera vez que se consulta. Despues se mantiene de forma
+    incremental: las herramientas que modifican texto marcan los elementos
+    cambiados con touch() y esos parrafos se vuelven a indexar en la siguiente
+    consulta. Los cambios hechos fuera de las herramientas no se detectan.
+    """
+
+    def __init__(self, body):
+        self._body = body
+        self._blocks: Dict[object, _Block] = {}
+        self._postings: Dict[str, Set[_Block]] = {}
+        self._pending: List = []
+        self._seq = 0
+        self.built = False
+
+    # Mantenimiento
+
+    def touch(self, element) -> None:
+        """Marcar un parrafo, celda, fila o tabla como modificado"""
+        if self.built:
+            self._pending.append(element)
+
+    def _index(self, p) -> None:
+        text = paragraph_text(p)
+        block = self._blocks.get(p)
+        if block is None:
+            block = self._blocks[p] = _Block(p, text, self._seq)
+            self._seq += 1
+            old_tokens = set()
+        elif block.text == text:
+            return
+        else:
+            old_tokens = _tokens(block.text)
+            block.text = text
+        new_tokens = _tokens(text)
+        for token in old_tokens - new_tokens:
+            self._postings[token].discard(block)
+        for token in new_tokens - old_tokens:
+            self._postings.setdefault(token, set()).add(block)
+
+    def _drop(self, block: _Block) -> None:
+        del self._blocks[block.p]
+        for token in _tokens(block.text):
+            self._postings[token].discard(block)
+
+    def refresh(self) -> None:
+        """Construir el indice o aplicar los cambios pendientes"""
+        if not self.built:
+            for p in self._body.iter(_W_P):
+                self._index(p)
+            self.built = True
+            return
+        pending, self._pending = self._pending, []
+        for element in pending:
+            if element.tag == _W_P:
+                self._index(element)
+            else:
+                for p in element.iter(_W_P):
+                    self._index(p)
+
+    def detach(self, relocation) -> None:
+        """Antes de desalojar el documento: los parrafos pasan a ser su direccion"""
+        for block in [block for block in self._blocks.values() if relocation.address(block.p) is None]:
+            self._drop(block)
+        self._blocks = {relocation.address(p): block for p, block in self._blocks.items()}
+        for address, block in self._blocks.items():
+            block.p = address
+        self._pending = [address for address in map(relocation.address, self._pending) if address is not None]
+        self._body = None
+
+    def attach(self, body, relocation) -> None:
+        """Al recargar el documento: las direcciones vuelven a ser sus parrafos"""
+        self._body = body
+        for block in self._blocks.values():
+            block.p = relocation.element(block.p)
+        self._pending = [relocation.element(address) for address in self._pending]
+        if any(block.p is None for block in self._blocks.values()) or None in self._pending:
+            # El documento recargado no coincide: se vuelve a construir en la siguiente consulta
+            self.__init__(body)
+            return
+        self._blocks = {block.p: block for block in self._blocks.values()}
+
+    def _attached(self, p) -> bool:
+        return any(ancestor is self._body for ancestor in p.iterancestors(_W_BODY))
+
+    # Consultas
+
+    def _postings_for(self, word: str, exact: bool) -> Set[_Block]:
+        if exact:
+            return self._postings.get(word, set())
+        # Palabra parcial: union de las palabras del vocabulario que la contienen
+        blocks = set()
+        for token, postings in self._postings.items():
+            if word in token:
+                blocks.update(postings)
+        return blocks
+
+    def candidates(self, words: Iterable[Tuple[str, bool]] = ()) -> Iterable[_Block]:
+        """
+        Parrafos que contienen todas las palabras, en orden del documento (todos si no
+        hay palabras). words es una lista de (palabra, exacta); una palabra no exacta
+        puede ser parte de una palabra mas larga.
+        """
+        self.refresh()
+        words = [(word.lower(), exact) for word, exact in words]
+        if not words:
+            return list(self._blocks.values())
+        # Primero las palabras exactas, que no requieren recorrer el vocabulario
+        words.sort(key=lambda item: (not item[1], len(self._postings.get(item[0], ()))))
+        blocks = set(self._postings_for(*words[0]))
+        for word, exact in words[1:]:
+            if not blocks:
+                break
+            blocks.intersection_update(self._postings_for(word, exact))
+        return sorted(blocks, key=lambda b: b.seq)
+
+    def find(self, pattern: "re.Pattern", words: Iterable[Tuple[str, bool]] = ()) -> Iterator[Tuple[object, "re.Match"]]:
+        """Coincidencias (parrafo, match) en orden del documento; se omiten las vacias"""
+        for block in self.candidates(words):
+            matches = [match for match in pattern.finditer(block.text) if match.end() > match.start()]
+            if not matches:
+                continue
+            # Los parrafos eliminados del documento se descartan al encontrarlos
+            if not self._attached(block.p):
+                self._drop(block)
+                continue
+            for match in matches:
+                yield block.p, match
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._blocks)
+
+
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def text_index(part) -> TextIndex:
+    """Indice de texto del documento al que pertenece la parte"""
+    index = _indexes.get(part)
+    if index is None:
+        index = _indexes[part] = TextIndex(part.element.body)
+    return index
+
+
+def detach_index(part, relocation) -> Optional[TextIndex]:
+    """Quitar el indice de un documento que se desaloja, con sus parrafos cambiados por su direccion"""
+    index = _indexes.pop(part, None)
+    if index is not None:
+        index.detach(relocation)
+    return index
+
+
+def attach_index(part, index: TextIndex, relocation) -> None:
+    """Asignar al documento recargado el indice quitado con detach_index"""
+    index.attach(part.element.body, relocation)
+    _indexes[part] = index
+
+
+def compile_query(query: str, regex: bool = False, case_sensitive: bool = False, whole_word: bool = False):
+    """
+    Expresion regular para la busqueda y palabras (palabra, exacta) que toda coincidencia
+    debe contener, para filtrar con el indice. Con regex=True no se filtra y se revisan
+    todos los parrafos.
+    """
+    pattern = query if regex else re.escape(query)
+    if whole_word:
+        pattern = r"\b(?:" + pattern + r")\b"
+    compiled = re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+    if regex:
+        return compiled, []
+
+    words = [[word, True] for word in _WORD.findall(query)]
+    # La primera y la ultima palabra pueden ser parte de una palabra mas larga
+    if words and not whole_word:
+        if _WORD.match(query[:1]):
+            words[0][1] = False
+        if _WORD.match(query[-1:]):
+            words[-1][1] = False
+    words = [tuple(word) for word in words]
+    return compiled, words
+
+
+_PRECEDING = {
+    tag: etree.XPath(f"count(preceding-sibling::w:{tag})", namespaces=_NAMESPACES) for tag in ("p", "tbl", "tr", "tc")
+}
+
+
+def location(p) -> Dict:
+    """Ubicacion de un parrafo: indice en el cuerpo, o tabla, fila, columna y parrafo de la celda"""
+    tc = next(p.iterancestors(_W_TC), None)
+    if tc is None:
+        return {"paragraph": int(_PRECEDING["p"](p))}
+    tbl = list(p.iterancestors(_W_TBL))[-1]
+    return {
+        "table": int(_PRECEDING["tbl"](tbl)),
+        "row": int(_PRECEDING["tr"](tc.getparent())),
+        "col": int(_PRECEDING["tc"](tc)),
+        "cell_paragraph": int(_PRECEDING["p"](p)),
+    }
+
+
+def replace_in_paragraph(p, matches: List[tuple]) -> int:
+    """
+    Reemplazar en un parrafo los rangos (inicio, fin, texto_nuevo) del texto indexado.
+
+    El texto nuevo queda en el primer run que toca la coincidencia (con su formato) y
+    el resto del rango se recorta de los runs siguientes, sin alterar su formato.
+    Retorna el numero de reemplazos hechos.
+    """
+    segments = []
+    offset = 0
+    for node, text in _segments(p):
+        segments.append((node, offset, offset + len(text)))
+        offset += len(text)
+
+    done = 0
+    # De atras hacia adelante para que los desplazamientos anteriores sigan siendo validos
+    for start, end, new_text in sorted(matches, reverse=True):
+        covered = [s for s in segments if s[1] < end and s[2] > start]
+        target = next((s for s in covered if s[0].tag == _W_T), None)
+        if target is None:
+            continue
+        for node, seg_start, seg_end in covered:
+            local_start = max(start, seg_start) - seg_start
+            local_end = min(end, seg_end) - seg_start
+            if node.tag != _W_T:
+                node.getparent().remove(node)
+                continue
+            text = node.text or ""
+            insert = new_text if node is target[0] else ""
+            _set_text(node, text[:local_start] + insert + text[local_end:])
+        done += 1
+    return done
+
+
+def text_roots(document) -> List:
+    """Elementos raiz con texto editable de un documento: cuerpo, encabezados y pies de pagina"""
+    roots = [document.element.body]
+    roots += [part.element for part in document.part.package.iter_parts() if part.content_type in _TEXT_PARTS]
+    return roots
+
+
+def scan(root, pattern: "re.Pattern") -> Iterator[Tuple[object, "re.Match"]]:
+    """Coincidencias (parrafo, match) bajo root sin usar indice (para documentos que se editan una sola vez)"""
+    for p in root.iter(_W_P):
+        text = paragraph_text(p)
+        if not text:
+            continue
+        for match in pattern.finditer(text):
+            if match.end() > match.start():
+                yield p, match
+
+
+def replace_matches(matches: Iterable[Tuple[object, "re.Match"]], replace: str, regex: bool = False,
+                    max_replacements: int = None) -> Dict[object, int]:
+    """
+    Reemplazar coincidencias (parrafo, match) por replace (con grupos si regex es True).
+    Todas las coincidencias se reunen antes de modificar el documento.
+    Retorna el numero de reemplazos hechos por parrafo.
+    """
+    by_paragraph: Dict[object, List[tuple]] = {}
+    found = 0
+    for p, match in matches:
+        if max_replacements is not None and found >= max_replacements:
+            break
+        new_text = match.expand(replace) if regex else replace
+        by_paragraph.setdefault(p, []).append((match.start(), match.end(), new_text))
+        found += 1
+    return {p: replace_in_paragraph(p, spans) for p, spans in by_paragraph.items()}
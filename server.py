@@ -1,39 +1,348 @@
 # math_server.py
-from docx import Document
 from docx.enum.section import WD_SECTION_START
-from docx.section import Section
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from mcp.server.fastmcp import FastMCP
-import cv2
-import numpy as np
 from io import BytesIO
+import argparse
+import functools
+import inspect
 import os
 import json
+import logging
+import time
+from contextlib import nullcontext
+from copy import deepcopy
 from typing import Dict, List, Any, Optional
 from docx.shared import Inches, Pt
-from docx.enum.style import WD_STYLE_TYPE
+from docx.section import Section
+from docx.table import Table, _Cell, _Row
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+from documents import DocumentCache, DocumentRegistry, HandleTable, blank_document, warm_blank_document
+from tables import append_rows, build_table
+from common import apply_character_style, style_registry
+from images import DEFAULT_DPI, JPEG_QUALITY, prepare_image, prepare_images
+from saving import SaveManager, atomic_save
+from streaming import StreamingDocument, is_streaming
+from resource_store import ResourceCache, ResourceStore
+from templates import PromptCache
+from search import attach_index, compile_query, detach_index, location, replace_matches, text_index
+from export import DEFAULT_MAX_CHARS, FORMATS, decode_token, encode_token, read_page, token_document
+from bulk import bulk_replace, expand_paths
+from mailmerge import mail_merge, read_records
+from instrumentation import ToolMetrics, configure_logging, instrument, is_error_result, log_event
+from sessions import ConcurrentFastMCP, SessionDocuments
+from journal import Change, Journal
+from ingest import append_blocks, normalize_blocks, parse_markdown
+from merge import merge_files
+from tabular import DEFAULT_CHUNK_ROWS, import_table as import_table_data
+from media import image_parts, optimize_images
+
+def forget_journal(doc_id: str) -> None:
+    # Un documento cerrado (o de una sesion terminada) ya no puede deshacerse; su diario
+    # en disco se conserva salvo que se cierre con close_document
+    journal.release(doc_id)
+
+
+def spill_document(doc_id: str, document, relocation):
+    # Antes de desalojar un documento: sus identificadores, su historial de deshacer y su
+    # indice de texto pasan a direcciones, y se vuelven a asociar al recargarlo
+    handles = [(handle, relocation.address(element)) for handle, element in live_objects.elements(document)]
+    registry = documents.current()
+    live_objects.release(document, load=lambda: registry.get(doc_id))
+    journal.detach(doc_id, relocation)
+    index = detach_index(document.part, relocation)
+
+    def restore(reloaded):
+        for handle, address in handles:
+            element = relocation.element(address) if address is not None else None
+            obj = rebuild_object(handle.split("_", 1)[0], element, reloaded) if element is not None else None
+            if obj is not None:
+                live_objects.alias(handle, obj)
+        journal.attach(doc_id, reloaded, relocation)
+        if index is not None:
+            attach_index(reloaded.part, index, relocation)
+
+    return restore
+
+
+def new_registry() -> DocumentRegistry:
+    # Cada registro se inicia con un documento en blanco activo, que se crea la primera
+    # vez que se usa para no retrasar el arranque
+    registry = DocumentRegistry(on_close=forget_journal, on_evict=spill_document)
+    registry.register(None)
+    return registry
+
 
-mcp = FastMCP("Word MCP Server", "1.0")
+# Documentos abiertos, un registro por sesion de cliente
+documents = SessionDocuments(new_registry)
 
-document = Document()
+mcp = ConcurrentFastMCP("Word MCP Server", "1.0", documents=documents)
 
-# Inicializar estructura de datos para Resources y Prompts
-RESOURCES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
-PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+# Metricas por herramienta y logs estructurados (stderr o WORD_MCP_LOG_FILE, nunca stdout)
+configure_logging()
+tool_metrics = ToolMetrics()
+instrument(mcp, tool_metrics)
+
+# Documentos ya analizados por open_document, reutilizados mientras el archivo no cambie
+document_cache = DocumentCache()
+
+# Guardados en segundo plano (save_file con background=True)
+save_manager = SaveManager()
+
+# Inicializar estructura de datos para Resources y Prompts (por defecto junto a este archivo)
+DATA_DIR = os.environ.get("WORD_MCP_DATA_DIR") or os.path.dirname(os.path.abspath(__file__))
+RESOURCES_DIR = os.path.join(DATA_DIR, "resources")
+PROMPTS_DIR = os.path.join(DATA_DIR, "prompts")
 
 # Crear directorios resources y prompts si no existen
 os.makedirs(RESOURCES_DIR, exist_ok=True)
 os.makedirs(PROMPTS_DIR, exist_ok=True)
 
-# Diccionario para almacenar recursos y prompts en memoria
-resources_cache = {}
+# Almacen persistente de recursos (SQLite); los antiguos resources/*.json se importan una vez
+resource_store = ResourceStore(os.path.join(RESOURCES_DIR, "resources.sqlite3"))
+resource_store.migrate_json_files(RESOURCES_DIR)
+
+# Cache en memoria de recursos, acotada por entradas y por tamano (configurable por entorno)
+resources_cache = ResourceCache(
+    max_entries=int(os.environ.get("WORD_MCP_RESOURCE_CACHE_ENTRIES", "1024")),
+    max_bytes=int(os.environ.get("WORD_MCP_RESOURCE_CACHE_MB", "32")) * 1024 * 1024,
+)
+
+# Prompts leidos y compilados, reutilizados mientras el archivo no cambie
+prompt_cache = PromptCache(PROMPTS_DIR)
+
+# Objetos vivos (tablas de create_table...) por identificador; se liberan con su documento
+live_objects = HandleTable()
+
+# Prefijos de los identificadores que devuelven las herramientas
+HANDLE_PREFIXES = ("paragraph_", "run_", "table_", "section_", "cell_", "row_")
+
+# Prefijo del identificador de cada tipo de objeto de python-docx
+OBJECT_PREFIXES = {Paragraph: "paragraph", Run: "run", Table: "table", _Cell: "cell", _Row: "row", Section: "section"}
+
+# Diario de operaciones de los documentos, para recuperarlos y deshacer (WORD_MCP_JOURNAL=0 lo
+# desactiva; deshacer sigue disponible en memoria)
+JOURNAL_DIR = os.environ.get("WORD_MCP_JOURNAL_DIR") or os.path.join(DATA_DIR, "journal")
+journal = Journal(JOURNAL_DIR if os.environ.get("WORD_MCP_JOURNAL", "1") != "0" else None, live_objects.elements)
+
+
+def get_document(doc_id: str = None):
+    """Obtener el documento indicado por doc_id, o el documento activo si es None"""
+    return documents.get(doc_id)
+
+
+def mark_changed(obj):
+    """Avisar al indice de texto del documento que el texto de obj (parrafo, celda, fila, tabla) cambio"""
+    text_index(obj.part).touch(obj._element)
+
+
+def ensure_attached(element, description: str):
+    """Verificar que un elemento recibido sigue formando parte de su documento"""
+    if element.getparent() is None:
+        raise ValueError(
+            f"El {description} ya no forma parte del documento "
+            "(en modo streaming solo el ultimo elemento agregado puede modificarse)"
+        )
+
+
+def block_handle(document, obj, prefix: str) -> str:
+    """Identificador de un parrafo o tabla recien agregado al documento"""
+    # En modo streaming los elementos anteriores ya se escribieron: no se conservan sus identificadores
+    if is_streaming(document):
+        live_objects.release(document)
+    return live_objects.add(obj, prefix)
+
+
+def resolve(value, prefix: str, description: str):
+    """Objeto de python-docx a partir de su identificador (o el propio objeto), verificando que sigue en su documento"""
+    if isinstance(value, str):
+        obj = live_objects.get(value) if value.startswith(prefix + "_") else None
+        if obj is None:
+            raise ValueError(f"No se encontro el {description} '{value}'")
+    else:
+        obj = value
+    ensure_attached(obj._sectPr if prefix == "section" else obj._element, description)
+    return obj
+
+
+def target_document(arguments: Dict, accepts_doc_id: bool) -> Optional[str]:
+    """
+    doc_id del documento sobre el que actua una llamada: el del objeto recibido (por
+    identificador o como objeto de python-docx) o, si la herramienta acepta doc_id,
+    el documento indicado o el activo. None si no actua sobre ningun documento.
+    """
+    for value in arguments.values():
+        if isinstance(value, str) and value.startswith(HANDLE_PREFIXES):
+            obj = live_objects.get(value)
+        elif type(value) in OBJECT_PREFIXES:
+            obj = value
+        else:
+            continue
+        if obj is not None:
+            doc_id = documents.find(obj.part.package)
+            if doc_id is None:
+                raise ValueError(f"No se encontro el objeto '{value}' en los documentos de esta sesion")
+            return doc_id
+    if accepts_doc_id:
+        # read_document recibe el documento dentro de su token de continuacion
+        doc_id = arguments.get("doc_id") or token_document(arguments.get("token")) or documents.active_id
+        if doc_id in documents:
+            return doc_id
+    return None
+
+
+@mcp.document_lock
+def document_lock(name: str, arguments: Dict, accepts_doc_id: bool):
+    """
+    Lock del documento sobre el que actua una llamada. Si la herramienta acepta doc_id,
+    el documento se fija en los argumentos para que no cambie durante la llamada. Si el
+    objeto recibido no pertenece a ningun documento de la sesion, retorna el error.
+    """
+    if name == "apply_operations":
+        # Cada operacion toma el lock de su propio documento
+        return nullcontext()
+    try:
+        doc_id = target_document(arguments, accepts_doc_id)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    if doc_id is None:
+        return nullcontext()
+    if accepts_doc_id:
+        arguments["doc_id"] = doc_id
+    return documents.lock(doc_id)
+
+
+def resolve_table(table, doc_id: str = None):
+    """
+    Tabla indicada por identificador u objeto. Cualquier otra cadena se interpreta como
+    la ultima tabla del documento (compatibilidad); retorna None si no hay tablas.
+    """
+    if isinstance(table, str) and not table.startswith("table_"):
+        document = get_document(doc_id)
+        last = document.element.body.xpath("./w:tbl[last()]")
+        return Table(last[0], document._body) if last else None
+    return resolve(table, "table", "tabla")
+
+
+def _handles_in(value) -> List[str]:
+    """Identificadores contenidos en el resultado de una herramienta, en orden"""
+    if isinstance(value, str):
+        return [value] if value.startswith(HANDLE_PREFIXES) else []
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return [handle for item in value for handle in _handles_in(item)]
+    return []
+
+
+def _is_default(value, default) -> bool:
+    if value is default:
+        return True
+    return type(value) is type(default) and isinstance(value, (str, int, float, bool)) and value == default
+
+
+def journaled(capture=None, files=()):
+    """
+    Registrar en el diario cada llamada de una herramienta que modifica el documento.
+        - capture(change, argumentos, documento): anota en change, antes de la llamada,
+          que elementos agregara o modificara la herramienta, para poder deshacerla
+        - files: argumentos con rutas de imagenes, que se copian al diario
+    
+    Solo se registran las llamadas que terminan sin error; las de documentos en modo
+    streaming no se registran.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        accepts_doc_id = "doc_id" in signature.parameters
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            try:
+                doc_id = target_document(arguments, accepts_doc_id)
+            except ValueError as e:
+                return f"Error: {str(e)}"
+            document = get_document(doc_id) if doc_id is not None else None
+            if document is None:
+                return fn(*args, **kwargs)
+            if is_streaming(document):
+                result = fn(*args, **kwargs)
+                documents.mark_dirty(doc_id)
+                return result
+            if accepts_doc_id:
+                arguments["doc_id"] = doc_id
+
+            change = Change(fn.__name__)
+            if capture is not None:
+                try:
+                    capture(change, arguments, document)
+                except Exception:
+                    # Argumentos no validos: la herramienta informara el error
+                    change = Change(fn.__name__)
+            result = fn(**arguments)
+            # El tamano del documento se vuelve a estimar en el siguiente control de memoria
+            documents.mark_dirty(doc_id)
+            if not is_error_result(result):
+                # Solo los argumentos distintos de su valor por defecto (y el documento)
+                recorded = {
+                    name: live_objects.add(value, OBJECT_PREFIXES[type(value)]) if type(value) in OBJECT_PREFIXES else value
+                    for name, value in arguments.items()
+                    if name == "doc_id" or not _is_default(value, signature.parameters[name].default)
+                }
+                journal.record(doc_id, document, fn.__name__, recorded, _handles_in(result) or None, change, files)
+            return result
+
+        return wrapper
+    return decorator
+
+
+# Elementos que agrega o modifica cada herramienta (ver journaled)
+def _capture_body(change: Change, arguments: Dict, document):
+    change.inserted(document.element.body)
+
+def _capture_section_break(change: Change, arguments: Dict, document):
+    body = document.element.body
+    change.inserted(body)
+    if body.sectPr is not None:
+        change.modified(body.sectPr)
+
+def _capture_paragraph(change: Change, arguments: Dict, document):
+    change.modified(resolve(arguments["p"], "paragraph", "parrafo")._element)
+
+def _capture_section(change: Change, arguments: Dict, document):
+    change.modified(resolve(arguments["section"], "section", "seccion")._sectPr)
+
+def _capture_cell(change: Change, arguments: Dict, document):
+    table = resolve_table(arguments["table"], arguments.get("doc_id"))
+    change.modified(table.rows[arguments["row"]].cells[arguments["col"]]._tc)
+
+def _capture_table_rows(change: Change, arguments: Dict, document):
+    change.inserted(resolve(arguments["table"], "table", "tabla")._tbl)
+
+def _capture_media(change: Change, arguments: Dict, document):
+    for part in image_parts(document):
+        change.blob_replaced(part)
+
+def _capture_replacements(change: Change, arguments: Dict, document):
+    pattern, words = compile_query(arguments["find"], arguments["regex"], arguments["case_sensitive"], arguments["whole_word"])
+    for p in dict.fromkeys(p for p, _ in text_index(document.part).find(pattern, words)):
+        change.modified(p)
 
 
 @mcp.tool()
-def save_file(filename: str):
+def save_file(filename: str, doc_id: str = None, background: bool = False):
     """
     Save file to disk
     - filename: path where the file should be saved (including filename)
+    - doc_id: document to save (defaults to the active document)
+    - background: if True, snapshot the document and return a job_id immediately;
+      the file is written by a worker thread (check it with save_status). Pending
+      background saves of the same document to the same file are coalesced.
+    
+    The file is written to a temporary file and then moved into place, so an
+    interrupted save never leaves a truncated document.
     """
     try:
         # Check if the filename has a .docx extension
@@ -49,11 +358,18 @@ def save_file(filename: str):
         if directory and not os.path.exists(directory):
             os.makedirs(directory, exist_ok=True)
             
-        # Debug info
-        print(f"Attempting to save document to: {filename}")
+        log_event(logging.DEBUG, "save_file", filename=filename, background=background)
+        
+        # Un documento en modo streaming se finaliza directamente, sin instantanea
+        if background and not is_streaming(get_document(doc_id)):
+            doc_id = doc_id or documents.active_id
+            job = save_manager.submit(get_document(doc_id), doc_id, filename)
+            journal.saved(doc_id, filename)
+            return f"Save scheduled with job_id '{job.job_id}' for: {filename}"
             
         # Save the document
-        document.save(filename)
+        atomic_save(get_document(doc_id), filename)
+        journal.saved(doc_id or documents.active_id, filename)
         
         # Also save to resources for reference
         resource_id = os.path.basename(filename)
@@ -61,21 +377,45 @@ def save_file(filename: str):
         
         return f"File saved successfully to: {filename}"
     except Exception as e:
-        error_msg = f"Error saving file: {str(e)}"
-        print(error_msg)  # Debug print
-        return error_msg
+        log_event(logging.DEBUG, "save_file_failed", exc_info=True, filename=filename)
+        return f"Error saving file: {str(e)}"
+
+@mcp.tool()
+def save_status(job_id: str, wait: bool = False, timeout: float = None) -> Dict:
+    """
+    Get the status of a background save started with save_file(background=True)
+    - job_id: identifier returned by save_file
+    - wait: if True, block until the save finishes (or the timeout expires)
+    - timeout: maximum seconds to wait
+    
+    Returns: job status (pending, running, done or error) and details
+    """
+    try:
+        job = save_manager.get(job_id)
+    except KeyError:
+        return {"error": f"No save job found with job_id '{job_id}'"}
+    if wait:
+        job.done.wait(timeout)
+    return job.describe()
 
 @mcp.tool()
-def add_heading(content: str, level: int):
+@journaled(_capture_body)
+def add_heading(content: str, level: int, doc_id: str = None):
     """
     Add heading to the document
         - Content: contenido del titulo o encabezado
         - Level: nivel del encabezado (0, 1, 2, ...). Cuanto menor es el numero, mayor es la fuente.
+        - doc_id: documento destino (por defecto el documento activo)
     
+    Returns: identificador del parrafo creado
     """
-    document.add_heading(content, level)
+    document = get_document(doc_id)
+    heading = document.add_heading(content, level)
+    mark_changed(heading)
+    return block_handle(document, heading, "paragraph")
 
 @mcp.tool()
+@journaled(_capture_body)
 def add_paragraph(
     content: str,
     style: str = "Normal",
@@ -83,11 +423,16 @@ def add_paragraph(
     bold: bool = False,
     italic: bool = False,
     alignment: WD_PARAGRAPH_ALIGNMENT = WD_PARAGRAPH_ALIGNMENT.LEFT,
+    doc_id: str = None,
 ):
     """
     Add paragraph to the document
         - Content: contenido del parrafo
+        - doc_id: documento destino (por defecto el documento activo)
+    
+    Returns: identificador del parrafo creado (por ejemplo "paragraph_1a2b3c4d_7")
     """
+    document = get_document(doc_id)
     p = document.add_paragraph(content)
     p.style = style
     p.alignment = alignment
@@ -95,10 +440,12 @@ def add_paragraph(
     run.font.size = Pt(font_size)
     run.font.bold = bold
     run.font.italic = italic
-    return p
+    mark_changed(p)
+    return block_handle(document, p, "paragraph")
 
 
 @mcp.tool()
+@journaled(_capture_paragraph)
 def update_paragraph(
     p,
     content: str = None,
@@ -111,6 +458,7 @@ def update_paragraph(
 ):
     """
     Update paragraph
+        - p: identificador del parrafo (o el objeto Paragraph)
         - Content: contenido del parrafo
         - Style: estilo del parrafo
         - Font size: tamano de fuente del parrafo
@@ -120,6 +468,7 @@ def update_paragraph(
           dark green, pink, red, white, teal, yellow, violet, gray25, gray50)
         - Alignment: alineacion (LEFT, RIGHT, CENTER, JUSTIFY)
     """
+    p = resolve(p, "paragraph", "parrafo")
     p.style = style
     p.alignment = alignment
     
@@ -128,39 +477,47 @@ def update_paragraph(
     run.font.bold = bold
     run.font.italic = italic
     
-    if color is not None:
-        from common import color_paragraph
-        color_element = color_paragraph(p, color)
-        run.font.color.val = color_element
+    # El color se aplica con un estilo de caracter compartido del documento
+    color_style = style_registry(p.part).character_style(color=color) if color is not None else None
+    if color_style is not None:
+        apply_character_style(run, color_style)
 
     if content is not None:
         new_run = p.add_run(content)
         new_run.font.size = Pt(font_size)
         new_run.font.bold = bold
         new_run.font.italic = italic
-        if color is not None:
-            new_run.font.color.val = color_element
+        if color_style is not None:
+            apply_character_style(new_run, color_style)
+        mark_changed(p)
             
-    return p 
+    return live_objects.add(p, "paragraph")
 
 
 @mcp.tool()
-def add_section(section = WD_SECTION_START.NEW_PAGE) -> Section:
+@journaled(_capture_section_break)
+def add_section(section = WD_SECTION_START.NEW_PAGE, doc_id: str = None) -> str:
     """
     Add section to the document
+        - doc_id: documento destino (por defecto el documento activo)
+    
+    Returns: identificador de la seccion creada
     """
-    return document.add_section(section)
+    return live_objects.add(get_document(doc_id).add_section(section), "section")
 
 @mcp.tool()
+@journaled(_capture_section)
 def set_number_of_columns(section, cols):
     """
     Set number of columns for a section
-        - Section: section to set columns
+        - Section: identificador de la seccion (o el objeto Section)
         - Cols: number of columns
     """
+    section = resolve(section, "section", "seccion")
     section._sectPr.xpath("./w:cols")[0].set("{http://schemas.openxmlformats.org/wordprocessingml/2006/main}num", str(cols))
 
 @mcp.tool()
+@journaled(_capture_paragraph)
 def add_run_to_paragraph(
     p,
     content: str,
@@ -172,7 +529,7 @@ def add_run_to_paragraph(
 ):
     """
     Agregar texto a un parrafo ya inicializado
-        - p: parrafo ya inicializado
+        - p: identificador del parrafo (o el objeto Paragraph)
         - content: contenido a agregar
         - bold: negrita o no
         - italic: cursiva o no
@@ -180,116 +537,169 @@ def add_run_to_paragraph(
         - color: color del texto (black, blue, green, dark blue, dark red, dark yellow,
           dark green, pink, red, white, teal, yellow, violet, gray25, gray50)
         - highlight: color de fondo para resaltar el texto
+    
+    Retorna: identificador del run creado
     """
+    p = resolve(p, "paragraph", "parrafo")
     sentence_element = p.add_run(str(content))
-    sentence_element.bold = bold
-    sentence_element.italic = italic
-    sentence_element.underline = underline
-    
-    if color is not None:
-        from common import color_paragraph
-        color_element = color_paragraph(p, color)
-        sentence_element.font.color.val = color_element
     
-    if highlight is not None:
-        from docx.enum.text import WD_COLOR_INDEX
-        
-        if highlight == 'black':
-            color_element = WD_COLOR_INDEX.BLACK
-        elif highlight == 'blue':
-            color_element = WD_COLOR_INDEX.BLUE
-        elif highlight == 'green':
-            color_element = WD_COLOR_INDEX.BRIGHT_GREEN
-        elif highlight == 'dark blue':
-            color_element = WD_COLOR_INDEX.DARK_BLUE
-        elif highlight == 'dark red':
-            color_element = WD_COLOR_INDEX.DARK_RED
-        elif highlight == 'dark yellow':
-            color_element = WD_COLOR_INDEX.DARK_YELLOW
-        elif highlight == 'dark green':
-            color_element = WD_COLOR_INDEX.GREEN
-        elif highlight == 'pink':
-            color_element = WD_COLOR_INDEX.PINK
-        elif highlight == 'red':
-            color_element = WD_COLOR_INDEX.RED
-        elif highlight == 'white':
-            color_element = WD_COLOR_INDEX.WHITE
-        elif highlight == 'teal':
-            color_element = WD_COLOR_INDEX.TEAL
-        elif highlight == 'yellow':
-            color_element = WD_COLOR_INDEX.YELLOW
-        elif highlight == 'violet':
-            color_element = WD_COLOR_INDEX.VIOLET
-        elif highlight == 'gray25':
-            color_element = WD_COLOR_INDEX.GRAY_25
-        elif highlight == 'gray50':
-            color_element = WD_COLOR_INDEX.GRAY_50
-        
-        style = document.styles.add_style(f"highlight_style_{highlight}", WD_STYLE_TYPE.CHARACTER)
-        style.font.highlight_color = color_element
-        sentence_element.style = style
+    # Color y resaltado comparten un unico estilo de caracter por combinacion; el
+    # formato completo del run se copia de una plantilla del registro del documento
+    style_registry(p.part).format_run(sentence_element, bold, italic, underline, color, highlight)
+    mark_changed(p)
     
-    return sentence_element
+    return live_objects.add(sentence_element, "run")
 
 @mcp.tool()
-def add_picture(image_path_or_stream, width: float = 5.0):
+@journaled(_capture_body, files=("image_path_or_stream",))
+def add_picture(image_path_or_stream, width: float = 5.0, dpi: int = DEFAULT_DPI, doc_id: str = None):
     """
     Agregar imagen al documento
-        - image_path_or_stream: ruta al archivo de imagen o imagen en formato matriz
+        - image_path_or_stream: ruta al archivo de imagen, bytes ya codificados o imagen en formato matriz
         - width: ancho de la imagen (en pulgadas)
+        - dpi: resolucion con la que se reduce la imagen al ancho indicado (0 para no reducir)
+        - doc_id: documento destino (por defecto el documento activo)
+    
+    Las imagenes PNG/JPEG que no necesitan reducirse se insertan sin recodificar, y una
+    misma imagen insertada varias veces comparte un unico archivo dentro del documento.
     """
-    if isinstance(image_path_or_stream, str):
-        img = cv2.imread(image_path_or_stream)
-    else:
-        img = np.array(image_path_or_stream)
+    stream = BytesIO(prepare_image(image_path_or_stream, width, dpi))
+    return get_document(doc_id).add_picture(stream, width=Inches(width))
 
-    is_success, im_buf_arr = cv2.imencode(".jpg", img)
-    byte_im = im_buf_arr.tobytes()
-    stream = BytesIO(byte_im)
-    return document.add_picture(stream, width=Inches(width))
+@mcp.tool()
+@journaled(_capture_body, files=("images",))
+def add_pictures(images: List[str], width: float = 5.0, dpi: int = DEFAULT_DPI, doc_id: str = None):
+    """
+    Agregar varias imagenes al documento, en orden, procesandolas en paralelo
+        - images: lista de rutas a archivos de imagen
+        - width: ancho de cada imagen (en pulgadas)
+        - dpi: resolucion con la que se reducen las imagenes al ancho indicado (0 para no reducir)
+        - doc_id: documento destino (por defecto el documento activo)
+    """
+    document = get_document(doc_id)
+    prepared = prepare_images(images, width, dpi)
+    return [document.add_picture(BytesIO(data), width=Inches(width)) for data in prepared]
+
+@mcp.tool()
+@journaled(_capture_media)
+def optimize_media(dpi: int = DEFAULT_DPI, jpeg_quality: int = JPEG_QUALITY, max_workers: int = None, doc_id: str = None) -> Any:
+    """
+    Reducir el tamano de las imagenes del documento (por ejemplo capturas PNG sin comprimir
+    o fotos de camara en un documento abierto con open_document)
+        - dpi: resolucion con la que se reduce cada imagen al mayor tamano con que se muestra
+          en el documento (0 para no reducir, solo volver a comprimir)
+        - jpeg_quality: calidad de las imagenes JPEG (1-100)
+        - max_workers: procesos de trabajo (por defecto y como maximo WORD_MCP_BULK_WORKERS o el numero de CPUs)
+        - doc_id: documento (por defecto el documento activo)
+
+    Las imagenes se decodifican y vuelven a comprimir en paralelo; PNG sigue en PNG (sin
+    perdida) y JPEG en JPEG. Las imagenes cuyo resultado no es menor, las de otros formatos
+    y las que no se muestran con un tamano conocido (VML) no se reducen.
+
+    Retorna: images, optimized, bytes_before, bytes_after, bytes_saved y por cada parte
+    before, after y saved (o skipped con el motivo)
+    """
+    try:
+        if not 1 <= jpeg_quality <= 100:
+            return "Error: jpeg_quality debe estar entre 1 y 100"
+        document = get_document(doc_id)
+        if is_streaming(document):
+            return "Error: optimize_media no esta disponible en modo streaming"
+        return optimize_images(document, dpi, jpeg_quality, max_workers)
+    except Exception as e:
+        return f"Error al optimizar las imagenes: {str(e)}"
 
 @mcp.tool()
 def create_new_document():
     """
-    Crear un nuevo documento, eliminando el documento actual
+    Crear un nuevo documento y convertirlo en el documento activo.
+    Los documentos abiertos anteriormente siguen disponibles por su doc_id.
     """
-    global document
-    document = Document()
-    return "Se ha creado un nuevo documento"
+    doc_id = documents.register(blank_document())
+    return f"Se ha creado un nuevo documento con doc_id '{doc_id}'"
+
+@mcp.tool()
+def create_streaming_document():
+    """
+    Crear un documento en modo streaming y convertirlo en el documento activo.
+    Pensado para documentos muy largos que solo agregan contenido: cada elemento se
+    escribe en el archivo al agregar el siguiente, con memoria acotada.
+    
+    Limitaciones:
+        - Solo admite add_heading, add_paragraph, add_table/create_table/
+          create_simple_table_with_data y add_page_break
+        - Solo el ultimo elemento agregado puede modificarse (add_run_to_paragraph,
+          fill_table_cell, add_table_row...)
+        - No admite imagenes, secciones, update_cell por cadena ni lectura del contenido
+        - save_file finaliza el documento; despues no se pueden agregar elementos
+    """
+    doc_id = documents.register(StreamingDocument())
+    return f"Se ha creado un documento en modo streaming con doc_id '{doc_id}'"
 
 @mcp.tool()
 def open_document(filepath: str):
     """
-    Abrir un documento docx existente
+    Abrir un documento docx existente y convertirlo en el documento activo
         - filepath: ruta al archivo docx a abrir
     """
-    global document
     try:
-        document = Document(filepath)
-        return f"Se ha abierto el documento desde {filepath}"
+        doc_id = documents.register(document_cache.open(filepath), source_path=filepath)
+        journal.opened(doc_id, filepath)
+        return f"Se ha abierto el documento desde {filepath} con doc_id '{doc_id}'"
     except Exception as e:
         return f"Error al abrir el documento: {str(e)}"
 
 @mcp.tool()
-def add_table(rows: int, cols: int, style: str = "Table Grid"):
+def list_documents() -> List[Dict]:
+    """
+    Listar los documentos abiertos, en orden de uso (el mas reciente al final)
+    
+    Retorna: Lista con doc_id, ruta de origen, si esta cargado en memoria y tamano estimado
+    """
+    return [entry.describe() for entry in documents.entries()]
+
+@mcp.tool()
+def close_document(doc_id: str) -> str:
+    """
+    Cerrar un documento abierto sin guardarlo
+        - doc_id: identificador del documento a cerrar
+    """
+    if doc_id not in documents:
+        return f"No se encontro el documento '{doc_id}'"
+    document = documents.close(doc_id)
+    if document is not None:
+        live_objects.release(document)
+    journal.discard(doc_id)
+    return f"Se ha cerrado el documento '{doc_id}'"
+
+@mcp.tool()
+@journaled(_capture_body)
+def add_table(rows: int, cols: int, style: str = "Table Grid", doc_id: str = None):
     """
     Agregar tabla al documento
         - rows: numero de filas
         - cols: numero de columnas
         - style: estilo de la tabla
+        - doc_id: documento destino (por defecto el documento activo)
+    
+    Retorna: identificador de la tabla creada
     """
+    document = get_document(doc_id)
     table = document.add_table(rows=rows, cols=cols)
     table.style = style
-    return table
+    mark_changed(table)
+    return block_handle(document, table, "table")
 
 @mcp.tool()
-def create_table(rows: int, cols: int, style: str = "Table Grid", headers: List[str] = None):
+@journaled(_capture_body)
+def create_table(rows: int, cols: int, style: str = "Table Grid", headers: List[str] = None, doc_id: str = None):
     """
     Crear tabla con numero de filas y columnas especificado, puede agregar encabezados
         - rows: numero de filas (sin incluir la fila de encabezado)
         - cols: numero de columnas
         - style: estilo de la tabla ("Table Grid", "Light Grid", "Light Shading", etc.)
         - headers: lista de encabezados de columna (longitud igual al numero de columnas)
+        - doc_id: documento destino (por defecto el documento activo)
     """
     try:
         # Si hay headers, agregar 1 fila para el encabezado
@@ -299,66 +709,48 @@ def create_table(rows: int, cols: int, style: str = "Table Grid", headers: List[
                 return f"Error: El numero de encabezados ({len(headers)}) es diferente al numero de columnas ({cols})"
             actual_rows = rows + 1
             
-        # Crear tabla
-        table = document.add_table(rows=actual_rows, cols=cols)
-        table.style = style
+        # Crear tabla con el encabezado en negrita y filas vacias en una sola pasada
+        document = get_document(doc_id)
+        table = build_table(document, headers, [()] * rows, style, cols=cols, header_alignment=None)
+        mark_changed(table)
         
-        # Agregar encabezados si existen
-        if headers:
-            for i, header in enumerate(headers):
-                cell = table.cell(0, i)
-                cell.text = header
-                # Formato del encabezado (negrita, centrado)
-                for paragraph in cell.paragraphs:
-                    for run in paragraph.runs:
-                        run.bold = True
+        # La tabla queda accesible por table_id mientras su documento este abierto
+        table_id = block_handle(document, table, "table")
         
-        # Devolver informacion de la tabla para uso posterior
-        table_info = {
-            "table_object": table,
+        # Guardar en resources solo la informacion serializable de la tabla
+        save_resource(table_id, {
             "rows": actual_rows,
             "cols": cols,
             "has_headers": bool(headers)
-        }
-        
-        # Guardar informacion de la tabla en resources para acceso posterior
-        table_id = f"table_{id(table)}"
-        save_resource(table_id, table_info)
+        })
         
         return {
             "table_id": table_id,
-            "table_object": table,
             "message": f"Se ha creado una tabla con {actual_rows} filas y {cols} columnas"
         }
     except Exception as e:
-        error_msg = f"Error al crear la tabla: {str(e)}"
-        print(error_msg)
-        return error_msg
+        return f"Error al crear la tabla: {str(e)}"
 
 @mcp.tool()
-def update_cell(table, row: int, col: int, content: str):
+@journaled(_capture_cell)
+def update_cell(table, row: int, col: int, content: str, doc_id: str = None):
     """
     Actualizar contenido de una celda en la tabla
-        - table: tabla a actualizar (objeto Table o descripcion de cadena)
+        - table: identificador de la tabla (u objeto Table); cualquier otra cadena usa la
+          ultima tabla del documento
         - row: indice de fila
         - col: indice de columna
         - content: contenido a actualizar
+        - doc_id: documento de la tabla cuando table no es un identificador (por defecto el activo)
+    
+    Retorna: identificador de la celda
     """
     try:
-        # Print debug info
-        print(f"Updating cell: row={row}, col={col}, table type={type(table)}")
+        log_event(logging.DEBUG, "update_cell", row=row, col=col, table=table)
         
-        # Manejar caso donde table es una cadena
-        if isinstance(table, str):
-            print(f"Table is a string: {table}")
-            # Usar la ultima tabla agregada al documento
-            if not document.tables:
-                return "No se encontro ninguna tabla en el documento"
-                
-            print(f"Using last table in document. Total tables: {len(document.tables)}")
-            real_table = document.tables[-1]
-        else:
-            real_table = table
+        real_table = resolve_table(table, doc_id)
+        if real_table is None:
+            return "No se encontro ninguna tabla en el documento"
         
         # Acceder a la celda segun la documentacion recomendada
         try:
@@ -379,64 +771,48 @@ def update_cell(table, row: int, col: int, content: str):
             paragraph = cell.paragraphs[0]
             run = paragraph.add_run(content)
             run.font.size = Pt(10)  # Tamano de fuente predeterminado
+            mark_changed(cell)
             
-            return cell
+            return live_objects.add(cell, "cell")
         except Exception as cell_error:
-            error_msg = f"Error al acceder a la celda: {str(cell_error)}"
-            print(error_msg)
-            return error_msg
+            return f"Error al acceder a la celda: {str(cell_error)}"
     except Exception as e:
-        error_msg = f"Error al actualizar la celda: {str(e)}"
-        print(error_msg)
-        import traceback
-        print(traceback.format_exc())
-        return error_msg
+        log_event(logging.DEBUG, "update_cell_failed", exc_info=True, row=row, col=col, table=table)
+        return f"Error al actualizar la celda: {str(e)}"
 
 @mcp.tool()
-def add_page_break():
+@journaled(_capture_body)
+def add_page_break(doc_id: str = None):
     """
     Agregar salto de pagina
+        - doc_id: documento destino (por defecto el documento activo)
     """
-    document.add_page_break()
+    get_document(doc_id).add_page_break()
     return "Se ha agregado un salto de pagina"
 
 @mcp.tool()
-def fill_table_cell(table, row: int, col: int, content: str, bold: bool = False, alignment = None, font_size: int = None):
+@journaled(_capture_cell)
+def fill_table_cell(table, row: int, col: int, content: str, bold: bool = False, alignment = None, font_size: int = None, doc_id: str = None):
     """
     Llenar contenido en una celda de la tabla con formato
-        - table: objeto de tabla o table_id (cadena)
+        - table: identificador de la tabla (table_id u objeto Table); cualquier otra cadena
+          usa la ultima tabla del documento
         - row: indice de fila
         - col: indice de columna
         - content: contenido a agregar
         - bold: negrita o no
         - alignment: alineacion (LEFT, RIGHT, CENTER)
         - font_size: tamano de fuente
+        - doc_id: documento de la tabla cuando table no es un identificador (por defecto el activo)
+    
+    Retorna: identificador del parrafo de la celda
     """
     try:
-        # Print debug info
-        print(f"Filling cell: row={row}, col={col}, content={content}, table type={type(table)}")
+        log_event(logging.DEBUG, "fill_table_cell", row=row, col=col, table=table, content_length=len(content))
         
-        # Manejar caso donde table es una cadena (table_id)
-        if isinstance(table, str):
-            print(f"Table is a string ID: {table}")
-            
-            # Caso 1: Es un table_id de la funcion create_table
-            if table.startswith('table_'):
-                table_info = get_resource(table)
-                if isinstance(table_info, dict) and "table_object" in table_info:
-                    real_table = table_info["table_object"]
-                else:
-                    # Caso 2: Usar la ultima tabla en el documento
-                    if not document.tables:
-                        return "No se encontro ninguna tabla en el documento"
-                    real_table = document.tables[-1]
-            else:
-                # Caso 3: Usar la ultima tabla en el documento
-                if not document.tables:
-                    return "No se encontro ninguna tabla en el documento"
-                real_table = document.tables[-1]
-        else:
-            real_table = table
+        real_table = resolve_table(table, doc_id)
+        if real_table is None:
+            return "No se encontro ninguna tabla en el documento"
         
         # Verificar si hay suficientes filas y columnas
         if row >= len(real_table.rows):
@@ -472,54 +848,58 @@ def fill_table_cell(table, row: int, col: int, content: str, bold: bool = False,
                 paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
             elif alignment == "JUSTIFY":
                 paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+        mark_changed(cell)
         
-        return paragraph
+        return live_objects.add(paragraph, "paragraph")
     except Exception as e:
-        error_msg = f"Error al llenar contenido en la celda: {str(e)}"
-        print(error_msg)
-        import traceback
-        print(traceback.format_exc())
-        return error_msg
+        log_event(logging.DEBUG, "fill_table_cell_failed", exc_info=True, row=row, col=col, table=table)
+        return f"Error al llenar contenido en la celda: {str(e)}"
 
 @mcp.tool()
+@journaled(_capture_table_rows)
 def add_table_row(table, data: List[str], is_header: bool = False):
     """
     Agregar una fila a la tabla con los datos proporcionados
-        - table: objeto de tabla
+        - table: identificador de la tabla (u objeto Table)
         - data: lista de datos para cada celda
         - is_header: si es una fila de encabezado o no
+    
+    Retorna: identificador de la fila agregada
     """
     try:
-        # Print debug info
-        print(f"Adding row to table: data={data}, is_header={is_header}")
+        log_event(logging.DEBUG, "add_table_row", table=table, cells=len(data), is_header=is_header)
         
-        # Add a new row
-        row = table.add_row()
+        table = resolve(table, "table", "tabla")
         
-        # Fill the cells
-        for i, content in enumerate(data):
-            if i < len(table.columns):
-                cell = row.cells[i]
-                paragraph = cell.paragraphs[0] if cell.paragraphs else cell.add_paragraph()
-                run = paragraph.add_run(content)
-                
-                if is_header:
-                    run.bold = True
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+        # Add a new row (extra values beyond the table columns are ignored)
+        append_rows(table, [data], bold=is_header, alignments="CENTER" if is_header else None)
+        row = table.rows[-1]
+        mark_changed(row)
         
-        return row
+        return live_objects.add(row, "row")
     except Exception as e:
-        error_msg = f"Error al agregar fila a la tabla: {str(e)}"
-        print(error_msg)
-        return error_msg
+        return f"Error al agregar fila a la tabla: {str(e)}"
 
 @mcp.tool()
-def create_simple_table_with_data(headers: List[str], data: List[List[str]], style: str = "Table Grid"):
+@journaled(_capture_body)
+def create_simple_table_with_data(
+    headers: List[str],
+    data: List[List[str]],
+    style: str = "Table Grid",
+    alignments: List[str] = None,
+    font_size: int = None,
+    doc_id: str = None,
+):
     """
     Crear una tabla completa con datos
         - headers: lista de encabezados de columna
         - data: lista de filas de datos
         - style: estilo de la tabla
+        - alignments: alineacion por columna (LEFT, RIGHT, CENTER, JUSTIFY) para las filas de datos
+        - font_size: tamano de fuente de toda la tabla
+        - doc_id: documento destino (por defecto el documento activo)
+    
+    Retorna: identificador de la tabla creada
     """
     try:
         if not headers or not data:
@@ -532,31 +912,582 @@ def create_simple_table_with_data(headers: List[str], data: List[List[str]], sty
             if len(row) != cols:
                 return f"Error: La fila {i} tiene {len(row)} columnas pero necesita {cols} columnas"
         
-        # Crear tabla con numero de filas igual a cantidad de datos + 1 fila de encabezado
-        table = document.add_table(rows=1, cols=cols)  # Start with 1 row for headers
-        table.style = style
+        if alignments is not None and len(alignments) != cols:
+            return f"Error: Se recibieron {len(alignments)} alineaciones pero la tabla tiene {cols} columnas"
         
-        # Llenar encabezados
-        for i, header in enumerate(headers):
-            fill_table_cell(table, 0, i, header, bold=True, alignment="CENTER")
+        # Construir encabezado (negrita, centrado) y filas de datos en una sola pasada
+        document = get_document(doc_id)
+        table = build_table(document, headers, data, style, alignments=alignments, font_sizes=font_size)
+        mark_changed(table)
         
-        # Llenar datos
-        for row_data in data:
-            row = table.add_row()
-            for i, cell_data in enumerate(row_data):
-                fill_table_cell(table, len(table.rows)-1, i, cell_data)
+        return block_handle(document, table, "table")
+    except Exception as e:
+        return f"Error al crear tabla con datos: {str(e)}"
+
+@mcp.tool()
+@journaled(_capture_body, files=("filepath",))
+def import_table(
+    filepath: str,
+    headers: List[str] = None,
+    has_header: bool = True,
+    delimiter: str = None,
+    decimals: Any = None,
+    thousands_separator: str = ",",
+    decimal_separator: str = ".",
+    alignments: List[str] = None,
+    style: str = "Table Grid",
+    font_size: int = None,
+    repeat_header: bool = False,
+    max_rows: int = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    doc_id: str = None,
+) -> Any:
+    """
+    Crear una tabla con los datos de un archivo CSV (o TSV) o de una matriz de NumPy
+    guardada en .npy, sin enviar los datos en la llamada
+        - filepath: ruta del archivo .csv, .tsv o .npy (matriz 1D, 2D o estructurada)
+        - headers: encabezados de columna (por defecto la primera fila del CSV o los
+          campos de la matriz estructurada)
+        - has_header: si la primera fila del CSV es el encabezado
+        - delimiter: separador del CSV (por defecto se detecta)
+        - decimals: decimales fijos de las columnas numericas, un valor o uno por columna
+          (por defecto 0 para columnas enteras y 2 para el resto)
+        - thousands_separator: separador de miles ("" para no usarlo)
+        - decimal_separator: separador decimal
+        - alignments: alineacion por columna (por defecto RIGHT para las columnas numericas)
+        - style: estilo de la tabla
+        - font_size: tamano de fuente de toda la tabla
+        - repeat_header: repetir la fila de encabezado al inicio de cada pagina
+        - max_rows: numero maximo de filas de datos a importar
+        - chunk_rows: filas que se leen y agregan por bloque
+        - doc_id: documento destino (por defecto el documento activo)
+
+    Los datos se leen y agregan a la tabla por bloques, sin cargar el archivo completo.
+
+    Retorna: table_id, rows, cols, chunks y numeric_columns (columnas formateadas como numeros)
+    """
+    try:
+        if not os.path.isfile(filepath):
+            return f"Error: No se encontro el archivo '{filepath}'"
+
+        document = get_document(doc_id)
+        table, stats = import_table_data(
+            document, filepath, headers, has_header, delimiter, decimals, thousands_separator,
+            decimal_separator, alignments, style, font_size, repeat_header, max_rows, chunk_rows,
+        )
+        mark_changed(table)
+        return {"table_id": block_handle(document, table, "table"), **stats}
+    except Exception as e:
+        return f"Error al importar la tabla: {str(e)}"
+
+@mcp.tool()
+@journaled(_capture_body)
+def add_markdown(markdown: str = None, blocks: List[Dict[str, Any]] = None, doc_id: str = None) -> Any:
+    """
+    Agregar de una sola vez contenido en Markdown (o como bloques JSON) al final del documento
+        - markdown: texto Markdown con titulos (#), parrafos, **negrita**, *cursiva*, `codigo`,
+          [enlaces](url), listas con -, * o 1. (anidadas con sangria), citas (>), bloques de
+          codigo (```), reglas (---) y tablas con | (alineacion con :---, :---: y ---:)
+        - blocks: alternativa a markdown, lista de bloques {"type": ...}:
+          heading (text, level; 0 = titulo del documento), paragraph (text), quote (text),
+          code (text), list (items: textos o {"text", "level", "ordered"}, ordered),
+          table (headers, rows, alignments), rule y page_break. El texto admite el mismo
+          formato en linea que markdown
+        - doc_id: documento destino (por defecto el documento activo)
+
+    El formato se aplica con estilos (Heading N, List Bullet, List Number, Quote, Strong,
+    Emphasis, Hyperlink...) en lugar de formato directo; los que falten se crean.
+
+    Retorna: blocks, paragraphs y tables agregados y table_ids de las tablas creadas
+    """
+    try:
+        if (markdown is None) == (blocks is None):
+            return "Error: indique markdown o blocks (solo uno de los dos)"
+        parsed = normalize_blocks(parse_markdown(markdown) if markdown is not None else blocks)
+
+        document = get_document(doc_id)
+        added = append_blocks(document, parsed)
+        index = text_index(document.part)
+        for element in added["elements"]:
+            index.touch(element)
+
+        # En modo streaming las tablas ya escritas no pueden modificarse
+        streaming = is_streaming(document)
+        return {
+            "blocks": len(parsed),
+            "paragraphs": added["paragraphs"],
+            "tables": len(added["tables"]),
+            "table_ids": [] if streaming else [live_objects.add(table, "table") for table in added["tables"]],
+        }
+    except Exception as e:
+        return f"Error al agregar el contenido: {str(e)}"
+
+@mcp.tool()
+@journaled(_capture_body, files=("filepaths",))
+def merge_documents(filepaths: List[str], page_breaks: bool = True, doc_id: str = None) -> Any:
+    """
+    Agregar en orden el contenido de varios archivos .docx al final del documento
+        - filepaths: rutas de los archivos a combinar (por ejemplo un archivo por capitulo)
+        - page_breaks: empezar cada archivo en una pagina nueva
+        - doc_id: documento destino (por defecto el documento activo; use
+          create_new_document para combinar en un documento nuevo)
+
+    Los estilos y definiciones de numeracion que ya existen en el destino se reutilizan
+    (se copian solo los que faltan) y las imagenes se copian una sola vez aunque se
+    repitan en varios archivos. Los archivos se procesan de uno en uno. Las notas al pie,
+    notas finales y comentarios de los archivos no se combinan.
+
+    Retorna: documents, blocks, styles_added, numbering_added, media_added, media_reused,
+    parts_added y notes_omitted (referencias a notas o comentarios quitadas)
+    """
+    try:
+        if not filepaths:
+            return "Error: filepaths no puede estar vacio"
+        for path in filepaths:
+            if not os.path.isfile(path):
+                return f"Error: No se encontro el archivo '{path}'"
+
+        document = get_document(doc_id)
+        stats, added = merge_files(document, filepaths, page_breaks)
+        index = text_index(document.part)
+        for element in added:
+            index.touch(element)
+        return stats
+    except Exception as e:
+        return f"Error al combinar los documentos: {str(e)}"
+
+# SECCION READ - lectura del contenido por paginas
+@mcp.tool()
+def read_document(
+    format: str = "markdown",
+    offset: int = 0,
+    limit: int = 200,
+    max_chars: int = DEFAULT_MAX_CHARS,
+    token: str = None,
+    doc_id: str = None,
+) -> Any:
+    """
+    Leer el contenido del documento por paginas, como Markdown o texto plano
+        - format: "markdown" (titulos con #, listas con - o 1., tablas con |) o "text"
+        - offset: bloque (parrafo o tabla del cuerpo, contando desde 0) donde empezar
+        - limit: numero maximo de bloques por pagina
+        - max_chars: tamano aproximado maximo del contenido de la pagina; las tablas
+          grandes se reparten por filas entre paginas
+        - token: next_token de una pagina anterior para continuar donde termino
+          (indica tambien el documento y el formato)
+        - doc_id: documento a leer (por defecto el documento activo)
+    
+    Retorna: content, offset, blocks (bloques en la pagina), next_offset y next_token
+    para la pagina siguiente (None al llegar al final) y done. Los parrafos vacios se omiten.
+    """
+    try:
+        row = 0
+        if token:
+            token_doc_id, offset, row, format = decode_token(token)
+            if doc_id and doc_id != token_doc_id:
+                return "Error: el token corresponde a otro documento"
+            doc_id = token_doc_id
+        if format not in FORMATS:
+            return f"Error: formato no soportado '{format}' (use {' o '.join(FORMATS)})"
+        if limit < 1 or max_chars < 1:
+            return "Error: limit y max_chars deben ser mayores que 0"
         
-        return table
+        document = get_document(doc_id)
+        if is_streaming(document):
+            return "Error: la lectura no esta disponible en modo streaming"
+        page = read_page(document, format, offset, row, limit, max_chars)
+        position = page.pop("next")
+        page["next_offset"] = position[0] if position else None
+        page["next_token"] = encode_token(doc_id or documents.active_id, *position, format) if position else None
+        return page
+    except Exception as e:
+        return f"Error al leer el documento: {str(e)}"
+
+# SECCION SEARCH - busqueda y reemplazo de texto
+@mcp.tool()
+def search_document(
+    query: str,
+    regex: bool = False,
+    case_sensitive: bool = False,
+    whole_word: bool = False,
+    limit: int = 100,
+    doc_id: str = None,
+) -> Any:
+    """
+    Buscar texto en el cuerpo del documento (parrafos y celdas de tablas)
+        - query: frase a buscar, o expresion regular si regex es True
+        - regex: interpretar query como expresion regular de Python
+        - case_sensitive: distinguir mayusculas y minusculas
+        - whole_word: solo coincidencias de palabras completas
+        - limit: numero maximo de coincidencias a devolver
+        - doc_id: documento donde buscar (por defecto el documento activo)
+    
+    Retorna: total de coincidencias y, para cada una, su ubicacion (paragraph, o table,
+    row, col y cell_paragraph), las posiciones start/end dentro del texto del parrafo,
+    el texto encontrado y un fragmento de contexto. Las tabulaciones y saltos de linea
+    cuentan como un caracter.
+    """
+    try:
+        document = get_document(doc_id)
+        if is_streaming(document):
+            return "Error: la busqueda no esta disponible en modo streaming"
+        pattern, words = compile_query(query, regex, case_sensitive, whole_word)
+        
+        total = 0
+        matches = []
+        for p, match in text_index(document.part).find(pattern, words):
+            total += 1
+            if len(matches) >= limit:
+                continue
+            text = match.string
+            matches.append({
+                **location(p),
+                "start": match.start(),
+                "end": match.end(),
+                "text": match.group(0),
+                "context": text[max(0, match.start() - 40):match.end() + 40],
+            })
+        return {"total": total, "truncated": total > len(matches), "matches": matches}
+    except Exception as e:
+        return f"Error al buscar en el documento: {str(e)}"
+
+@mcp.tool()
+@journaled(_capture_replacements)
+def replace_text(
+    find: str,
+    replace: str,
+    regex: bool = False,
+    case_sensitive: bool = True,
+    whole_word: bool = False,
+    max_replacements: int = None,
+    doc_id: str = None,
+) -> str:
+    """
+    Reemplazar texto en el cuerpo del documento conservando el formato de los runs
+        - find: texto a buscar, o expresion regular si regex es True
+        - replace: texto nuevo (con regex puede usar grupos: \\1, \\g<nombre>)
+        - regex: interpretar find como expresion regular de Python
+        - case_sensitive: distinguir mayusculas y minusculas
+        - whole_word: solo coincidencias de palabras completas
+        - max_replacements: numero maximo de reemplazos (por defecto todos)
+        - doc_id: documento destino (por defecto el documento activo)
+    
+    Una coincidencia puede abarcar varios runs: el texto nuevo toma el formato del
+    run donde empieza y el resto de runs solo se recortan.
+    """
+    try:
+        document = get_document(doc_id)
+        if is_streaming(document):
+            return "Error: el reemplazo no esta disponible en modo streaming"
+        pattern, words = compile_query(find, regex, case_sensitive, whole_word)
+        index = text_index(document.part)
+        
+        counts = replace_matches(index.find(pattern, words), replace, regex, max_replacements)
+        for p in counts:
+            index.touch(p)
+        replaced = sum(counts.values())
+        return f"Se han reemplazado {replaced} coincidencias"
+    except Exception as e:
+        return f"Error al reemplazar texto: {str(e)}"
+
+@mcp.tool()
+def bulk_replace_files(
+    pattern: str,
+    replacements: List[Dict],
+    output_dir: str = None,
+    max_workers: int = None,
+    dry_run: bool = False,
+) -> Any:
+    """
+    Buscar y reemplazar texto en muchos archivos .docx en paralelo (un documento por proceso)
+        - pattern: patron glob de los archivos (por ejemplo "contratos/**/*.docx")
+        - replacements: lista de reemplazos que se aplican en orden, cada uno
+          {"find": ..., "replace": ..., "regex": False, "case_sensitive": True, "whole_word": False}
+        - output_dir: directorio donde escribir los resultados, conservando las subcarpetas;
+          por defecto se sobrescriben los archivos originales
+        - max_workers: numero de procesos (por defecto y como maximo uno por nucleo, o WORD_MCP_BULK_WORKERS)
+        - dry_run: solo contar coincidencias, sin escribir archivos
+    
+    Se reemplaza el texto del cuerpo, las tablas, los encabezados y los pies de pagina.
+    Cada archivo se escribe de forma atomica y solo si tuvo coincidencias; los documentos
+    abiertos en el servidor no se modifican.
+    
+    Retorna: totales y, por archivo, las coincidencias de cada reemplazo, la ruta escrita y el error si lo hubo
+    """
+    try:
+        paths = expand_paths(pattern)
+        results = bulk_replace(paths, replacements, output_dir, max_workers, dry_run)
+        return {
+            "files": len(results),
+            "changed": sum(1 for result in results if result["total"] and not result["error"]),
+            "total_matches": sum(result["total"] for result in results),
+            "errors": sum(1 for result in results if result["error"]),
+            "results": results,
+        }
+    except Exception as e:
+        return f"Error al reemplazar en los archivos: {str(e)}"
+
+@mcp.tool()
+def mail_merge_documents(
+    template_path: str,
+    output_dir: str,
+    data_path: str = None,
+    records: List[Dict] = None,
+    filename: str = "documento_{n}.docx",
+    max_workers: int = None,
+) -> Any:
+    """
+    Generar un documento .docx por registro a partir de una plantilla con variables {nombre}
+        - template_path: documento plantilla; las variables {nombre} pueden estar en el cuerpo,
+          tablas, encabezados y pies de pagina (mismo formato que los prompts)
+        - output_dir: directorio donde se escriben los documentos generados
+        - data_path: archivo de datos .csv (con encabezados), .json (lista de objetos) o .jsonl
+        - records: lista de registros (diccionarios) si no se usa data_path
+        - filename: nombre de cada archivo generado; admite variables del registro y {n}
+          (numero de registro desde 1). Los nombres repetidos reciben el sufijo _n
+        - max_workers: numero de procesos (por defecto y como maximo uno por nucleo, o WORD_MCP_BULK_WORKERS)
+    
+    Las variables que no estan en el registro se dejan tal cual. El texto sustituido
+    conserva el formato del run donde empieza la variable.
+    
+    Retorna: registros procesados, documentos escritos, fallidos y detalle de los errores
+    """
+    try:
+        if (data_path is None) == (records is None):
+            return "Error: indique data_path o records (solo uno de los dos)"
+        data = read_records(data_path) if data_path is not None else records
+        return mail_merge(template_path, data, output_dir, filename, max_workers)
+    except Exception as e:
+        return f"Error al combinar correspondencia: {str(e)}"
+
+# SECCION HISTORY - deshacer, rehacer y recuperar documentos del diario
+def _move_history(direction: str, doc_id: str = None) -> str:
+    document = get_document(doc_id)
+    if is_streaming(document):
+        return "Error: deshacer y rehacer no estan disponibles en modo streaming"
+    doc_id = doc_id or documents.active_id
+    moved = getattr(journal, direction)(doc_id, document)
+    action = "deshacer" if direction == "undo" else "rehacer"
+    if moved is None:
+        return f"No se encontro ninguna operacion para {action} en el documento '{doc_id}'"
+    change, touched = moved
+    documents.mark_dirty(doc_id)
+    index = text_index(document.part)
+    for element in touched:
+        index.touch(element)
+    return f"Se ha {'deshecho' if direction == 'undo' else 'rehecho'} la operacion {change.op}"
+
+@mcp.tool()
+def undo(doc_id: str = None) -> str:
+    """
+    Deshacer la ultima operacion que modifico el documento
+        - doc_id: documento (por defecto el documento activo)
+    
+    Se aplica la operacion inversa (quitar lo agregado o restaurar lo modificado), sin
+    copias del documento. Pueden deshacerse las ultimas WORD_MCP_UNDO_DEPTH operaciones
+    (100 por defecto) desde el ultimo punto de control del diario. Los identificadores
+    de los elementos quitados dejan de ser validos hasta que se rehace la operacion.
+    """
+    return _move_history("undo", doc_id)
+
+@mcp.tool()
+def redo(doc_id: str = None) -> str:
+    """
+    Rehacer la ultima operacion deshecha con undo
+        - doc_id: documento (por defecto el documento activo)
+    
+    Cualquier operacion nueva sobre el documento descarta las operaciones por rehacer.
+    """
+    return _move_history("redo", doc_id)
+
+def rebuild_object(prefix: str, element, document):
+    """Objeto de python-docx de un elemento con identificador, segun el prefijo de este"""
+    body = document._body
+    if prefix == "paragraph":
+        return Paragraph(element, body)
+    if prefix == "run":
+        return Run(element, Paragraph(element.getparent(), body))
+    if prefix == "table":
+        return Table(element, body)
+    if prefix == "row":
+        return _Row(element, Table(element.getparent(), body))
+    if prefix == "cell":
+        return _Cell(element, Table(element.getparent().getparent(), body))
+    if prefix == "section":
+        return Section(element, document.part)
+    return None
+
+def _replay(doc_id: str, records: List[Dict]) -> tuple:
+    """Volver a aplicar los registros del diario; retorna (aplicados, error del primero que falle)"""
+    applied = 0
+    with journal.replaying(doc_id):
+        for record in records:
+            op = record["op"]
+            try:
+                if op in ("$undo", "$redo"):
+                    result = _move_history(op[1:], doc_id)
+                else:
+                    tool = mcp._tool_manager.get_tool(op)
+                    if tool is None:
+                        raise ValueError(f"Operacion desconocida: {op}")
+                    result = mcp.locked_call(tool, journal.arguments(doc_id, record))
+                if is_error_result(result):
+                    raise RuntimeError(result)
+            except Exception as e:
+                return applied, f"registro {record['seq']} ({op}): {e}"
+            # Los identificadores devueltos en la ejecucion anterior apuntan a los nuevos elementos
+            for old, new in zip(record.get("result") or [], _handles_in(result)):
+                if old != new:
+                    live_objects.alias(old, live_objects.get(new))
+            applied += 1
+    return applied, None
+
+@mcp.tool()
+def recover_documents(doc_ids: List[str] = None, list_only: bool = False) -> Any:
+    """
+    Recuperar documentos de una ejecucion anterior del servidor que termino sin cerrarlos
+    (por ejemplo por una caida), a partir de su diario de operaciones
+        - doc_ids: documentos a recuperar (por defecto todos los recuperables)
+        - list_only: solo listar los documentos recuperables, sin abrirlos
+    
+    Cada documento se abre con su doc_id original desde el ultimo punto de control del
+    diario y se vuelven a aplicar las operaciones posteriores. Los identificadores de
+    parrafos, tablas, etc. devueltos antes de la caida siguen siendo validos, y las
+    operaciones pueden deshacerse con undo. El ultimo documento recuperado queda activo.
+    Los diarios sin recuperar se borran a los WORD_MCP_JOURNAL_RETENTION_DAYS dias (7).
+    
+    Retorna: por documento, doc_id, ruta de origen, ultima ruta guardada, si tenia cambios
+    sin guardar y, al recuperar, las operaciones reaplicadas y el error si alguna fallo
+    """
+    try:
+        available = journal.recoverable()
+        if doc_ids is not None:
+            missing = set(doc_ids) - {item["doc_id"] for item in available}
+            if missing:
+                return f"No se encontro un diario recuperable para: {', '.join(sorted(missing))}"
+            available = [item for item in available if item["doc_id"] in doc_ids]
+        if list_only:
+            return available
+
+        for item in available:
+            document, handles, records, source_path = journal.load(item["doc_id"])
+            doc_id = documents.register(document, source_path=source_path, doc_id=item["doc_id"])
+            for handle, element in handles.items():
+                obj = rebuild_object(handle.split("_", 1)[0], element, document)
+                if obj is not None:
+                    live_objects.alias(handle, obj)
+            with documents.lock(doc_id):
+                applied, error = _replay(doc_id, records)
+                if error is not None:
+                    # Los registros siguientes ya no pueden aplicarse: el estado recuperado
+                    # pasa a ser el punto de control y se descartan
+                    log_event(logging.WARNING, "journal_replay_failed", doc_id=doc_id, error=error)
+                    journal.checkpoint(doc_id, document)
+            item.update(operations=applied, error=error)
+        return available
     except Exception as e:
-        error_msg = f"Error al crear tabla con datos: {str(e)}"
-        print(error_msg)
-        return error_msg
+        return f"Error al recuperar documentos: {str(e)}"
+
+# SECCION BATCH - ejecucion de varias operaciones en una sola llamada
+def _resolve_refs(value, results: List, named: Dict):
+    """
+    Sustituir referencias {"$ref": indice_o_id} por el resultado de operaciones anteriores,
+    o {"$ref": indice_o_id, "field": clave_o_posicion} por un campo de ese resultado
+    """
+    if isinstance(value, dict):
+        if set(value) in ({"$ref"}, {"$ref", "field"}):
+            ref = value["$ref"]
+            if isinstance(ref, int):
+                if not 0 <= ref < len(results):
+                    raise ValueError(f"La referencia {ref} no apunta a una operacion anterior")
+                result = results[ref]
+            elif ref not in named:
+                raise ValueError(f"La referencia '{ref}' no apunta a una operacion anterior")
+            else:
+                result = named[ref]
+            if "field" not in value:
+                return result
+            try:
+                return result[value["field"]]
+            except (KeyError, IndexError, TypeError):
+                raise ValueError(f"El resultado de la referencia '{ref}' no tiene el campo '{value['field']}'")
+        return {key: _resolve_refs(item, results, named) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve_refs(item, results, named) for item in value]
+    return value
+
+def _compact_result(value):
+    """Resumir un resultado para la respuesta JSON (los objetos de python-docx se reducen a su tipo)"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return {str(key): _compact_result(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_compact_result(item) for item in value]
+    return type(value).__name__
+
+@mcp.tool()
+def apply_operations(operations: List[Dict[str, Any]], stop_on_error: bool = True, doc_id: str = None) -> Dict:
+    """
+    Ejecutar una lista ordenada de operaciones en una sola llamada
+        - operations: lista de operaciones con la forma {"op": "add_paragraph", "args": {...}, "id": "opcional"}.
+          "op" es el nombre de cualquier herramienta y "args" sus mismos argumentos.
+          Un argumento {"$ref": n} o {"$ref": "id"} se reemplaza por el resultado de la
+          operacion n (indice) o de la operacion con ese "id", por ejemplo el parrafo creado
+          por un add_paragraph anterior. Con {"$ref": ..., "field": "table_id"} se usa un
+          campo del resultado (la tabla de un create_table, que retorna un diccionario).
+        - stop_on_error: si es True se detiene en la primera operacion fallida; si es False continua
+        - doc_id: documento por defecto para las operaciones que no indiquen doc_id
+
+    Retorna: Resumen con el numero de operaciones completadas y fallidas y el resultado de cada una
+    """
+    results = []
+    named = {}
+    summary = []
+    failed = 0
+
+    for index, operation in enumerate(operations):
+        name = operation.get("op")
+        try:
+            tool = mcp._tool_manager.get_tool(name) if name != "apply_operations" else None
+            if tool is None:
+                raise ValueError(f"Operacion desconocida: {name}")
+
+            args = _resolve_refs(operation.get("args") or {}, results, named)
+            if doc_id is not None and "doc_id" in tool.parameters.get("properties", {}):
+                args.setdefault("doc_id", doc_id)
+
+            # Validar y convertir argumentos igual que en una llamada individual, bajo el lock de su documento
+            result = mcp.locked_call(tool, args)
+            if is_error_result(result):
+                raise RuntimeError(result)
+        except Exception as e:
+            result = None
+            failed += 1
+            summary.append({"index": index, "op": name, "ok": False, "error": str(e)})
+        else:
+            summary.append({"index": index, "op": name, "ok": True, "result": _compact_result(result)})
+
+        results.append(result)
+        if "id" in operation:
+            named[operation["id"]] = result
+        if failed and stop_on_error:
+            break
+
+    return {
+        "completed": len(results) - failed,
+        "failed": failed,
+        "skipped": len(operations) - len(results),
+        "results": summary,
+    }
 
 # SECCION RESOURCES - gestion de recursos
+_MISSING = object()
+
 @mcp.tool()
 def save_resource(resource_id: str, content: Any) -> str:
     """
-    Guardar recurso en memoria y sistema de archivos
+    Guardar recurso en memoria y en el almacen de recursos
     
     - resource_id: identificador unico para el recurso
     - content: contenido del recurso (texto, ruta de archivo o datos JSON)
@@ -564,91 +1495,74 @@ def save_resource(resource_id: str, content: Any) -> str:
     Retorna: Mensaje de resultado
     """
     try:
-        # Print debug info
-        print(f"Saving resource: '{resource_id}', content type: {type(content)}")
+        log_event(logging.DEBUG, "save_resource", resource_id=resource_id, content_type=type(content).__name__)
         
         # Guardar en cache de memoria
-        resources_cache[resource_id] = content
+        resources_cache.put(resource_id, content)
         
-        # Guardar en archivo
-        resource_path = os.path.join(RESOURCES_DIR, f"{resource_id}.json")
-        
-        # If content is a file path and exists
-        if isinstance(content, str) and os.path.exists(content) and not os.path.isdir(content):
-            try:
-                # If it's a docx file, we'll just store the reference
-                if content.endswith('.docx'):
-                    with open(resource_path, 'w', encoding='utf-8') as f:
-                        json.dump({"content": content, "type": "docx_file"}, f, ensure_ascii=False, indent=2)
-                else:
-                    # For other file types, we might want to store the content directly
-                    with open(resource_path, 'w', encoding='utf-8') as f:
-                        json.dump({"content": content, "type": "file_path"}, f, ensure_ascii=False, indent=2)
-            except Exception as file_error:
-                print(f"Error handling file content: {file_error}")
-                raise
-        else:
-            # Regular content (string, dict, etc.)
-            with open(resource_path, 'w', encoding='utf-8') as f:
-                if isinstance(content, (dict, list)):
-                    json.dump(content, f, ensure_ascii=False, indent=2)
-                else:
-                    json.dump({"content": str(content)}, f, ensure_ascii=False, indent=2)
+        # Guardar en el almacen (para archivos existentes solo se guarda la referencia)
+        resource_store.put(resource_id, content)
         
         return f"Se ha guardado el recurso '{resource_id}' exitosamente"
     except Exception as e:
-        error_msg = f"Error al guardar recurso: {str(e)}"
-        print(error_msg)  # Debug print
-        return error_msg
+        return f"Error al guardar recurso: {str(e)}"
+
+@mcp.tool()
+def save_resources(resources: Dict[str, Any]) -> str:
+    """
+    Guardar varios recursos en una sola transaccion
+    
+    - resources: diccionario {resource_id: contenido}
+    
+    Retorna: Mensaje de resultado
+    """
+    try:
+        count = resource_store.put_many(resources.items())
+        resources_cache.update(resources)
+        return f"Se han guardado {count} recursos exitosamente"
+    except Exception as e:
+        return f"Error al guardar recursos: {str(e)}"
 
 @mcp.tool()
 def get_resource(resource_id: str) -> Any:
     """
-    Obtener recurso desde cache de memoria o sistema de archivos
+    Obtener recurso desde cache de memoria o almacen de recursos
     
     - resource_id: identificador del recurso a obtener
     
     Retorna: Contenido del recurso o mensaje de error
     """
     # Verificar en cache
-    if resource_id in resources_cache:
-        return resources_cache[resource_id]
+    content = resources_cache.get(resource_id, _MISSING)
+    if content is not _MISSING:
+        return content
     
-    # No esta en cache, intentar leer desde archivo
-    resource_path = os.path.join(RESOURCES_DIR, f"{resource_id}.json")
+    # No esta en cache, buscar en el almacen
     try:
-        if os.path.exists(resource_path):
-            with open(resource_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Si los datos se guardaron en formato simple, obtener el campo content
-                if isinstance(data, dict) and len(data) == 1 and "content" in data:
-                    content = data["content"]
-                else:
-                    content = data
-                
-                # Actualizar en cache
-                resources_cache[resource_id] = content
-                return content
-        else:
+        record = resource_store.get(resource_id)
+        if record is None:
             return f"No se encontro el recurso '{resource_id}'"
+        
+        # Actualizar en cache
+        content = record[1]
+        resources_cache.put(resource_id, content)
+        return content
     except Exception as e:
         return f"Error al leer recurso: {str(e)}"
 
 @mcp.tool()
-def list_resources() -> List[str]:
+def list_resources(prefix: str = None, limit: int = None, after: str = None) -> List[str]:
     """
-    Listar todos los recursos disponibles
+    Listar los recursos disponibles en orden alfabetico
+    
+    - prefix: solo recursos cuyo identificador empieza por este prefijo
+    - limit: numero maximo de identificadores a devolver
+    - after: devolver solo los identificadores posteriores a este (para paginar,
+      pasar el ultimo identificador de la pagina anterior)
     
     Retorna: Lista de identificadores de recursos
     """
-    # Obtener lista del directorio
-    resources = []
-    if os.path.exists(RESOURCES_DIR):
-        for filename in os.listdir(RESOURCES_DIR):
-            if filename.endswith('.json'):
-                resources.append(filename[:-5])  # Quitar extension .json
-    
-    return resources
+    return resource_store.list_ids(prefix=prefix, limit=limit, after=after)
 
 @mcp.tool()
 def delete_resource(resource_id: str) -> str:
@@ -660,20 +1574,55 @@ def delete_resource(resource_id: str) -> str:
     Retorna: Mensaje de resultado
     """
     # Eliminar del cache
-    if resource_id in resources_cache:
-        del resources_cache[resource_id]
+    in_cache = resources_cache.pop(resource_id, _MISSING) is not _MISSING
     
-    # Eliminar archivo
-    resource_path = os.path.join(RESOURCES_DIR, f"{resource_id}.json")
+    # Eliminar del almacen
     try:
-        if os.path.exists(resource_path):
-            os.remove(resource_path)
+        if resource_store.delete(resource_id) or in_cache:
             return f"Se ha eliminado el recurso '{resource_id}' exitosamente"
         else:
             return f"No se encontro el recurso '{resource_id}'"
     except Exception as e:
         return f"Error al eliminar recurso: {str(e)}"
 
+@mcp.tool()
+def get_resource_cache_stats() -> Dict[str, int]:
+    """
+    Estadisticas de la cache de recursos en memoria
+    
+    Retorna: entradas y bytes aproximados en cache, limites, aciertos, fallos y desalojos
+    """
+    stats = resources_cache.stats()
+    stats["live_objects"] = len(live_objects)
+    return stats
+
+@mcp.tool()
+def get_server_metrics(reset: bool = False) -> Dict[str, Any]:
+    """
+    Metricas agregadas del servidor desde el arranque (o desde el ultimo reset)
+        - reset: si es True, reinicia los contadores de herramientas despues de leerlos
+
+    Retorna: por herramienta llamadas, errores, latencias (media, p50/p95/p99 estimados del
+    histograma, maxima) y bytes aproximados de argumentos y resultados; ademas el estado de
+    documentos, caches y objetos vivos
+    """
+    metrics = {
+        "uptime_s": round(time.time() - tool_metrics.started_at, 3),
+        "tools": tool_metrics.snapshot(),
+        "documents": {
+            "open": len(documents),
+            "sessions": documents.sessions,
+            "cache_hits": document_cache.hits,
+            "cache_misses": document_cache.misses,
+        },
+        "resource_cache": resources_cache.stats(),
+        "prompt_cache": {"hits": prompt_cache.hits, "misses": prompt_cache.misses},
+        "live_objects": len(live_objects),
+    }
+    if reset:
+        tool_metrics.reset()
+    return metrics
+
 # SECCION PROMPT - gestion de templates y prompts
 @mcp.tool()
 def save_prompt(prompt_id: str, template: str, description: str = "", metadata: Dict = None) -> str:
@@ -699,6 +1648,7 @@ def save_prompt(prompt_id: str, template: str, description: str = "", metadata:
     try:
         with open(prompt_path, 'w', encoding='utf-8') as f:
             json.dump(prompt_data, f, ensure_ascii=False, indent=2)
+        prompt_cache.invalidate(prompt_id)
         return f"Se ha guardado el prompt '{prompt_id}' exitosamente"
     except Exception as e:
         return f"Error al guardar prompt: {str(e)}"
@@ -712,13 +1662,10 @@ def get_prompt(prompt_id: str) -> Dict:
     
     Retorna: Informacion completa del prompt o mensaje de error
     """
-    prompt_path = os.path.join(PROMPTS_DIR, f"{prompt_id}.json")
     try:
-        if os.path.exists(prompt_path):
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
-            return {"error": f"No se encontro el prompt '{prompt_id}'"}
+        return deepcopy(prompt_cache.get(prompt_id)[0])
+    except FileNotFoundError:
+        return {"error": f"No se encontro el prompt '{prompt_id}'"}
     except Exception as e:
         return {"error": f"Error al leer prompt: {str(e)}"}
 
@@ -750,6 +1697,7 @@ def delete_prompt(prompt_id: str) -> str:
     try:
         if os.path.exists(prompt_path):
             os.remove(prompt_path)
+            prompt_cache.invalidate(prompt_id)
             return f"Se ha eliminado el prompt '{prompt_id}' exitosamente"
         else:
             return f"No se encontro el prompt '{prompt_id}'"
@@ -766,24 +1714,40 @@ def render_prompt(prompt_id: str, variables: Dict = None) -> str:
     
     Retorna: Prompt renderizado con las variables reemplazadas
     """
-    prompt_info = get_prompt(prompt_id)
+    try:
+        compiled = prompt_cache.get(prompt_id)[1]
+    except FileNotFoundError:
+        return f"No se encontro el prompt '{prompt_id}'"
+    except Exception as e:
+        return f"Error al leer prompt: {str(e)}"
     
-    if "error" in prompt_info:
-        return prompt_info["error"]
+    # Reemplazo de variables en una sola pasada sobre el template compilado
+    try:
+        return compiled.render(variables)
+    except Exception as e:
+        return f"Error al renderizar prompt: {str(e)}"
+
+@mcp.tool()
+def render_prompt_batch(prompt_id: str, variable_sets: List[Dict]) -> Any:
+    """
+    Renderizar un mismo prompt con muchos conjuntos de variables en una sola llamada
     
-    template = prompt_info.get("template", "")
+    - prompt_id: identificador del prompt
+    - variable_sets: lista de diccionarios de variables, uno por resultado
     
-    # Realizar reemplazo de variables
-    if variables:
-        try:
-            # Usar format string de Python
-            for key, value in variables.items():
-                placeholder = "{" + key + "}"
-                template = template.replace(placeholder, str(value))
-        except Exception as e:
-            return f"Error al renderizar prompt: {str(e)}"
+    Retorna: Lista de prompts renderizados, en el mismo orden que variable_sets
+    """
+    try:
+        compiled = prompt_cache.get(prompt_id)[1]
+    except FileNotFoundError:
+        return f"No se encontro el prompt '{prompt_id}'"
+    except Exception as e:
+        return f"Error al leer prompt: {str(e)}"
     
-    return template
+    try:
+        return [compiled.render(variables) for variables in variable_sets]
+    except Exception as e:
+        return f"Error al renderizar prompt: {str(e)}"
 
 def import_datetime_and_get_now():
     """Helper function to get current datetime"""
@@ -791,5 +1755,16 @@ def import_datetime_and_get_now():
     return datetime.now()
 
 if __name__ == "__main__":
-    print("Server starting...")
-    mcp.run(transport="stdio")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Word MCP Server")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"],
+                        default=os.environ.get("WORD_MCP_TRANSPORT", "stdio"))
+    parser.add_argument("--host", default=os.environ.get("WORD_MCP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("WORD_MCP_PORT", "8000")))
+    args = parser.parse_args()
+
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    journal.prune()
+    log_event(logging.INFO, "server_starting", transport=args.transport, host=args.host, port=args.port)
+    warm_blank_document()
+    mcp.run(transport=args.transport)
\ No newline at end of file
@@ -0,0 +1,130 @@
+import contextvars
+import os
+import threading
+import weakref
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Optional
+
+import anyio
+from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp.exceptions import ToolError
+
+from documents import DocumentRegistry
+
+# Hilos que ejecutan herramientas a la vez (llamadas concurrentes de uno o varios clientes)
+WORKER_THREADS = int(os.environ.get("WORD_MCP_WORKER_THREADS", "16"))
+
+
+class SessionDocuments:
+    """
+    Registro de documentos de la sesion que hace la llamada actual.
+
+    Cada cliente (sesion MCP) tiene su propio DocumentRegistry, de modo que no ve ni
+    modifica los documentos de los demas; fuera de una sesion (llamadas directas desde
+    Python) se usa un registro por defecto. Los atributos y metodos se delegan en el
+    registro de la sesion actual, por lo que se usa igual que un DocumentRegistry.
+    """
+
+    def __init__(self, factory: Callable[[], DocumentRegistry]):
+        self._factory = factory
+        self._default = factory()
+        self._current: "contextvars.ContextVar[Optional[DocumentRegistry]]" = contextvars.ContextVar(
+            "word_mcp_documents", default=None
+        )
+        self._sessions: "weakref.WeakKeyDictionary[Any, DocumentRegistry]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def for_session(self, session) -> DocumentRegistry:
+        """Registro de una sesion, creado en su primera llamada"""
+        if session is None:
+            return self._default
+        with self._lock:
+            registry = self._sessions.get(session)
+            if registry is None:
+                registry = self._sessions[session] = self._factory()
+                # Al terminar la sesion se cierran sus documentos (y se borran sus temporales)
+                weakref.finalize(session, registry.close_all)
+        return registry
+
+    def activate(self, registry: DocumentRegistry) -> contextvars.Token:
+        return self._current.set(registry)
+
+    def deactivate(self, token: contextvars.Token) -> None:
+        self._current.reset(token)
+
+    def current(self) -> DocumentRegistry:
+        return self._current.get() or self._default
+
+    @property
+    def sessions(self) -> int:
+        return len(self._sessions)
+
+    def __getattr__(self, name: str):
+        return getattr(self.current(), name)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.current()
+
+    def __len__(self) -> int:
+        return len(self.current())
+
+
+class ConcurrentFastMCP(FastMCP):
+    """
+    FastMCP que ejecuta cada herramienta en un hilo de trabajo, con el registro de
+    documentos de la sesion que la llama y bajo el lock del documento sobre el que
+    actua: las llamadas sobre documentos distintos se ejecutan en paralelo y las del
+    mismo documento de una en una. (FastMCP ejecuta las herramientas sincronas en el
+    propio bucle de eventos, de modo que una llamada lenta bloquea a todos los clientes.)
+
+    El lock de cada llamada lo elige la funcion registrada con @mcp.document_lock.
+    """
+
+    def __init__(self, *args, documents: SessionDocuments, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.documents = documents
+        self._lock_resolver = lambda name, arguments, accepts_doc_id: nullcontext()
+        self._limiter = None
+
+    def document_lock(self, resolver: Callable[[str, Dict, bool], Any]):
+        """
+        Registrar resolver(nombre, argumentos, acepta_doc_id) -> lock (context manager) de
+        una llamada, o un mensaje de error que se retorna sin ejecutar la herramienta
+        """
+        self._lock_resolver = resolver
+        return resolver
+
+    def locked_call(self, tool, arguments: Dict) -> Any:
+        """Validar los argumentos como FastMCP y ejecutar la herramienta bajo el lock de su documento"""
+        metadata = tool.fn_metadata
+        parsed = metadata.arg_model.model_validate(metadata.pre_parse_json(arguments)).model_dump_one_level()
+        accepts_doc_id = "doc_id" in tool.parameters.get("properties", {})
+        lock = self._lock_resolver(tool.name, parsed, accepts_doc_id)
+        if isinstance(lock, str):
+            return lock
+        with lock:
+            return tool.fn(**parsed)
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        tool = self._tool_manager.get_tool(name)
+        if tool is None or tool.is_async or tool.context_kwarg is not None:
+            return await super().call_tool(name, arguments)
+
+        try:
+            session = self.get_context().request_context.session
+        except ValueError:
+            session = None
+        registry = self.documents.for_session(session)
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(WORKER_THREADS)
+
+        def run():
+            token = self.documents.activate(registry)
+            try:
+                return tool.fn_metadata.convert_result(self.locked_call(tool, arguments))
+            except Exception as e:
+                raise ToolError(f"Error executing tool {name}: {e}") from e
+            finally:
+                self.documents.deactivate(token)
+
+        return await anyio.to_thread.run_sync(run, limiter=self._limiter)
@@ -0,0 +1,213 @@
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from docx.opc.pkgwriter import _ContentTypesItem
+from lxml import etree
+
+from documents import blank_document
+from saving import FILE_MODE
+
+# Operaciones admitidas por un documento en modo streaming
+SUPPORTED_OPERATIONS = (
+    "add_heading", "add_paragraph", "add_table", "add_page_break", "add_markdown", "merge_documents", "import_table",
+)
+
+_XMLNS = re.compile(r' xmlns:(\w+)="([^"]*)"')
+
+
+class StreamingUnsupportedError(NotImplementedError):
+    """Operacion de acceso aleatorio que no existe en modo streaming"""
+
+
+def is_streaming(document) -> bool:
+    return isinstance(document, StreamingDocument)
+
+
+def append_to_body(document, elements) -> None:
+    """Agregar elementos w:p o w:tbl ya construidos al final del cuerpo (antes de w:sectPr)"""
+    if is_streaming(document):
+        document.add_elements(elements)
+        return
+    body = document.part.element.body
+    sect_pr = body.sectPr
+    if sect_pr is None:
+        body.extend(elements)
+    else:
+        index = body.index(sect_pr)
+        body[index:index] = elements
+
+
+class StreamingDocument:
+    """
+    Documento de solo anexado que escribe el cuerpo de document.xml directamente en
+    el zip a medida que se agregan elementos, con memoria acotada sin importar la
+    longitud del documento.
+
+    Cada elemento se construye con python-docx sobre un documento auxiliar vacio,
+    por lo que las herramientas existentes funcionan igual, y se vuelca al zip
+    cuando se agrega el siguiente. En consecuencia:
+
+    - Solo se admiten add_heading, add_paragraph, add_table, add_page_break, add_markdown,
+      merge_documents e import_table.
+    - Solo el ultimo elemento agregado puede modificarse (agregar texto a un
+      parrafo, llenar celdas o filas de una tabla); los anteriores ya estan escritos.
+    - No hay acceso a paragraphs, tables, sections, imagenes ni nuevas secciones.
+    - save() finaliza el documento; despues no se pueden agregar mas elementos.
+    """
+
+    streaming = True
+
+    def __init__(self, spill_dir: str = None):
+        spill_dir = spill_dir or os.path.join(tempfile.gettempdir(), "word-mcp-server", "streams")
+        os.makedirs(spill_dir, exist_ok=True)
+        fd, self._path = tempfile.mkstemp(suffix=".docx", dir=spill_dir)
+        os.close(fd)
+        os.chmod(self._path, FILE_MODE)
+
+        self._scratch = blank_document()
+        self._body = self._scratch.element.body
+        self._root_nsmap = dict(self._scratch.element.nsmap)
+        self.elements_written = 0
+        self.finished = False
+        # Tabla cuyas filas se estan escribiendo (write_rows): su etiqueta de cierre falta
+        self._open_table = None
+
+        self._zip = zipfile.ZipFile(self._path, "w", zipfile.ZIP_DEFLATED)
+        self._stream = self._zip.open(self._scratch.part.partname.membername, "w", force_zip64=True)
+        self._stream.write(self._document_header())
+
+    # Escritura del paquete
+
+    def _write_other_parts(self) -> None:
+        """Escribir todas las partes salvo document.xml (estilos creados durante la escritura incluidos)"""
+        package = self._scratch.part.package
+        parts = list(package.iter_parts())
+        for part in parts:
+            part.before_marshal()
+        self._zip.writestr(CONTENT_TYPES_URI.membername, _ContentTypesItem.from_parts(parts).blob)
+        self._zip.writestr(PACKAGE_URI.rels_uri.membername, package.rels.xml)
+        for part in parts:
+            if part is not self._scratch.part:
+                self._zip.writestr(part.partname.membername, part.blob)
+            if len(part.rels):
+                self._zip.writestr(part.partname.rels_uri.membername, part.rels.xml)
+
+    def _document_header(self) -> bytes:
+        root = self._scratch.element
+        shell = etree.tostring(etree.Element(root.tag, attrib=dict(root.attrib), nsmap=root.nsmap))
+        return b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n" + shell[:-2] + b"><w:body>"
+
+    def _serialize(self, element) -> bytes:
+        xml = etree.tostring(element, encoding="unicode")
+        # Quitar de la etiqueta inicial los namespaces ya declarados en w:document
+        end = xml.index(">")
+        start_tag = _XMLNS.sub(
+            lambda m: "" if self._root_nsmap.get(m.group(1)) == m.group(2) else m.group(0), xml[:end]
+        )
+        return (start_tag + xml[end:]).encode("utf-8")
+
+    def flush(self) -> None:
+        """Escribir y liberar todos los elementos del cuerpo pendientes"""
+        for element in list(self._body):
+            if element is self._body.sectPr:
+                continue
+            if element is self._open_table:
+                self.write_rows(element)
+                self._stream.write(b"</w:tbl>")
+                self._open_table = None
+            else:
+                self._stream.write(self._serialize(element))
+            self._body.remove(element)
+            self.elements_written += 1
+
+    def write_rows(self, tbl, xml: str = None) -> None:
+        """
+        Escribir y liberar las filas ya agregadas a la ultima tabla, seguidas de las
+        filas en xml (generadas con tables.rows_xml, sin construir sus elementos). La
+        tabla sigue abierta para agregar mas (import_table): la memoria no crece con
+        el numero de filas.
+        """
+        rows = tbl.tr_lst
+        for row in rows:
+            tbl.remove(row)
+        if self._open_table is not tbl:
+            # Propiedades y cuadricula de la tabla, sin la etiqueta de cierre
+            start = self._serialize(tbl)
+            self._stream.write(start[: start.rindex(b"</w:tbl>")])
+            self._open_table = tbl
+        self._stream.write(b"".join(self._serialize(row) for row in rows))
+        if xml:
+            self._stream.write(xml.encode("utf-8"))
+
+    def _before_add(self) -> None:
+        if self.finished:
+            raise StreamingUnsupportedError("El documento en modo streaming ya fue finalizado con save()")
+        self.flush()
+
+    # API compatible con Document
+
+    @property
+    def part(self):
+        return self._scratch.part
+
+    def add_heading(self, text: str = "", level: int = 1):
+        self._before_add()
+        return self._scratch.add_heading(text, level)
+
+    def add_paragraph(self, text: str = "", style=None):
+        self._before_add()
+        return self._scratch.add_paragraph(text, style)
+
+    def add_table(self, rows: int, cols: int, style=None):
+        self._before_add()
+        return self._scratch.add_table(rows, cols, style)
+
+    def add_page_break(self):
+        self._before_add()
+        return self._scratch.add_page_break()
+
+    def add_elements(self, elements) -> None:
+        """Agregar elementos w:p o w:tbl ya construidos (add_markdown, merge_documents)"""
+        self._before_add()
+        sect_pr = self._body.sectPr
+        for element in elements:
+            sect_pr.addprevious(element)
+
+    def save(self, path: str) -> None:
+        """Finalizar el documento y moverlo a path"""
+        if not self.finished:
+            self.flush()
+            self._stream.write(self._serialize(self._body.sectPr) + b"</w:body></w:document>")
+            self._stream.close()
+            self._write_other_parts()
+            self._zip.close()
+            self.finished = True
+        elif not os.path.exists(self._path):
+            raise StreamingUnsupportedError("El documento en modo streaming ya fue guardado")
+        shutil.move(self._path, path)
+
+    def discard(self) -> None:
+        """Abandonar el documento y eliminar el archivo parcial"""
+        if not self.finished:
+            self._stream.close()
+            self._zip.close()
+            self.finished = True
+        if os.path.exists(self._path):
+            os.remove(self._path)
+
+    def __del__(self):
+        # Un documento abandonado sin save() ni discard() no deja archivos parciales
+        try:
+            self.discard()
+        except Exception:
+            pass
+
+    def __getattr__(self, name):
+        raise StreamingUnsupportedError(
+            f"'{name}' no esta disponible en modo streaming; solo se admiten "
+            f"{', '.join(SUPPORTED_OPERATIONS)} y la edicion del ultimo elemento agregado"
+        )
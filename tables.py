@@ -0,0 +1,189 @@
+from typing import Any, Iterable, List, Optional, Sequence, Union
+from xml.sax.saxutils import escape
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.shared import Emu
+
+# Valores de w:jc para cada alineacion aceptada por las herramientas
+ALIGNMENTS = {
+    "LEFT": "left",
+    "CENTER": "center",
+    "RIGHT": "right",
+    "JUSTIFY": "both",
+}
+
+_W_TBL_GRID = qn("w:tblGrid")
+
+# Propiedades de las tablas nuevas, como las crea python-docx
+_TBL_LOOK = (
+    '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+    'w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+)
+
+
+def _per_column(value, cols: int) -> List:
+    """Expandir un valor unico a una lista por columna"""
+    if isinstance(value, (list, tuple)):
+        if len(value) != cols:
+            raise ValueError(f"Se esperaban {cols} valores por columna y se recibieron {len(value)}")
+        return list(value)
+    return [value] * cols
+
+
+def _cell_template(width: Optional[str], bold: bool, alignment: Optional[str], font_size: Optional[int]):
+    """Precalcular el XML de apertura y cierre de una celda con su formato"""
+    if alignment is not None and alignment not in ALIGNMENTS:
+        raise ValueError(f"Alineacion no valida: {alignment}")
+
+    ppr = f'<w:pPr><w:jc w:val="{ALIGNMENTS[alignment]}"/></w:pPr>' if alignment else ""
+    rpr = ""
+    if bold:
+        rpr += "<w:b/>"
+    if font_size:
+        rpr += f'<w:sz w:val="{int(font_size * 2)}"/>'
+    if rpr:
+        rpr = f"<w:rPr>{rpr}</w:rPr>"
+
+    tcpr = f'<w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>' if width else ""
+    tc_open = f"<w:tc>{tcpr}<w:p>{ppr}"
+    return tc_open, f"<w:r>{rpr}", "</w:r></w:p></w:tc>", f"{tc_open}</w:p></w:tc>"
+
+
+def text_xml(value: Any) -> str:
+    """Convertir un texto (de una celda o un run) en elementos w:t, w:tab y w:br como hace python-docx"""
+    text = escape(str(value))
+    if "\t" not in text and "\n" not in text:
+        return f'<w:t xml:space="preserve">{text}</w:t>'
+    parts = []
+    for i, line in enumerate(text.split("\n")):
+        if i:
+            parts.append("<w:br/>")
+        for j, chunk in enumerate(line.split("\t")):
+            if j:
+                parts.append("<w:tab/>")
+            if chunk:
+                parts.append(f'<w:t xml:space="preserve">{chunk}</w:t>')
+    return "".join(parts)
+
+
+def _templates(widths: List[Optional[str]], bold, alignments, font_sizes) -> List:
+    cols = len(widths)
+    return [
+        _cell_template(width, col_bold, col_alignment, col_size)
+        for width, col_bold, col_alignment, col_size in zip(
+            widths,
+            _per_column(bold, cols),
+            _per_column(alignments, cols),
+            _per_column(font_sizes, cols),
+        )
+    ]
+
+
+def _rows_xml(rows: Iterable[Sequence], templates: List) -> str:
+    cols = len(templates)
+    parts = []
+    for row in rows:
+        parts.append("<w:tr>")
+        for col in range(cols):
+            value = row[col] if col < len(row) else None
+            tc_open, run_open, tc_close, tc_empty = templates[col]
+            if value is None or value == "":
+                parts.append(tc_empty)
+            else:
+                parts.append(tc_open)
+                parts.append(run_open)
+                parts.append(text_xml(value))
+                parts.append(tc_close)
+        parts.append("</w:tr>")
+    return "".join(parts)
+
+
+def rows_xml(
+    table,
+    rows: Iterable[Sequence],
+    bold: Union[bool, List[bool]] = False,
+    alignments: Union[str, List[Optional[str]], None] = None,
+    font_sizes: Union[int, List[Optional[int]], None] = None,
+) -> str:
+    """XML de las filas (w:tr) para la tabla, sin agregarlas (ver append_rows)"""
+    # La busqueda de lxml por etiqueta recorre todas las filas; w:tblGrid es de los primeros hijos
+    grid = next(child for child in table._tbl if child.tag == _W_TBL_GRID)
+    widths = [grid_col.get(qn("w:w")) for grid_col in grid.gridCol_lst]
+    templates = _templates(widths, bold, alignments, font_sizes)
+    return _rows_xml(rows, templates)
+
+
+def append_rows(
+    table,
+    rows: Iterable[Sequence],
+    bold: Union[bool, List[bool]] = False,
+    alignments: Union[str, List[Optional[str]], None] = None,
+    font_sizes: Union[int, List[Optional[int]], None] = None,
+) -> int:
+    """
+    Agregar filas a una tabla construyendo su XML en una sola pasada.
+
+    Cada fila se rellena o recorta al numero de columnas de la tabla. El formato
+    (negrita, alineacion, tamano de fuente) puede ser un valor unico o una lista
+    por columna. Retorna el numero de filas agregadas.
+    """
+    xml = rows_xml(table, rows, bold, alignments, font_sizes)
+    fragment = parse_xml(f"<w:tbl {nsdecls('w')}>{xml}</w:tbl>")
+    new_rows = list(fragment)
+    table._tbl.extend(new_rows)
+    return len(new_rows)
+
+
+def table_xml(
+    headers: Optional[List[str]],
+    data: Iterable[Sequence],
+    cols: int,
+    width: int,
+    style_id: Optional[str] = None,
+    alignments: Union[str, List[Optional[str]], None] = None,
+    font_sizes: Union[int, List[Optional[int]], None] = None,
+    header_alignment: Optional[str] = "CENTER",
+) -> str:
+    """
+    XML de una tabla completa como la de build_table (sin declarar el espacio de nombres
+    w, para insertarla dentro de un fragmento mayor), con width (EMU) repartido entre las
+    columnas como hace document.add_table. Para agregar muchas tablas: add_table busca
+    la ultima seccion del documento en cada llamada, aqui el ancho se calcula una vez.
+    """
+    col_width = str(Emu(width // cols).twips) if cols > 0 else "0"
+    widths = [col_width] * cols
+    style = f'<w:tblStyle w:val="{style_id}"/>' if style_id else ""
+    parts = [f'<w:tbl><w:tblPr>{style}<w:tblW w:type="auto" w:w="0"/>{_TBL_LOOK}</w:tblPr><w:tblGrid>']
+    parts.extend(f'<w:gridCol w:w="{col_width}"/>' for col_width in widths)
+    parts.append("</w:tblGrid>")
+    if headers:
+        parts.append(_rows_xml([headers], _templates(widths, True, header_alignment, font_sizes)))
+    parts.append(_rows_xml(data, _templates(widths, False, alignments, font_sizes)))
+    parts.append("</w:tbl>")
+    return "".join(parts)
+
+
+def build_table(
+    document,
+    headers: Optional[List[str]],
+    data: Iterable[Sequence],
+    style: Optional[str] = "Table Grid",
+    alignments: Union[str, List[Optional[str]], None] = None,
+    font_sizes: Union[int, List[Optional[int]], None] = None,
+    cols: int = None,
+    header_alignment: Optional[str] = "CENTER",
+):
+    """
+    Crear una tabla completa (encabezado en negrita + filas de datos) generando
+    todo el elemento w:tbl en una sola pasada lineal.
+    """
+    if cols is None:
+        cols = len(headers)
+    table = document.add_table(rows=0, cols=cols)
+    if style:
+        table.style = style
+    if headers:
+        append_rows(table, [headers], bold=True, alignments=header_alignment, font_sizes=font_sizes)
+    append_rows(table, data, alignments=alignments, font_sizes=font_sizes)
+    return table
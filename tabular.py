@@ -0,0 +1,383 @@
+import csv
+import itertools
+import os
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+from streaming import is_streaming
+from tables import append_rows, build_table, rows_xml
+
+# Filas que se leen, formatean y agregan a la tabla en cada bloque
+DEFAULT_CHUNK_ROWS = 1000
+
+# Extensiones leidas como texto delimitado
+CSV_EXTENSIONS = (".csv", ".tsv", ".txt")
+
+# Valores cuya parte entera cabe en int64; los mayores se formatean con Python
+_INT_LIMIT = 2 ** 62
+
+_TBL_HEADER = f'<w:trPr {nsdecls("w")}><w:tblHeader/></w:trPr>'
+
+# numpy se importa dentro de las funciones: cargarlo cuesta ~100 ms en el arranque
+
+
+class CsvSource:
+    """Archivo CSV leido por bloques de filas; cada bloque se entrega por columnas"""
+
+    def __init__(self, path: str, delimiter: Optional[str] = None, has_header: bool = True):
+        self._file = open(path, newline="", encoding="utf-8-sig")
+        if delimiter is None:
+            delimiter = "\t" if path.lower().endswith(".tsv") else self._sniff()
+        self._reader = csv.reader(self._file, delimiter=delimiter)
+        first = next(self._reader, None)
+        if not first:
+            raise ValueError("La primera fila del archivo esta vacia")
+        self.cols = len(first)
+        self.headers = first if has_header else None
+        self._pending = None if has_header else [first]
+
+    def _sniff(self) -> str:
+        sample = self._file.read(64 * 1024)
+        self._file.seek(0)
+        try:
+            return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+        except csv.Error:
+            return ","
+
+    def chunks(self, chunk_rows: int) -> Iterator[List[Sequence]]:
+        cols = self.cols
+        rows = itertools.chain(self._pending or (), self._reader)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_rows))
+            if not chunk:
+                return
+            # Filas rellenadas o recortadas al numero de columnas, traspuestas a columnas
+            chunk = [row if len(row) == cols else (row + [""] * cols)[:cols] for row in chunk]
+            yield list(zip(*chunk))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ArraySource:
+    """
+    Matriz de NumPy (1D, 2D o estructurada) guardada en .npy, abierta con mmap para
+    leer solo el bloque de filas que se esta procesando.
+    """
+
+    def __init__(self, path: str):
+        import numpy as np
+
+        array = np.load(path, mmap_mode="r", allow_pickle=False)
+        if array.dtype.names:
+            if array.ndim != 1:
+                raise ValueError("La matriz estructurada debe ser de una dimension")
+            self.headers = list(array.dtype.names)
+        elif array.ndim == 1:
+            array = array.reshape(-1, 1)
+            self.headers = None
+        elif array.ndim == 2:
+            self.headers = None
+        else:
+            raise ValueError(f"La matriz debe tener 1 o 2 dimensiones (tiene {array.ndim})")
+        self._array = array
+        self.cols = len(self.headers) if self.headers else array.shape[1]
+
+    def chunks(self, chunk_rows: int) -> Iterator[List[Sequence]]:
+        array = self._array
+        for start in range(0, len(array), chunk_rows):
+            block = array[start:start + chunk_rows]
+            if self.headers:
+                yield [block[name] for name in self.headers]
+            else:
+                yield [block[:, col] for col in range(self.cols)]
+
+    def close(self) -> None:
+        # Liberar el mmap del archivo
+        self._array = None
+
+
+def open_source(path: str, delimiter: Optional[str] = None, has_header: bool = True):
+    """Origen de datos segun la extension del archivo"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        return CsvSource(path, delimiter, has_header)
+    if extension == ".npy":
+        return ArraySource(path)
+    raise ValueError(f"Formato de datos no soportado: {extension} (use .csv, .tsv o .npy)")
+
+
+# Numeros
+
+def parse_numbers(column) -> Tuple:
+    """
+    Valores de una columna como float64 y mascara de las celdas que no son numeros
+    (vacias o texto), que conservan su texto original.
+    """
+    import numpy as np
+
+    column = np.asarray(column)
+    if column.dtype.kind in "iuf":
+        values = column.astype(np.float64, copy=False)
+        return values, np.isnan(values)
+    if column.dtype.kind not in "US":
+        column = column.astype(str)
+    texts = np.char.strip(column)
+    missing = texts == ""
+    try:
+        values = np.where(missing, "nan", texts).astype(np.float64)
+    except ValueError:
+        # Alguna celda no es un numero: se convierten de una en una
+        values = np.array([_to_float(text) for text in texts.tolist()], dtype=np.float64)
+    return values, np.isnan(values)
+
+
+def _to_float(text: str) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        return float("nan")
+
+
+def is_integral(column, values, invalid) -> bool:
+    """Si los numeros de la columna son enteros (se muestran sin decimales)"""
+    import numpy as np
+
+    column = np.asarray(column)
+    if column.dtype.kind in "iu":
+        return True
+    if column.dtype.kind == "f":
+        valid = values[~invalid]
+        return bool(np.all(valid == np.trunc(valid)))
+    # Texto: "2.0" se considera decimal aunque su valor sea entero
+    return not np.any(np.char.find(np.asarray(column, dtype=str)[~invalid], ".") >= 0) and bool(
+        np.all(np.isfinite(values[~invalid]))
+    )
+
+
+def format_numbers(values, decimals: int = 2, thousands_separator: str = ",", decimal_separator: str = ".") -> List[str]:
+    """
+    Formatear una columna de numeros con decimales fijos y separador de miles, de forma
+    vectorizada. El resultado es el mismo que format(valor, ",.Nf") con los separadores
+    indicados, salvo que un valor que se redondea a cero no lleva signo. NaN se convierte
+    en una celda vacia.
+    """
+    import numpy as np
+
+    values = np.asarray(values)
+    if values.dtype.kind in "iu" and decimals == 0:
+        safe = (values > -_INT_LIMIT) & (values < _INT_LIMIT)
+        whole = np.abs(np.where(safe, values, 0).astype(np.int64))
+        fraction = None
+        negative = safe & (values < 0)
+    else:
+        values = values.astype(np.float64, copy=False)
+        scale = 10 ** decimals
+        magnitude = np.abs(values)
+        safe = np.isfinite(values) & (magnitude < _INT_LIMIT)
+        magnitude = np.where(safe, magnitude, 0)
+        # La parte entera y el resto son exactos; solo el resto se escala y se redondea
+        whole = np.trunc(magnitude)
+        scaled = (magnitude - whole) * scale
+        tie = scaled - np.floor(scaled) == 0.5
+        if decimals:
+            # Un producto exactamente en .5 puede deberse al redondeo del producto: lo resuelve Python
+            safe &= ~tie
+        fraction = np.rint(scaled).astype(np.int64)
+        carry = fraction == scale
+        whole = whole.astype(np.int64) + carry
+        fraction = np.where(carry, 0, fraction)
+        if not decimals:
+            # Empates exactos: al par, como Python
+            whole += tie & (whole % 2 == 1)
+        negative = safe & (values < 0) & ((whole > 0) | (fraction > 0))
+
+    result = _layout(whole, fraction, negative, decimals, thousands_separator, decimal_separator)
+    if not np.all(safe):
+        # NaN vacio; infinitos y valores demasiado grandes con el formato de Python
+        translation = str.maketrans({",": thousands_separator, ".": decimal_separator})
+        for i in np.flatnonzero(~safe).tolist():
+            value = values[i].item()
+            if value != value:
+                result[i] = ""
+            else:
+                spec = "," if isinstance(value, int) else f",.{decimals}f"
+                result[i] = format(value, spec).translate(translation)
+    return result
+
+
+def _layout(whole, fraction, negative, decimals: int, thousands_separator: str, decimal_separator: str) -> List[str]:
+    """
+    Texto de cada numero a partir de su parte entera y decimal: se arma una matriz de
+    caracteres (una fila por numero, una columna por posicion, alineada a la derecha) con
+    operaciones sobre columnas completas, y se decodifica de una sola vez. Las posiciones
+    sin caracter (ceros a la izquierda, separadores de grupos que no existen) quedan en
+    NUL y se eliminan al final.
+    """
+    import numpy as np
+
+    count = len(whole)
+    if not count:
+        return []
+    powers = 10 ** np.arange(19, dtype=np.int64)
+    digits = 1 + (whole[:, None] >= powers[1:]).sum(axis=1)
+
+    columns = [np.where(negative, ord("-"), 0)]
+    for position in range(int(digits.max()) - 1, -1, -1):
+        shown = digits > position
+        columns.append(np.where(shown, whole // powers[position] % 10 + ord("0"), 0))
+        if position and position % 3 == 0 and thousands_separator:
+            # Separador entre esta cifra y la siguiente, si esta cifra se muestra
+            columns.extend(np.where(shown, ord(char), 0) for char in thousands_separator)
+    if decimals:
+        columns.extend(np.full(count, ord(char)) for char in decimal_separator)
+        columns.extend(fraction // powers[position] % 10 + ord("0") for position in range(decimals - 1, -1, -1))
+    columns.append(np.full(count, ord("\n")))
+
+    matrix = np.stack(columns, axis=1).astype("<u4")
+    return matrix.tobytes().decode("utf-32-le").replace("\0", "").split("\n")[:-1]
+
+
+# Importacion
+
+class ColumnFormat:
+    """Formato de una columna, decidido con el primer bloque de datos"""
+
+    __slots__ = ("numeric", "decimals")
+
+    def __init__(self, numeric: bool, decimals: int = 0):
+        self.numeric = numeric
+        self.decimals = decimals
+
+
+def detect_formats(columns: List[Sequence], decimals) -> List[ColumnFormat]:
+    """Columnas numericas (todas sus celdas no vacias son numeros) y sus decimales"""
+    import numpy as np
+
+    formats = []
+    for i, column in enumerate(columns):
+        kind = np.asarray(column).dtype.kind if not isinstance(column, tuple) else "U"
+        if kind not in "iufUS":
+            formats.append(ColumnFormat(False))
+            continue
+        values, invalid = parse_numbers(column)
+        texts = np.char.strip(np.asarray(column, dtype=str)) if kind in "US" else None
+        if np.all(invalid) or (texts is not None and np.any(invalid & (texts != ""))):
+            formats.append(ColumnFormat(False))
+            continue
+        column_decimals = decimals[i] if isinstance(decimals, (list, tuple)) else decimals
+        if column_decimals is None:
+            column_decimals = 0 if is_integral(column, values, invalid) else 2
+        if not 0 <= int(column_decimals) <= 15:
+            raise ValueError(f"decimals debe estar entre 0 y 15 (columna {i})")
+        formats.append(ColumnFormat(True, int(column_decimals)))
+    return formats
+
+
+def format_chunk(columns: List[Sequence], formats: List[ColumnFormat],
+                 thousands_separator: str, decimal_separator: str) -> List[Tuple]:
+    """Filas de texto de un bloque: columnas numericas formateadas, el resto como texto"""
+    formatted = []
+    for column, column_format in zip(columns, formats):
+        if column_format.numeric:
+            values, invalid = parse_numbers(column)
+            texts = format_numbers(values, column_format.decimals, thousands_separator, decimal_separator)
+            if invalid.any():
+                # Celdas que no son numeros (en bloques posteriores al primero): su texto original
+                original = column if isinstance(column, tuple) else column.tolist()
+                for i in invalid.nonzero()[0].tolist():
+                    texts[i] = "" if original[i] is None else str(original[i]).strip()
+                    if texts[i] == "nan":
+                        texts[i] = ""
+            formatted.append(texts)
+        elif isinstance(column, tuple):
+            formatted.append(column)
+        else:
+            formatted.append(column.astype(str).tolist() if column.dtype.kind != "O" else column.tolist())
+    return list(zip(*formatted))
+
+
+def import_table(
+    document,
+    path: str,
+    headers: Optional[List[str]] = None,
+    has_header: bool = True,
+    delimiter: Optional[str] = None,
+    decimals: Union[int, List[Optional[int]], None] = None,
+    thousands_separator: str = ",",
+    decimal_separator: str = ".",
+    alignments: Union[str, List[Optional[str]], None] = None,
+    style: Optional[str] = "Table Grid",
+    font_size: Optional[int] = None,
+    repeat_header: bool = False,
+    max_rows: Optional[int] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Tuple[object, Dict]:
+    """
+    Crear una tabla al final del documento con los datos de un CSV o .npy leidos por
+    bloques de chunk_rows filas: cada bloque se formatea por columnas y se agrega a la
+    tabla antes de leer el siguiente. En modo streaming las filas se escriben al archivo
+    con cada bloque, de modo que la memoria no depende del tamano de los datos.
+
+    Las columnas numericas (decididas con el primer bloque) se alinean a la derecha y se
+    formatean con decimales fijos (por defecto 0 si son enteras y 2 si no) y separador de
+    miles. Retorna (tabla, estadisticas). Si falla, la tabla parcial se quita del documento
+    (salvo en modo streaming, donde ya se escribio).
+    """
+    if chunk_rows < 1:
+        raise ValueError("chunk_rows debe ser mayor que cero")
+    if thousands_separator and thousands_separator == decimal_separator:
+        raise ValueError("thousands_separator y decimal_separator deben ser distintos")
+
+    data = open_source(path, delimiter, has_header)
+    table = None
+    try:
+        cols = data.cols
+        header_row = headers or data.headers
+        if header_row is not None and len(header_row) != cols:
+            raise ValueError(f"Se recibieron {len(header_row)} encabezados pero los datos tienen {cols} columnas")
+        if repeat_header and header_row is None:
+            raise ValueError("repeat_header requiere una fila de encabezado")
+        if isinstance(decimals, (list, tuple)) and len(decimals) != cols:
+            raise ValueError(f"Se recibieron {len(decimals)} valores de decimals pero los datos tienen {cols} columnas")
+
+        streaming = is_streaming(document)
+        table = build_table(document, header_row, (), style, font_sizes=font_size, cols=cols)
+        if repeat_header:
+            # El encabezado se repite al inicio de cada pagina
+            table._tbl.tr_lst[0].insert(0, parse_xml(_TBL_HEADER))
+
+        formats = None
+        column_alignments = alignments
+        rows = chunks = 0
+        for columns in data.chunks(chunk_rows):
+            if max_rows is not None:
+                columns = [column[: max_rows - rows] for column in columns]
+            if formats is None:
+                formats = detect_formats(columns, decimals)
+                if column_alignments is None:
+                    column_alignments = ["RIGHT" if f.numeric else None for f in formats]
+            chunk = format_chunk(columns, formats, thousands_separator, decimal_separator)
+            if streaming:
+                # Las filas se escriben directamente al archivo, sin construir sus elementos
+                document.write_rows(table._tbl, rows_xml(table, chunk, alignments=column_alignments, font_sizes=font_size))
+            else:
+                append_rows(table, chunk, alignments=column_alignments, font_sizes=font_size)
+            rows += len(chunk)
+            chunks += 1
+            if max_rows is not None and rows >= max_rows:
+                break
+
+        numeric = [
+            (header_row[i] if header_row is not None else i)
+            for i, column_format in enumerate(formats or ()) if column_format.numeric
+        ]
+        return table, {"rows": rows, "cols": cols, "chunks": chunks, "numeric_columns": numeric}
+    except Exception:
+        if table is not None and not is_streaming(document) and table._tbl.getparent() is not None:
+            table._tbl.getparent().remove(table._tbl)
+        raise
+    finally:
+        data.close()
@@ -0,0 +1,90 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Variables en formato {nombre_variable}
+PLACEHOLDER = re.compile(r"\{([^{}]*)\}")
+
+# Numero de templates compilados que se conservan en memoria
+TEMPLATE_CACHE_SIZE = int(os.environ.get("WORD_MCP_TEMPLATE_CACHE_SIZE", "256"))
+
+_MISSING = object()
+
+
+class CompiledTemplate:
+    """
+    Template dividido una sola vez en texto literal y variables, para renderizarlo
+    en una unica pasada. Las variables sin valor se dejan tal cual ({nombre}).
+    """
+
+    __slots__ = ("literals", "names")
+
+    def __init__(self, template: str):
+        pieces = PLACEHOLDER.split(template)
+        self.literals: List[str] = pieces[0::2]
+        self.names: List[str] = pieces[1::2]
+
+    @property
+    def variables(self) -> List[str]:
+        return list(dict.fromkeys(self.names))
+
+    def render(self, variables: Optional[Dict] = None) -> str:
+        variables = variables or {}
+        literals = self.literals
+        out = [literals[0]]
+        for i, name in enumerate(self.names, 1):
+            value = variables.get(name, _MISSING)
+            out.append("{" + name + "}" if value is _MISSING else str(value))
+            out.append(literals[i])
+        return "".join(out)
+
+
+class PromptCache:
+    """
+    Prompts leidos de <directorio>/<prompt_id>.json junto con su template compilado,
+    indexados por (mtime, tamano) del archivo: un archivo sin cambios no se vuelve a
+    leer ni a analizar.
+    """
+
+    def __init__(self, directory: str, max_entries: int = TEMPLATE_CACHE_SIZE):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[tuple, Dict, CompiledTemplate]]" = OrderedDict()
+
+    def path(self, prompt_id: str) -> str:
+        return os.path.join(self.directory, f"{prompt_id}.json")
+
+    def get(self, prompt_id: str) -> Tuple[Dict, CompiledTemplate]:
+        """Retorna (datos del prompt, template compilado); FileNotFoundError si no existe"""
+        path = self.path(prompt_id)
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._entries.get(prompt_id)
+            if cached is not None and cached[0] == key:
+                self._entries.move_to_end(prompt_id)
+                self.hits += 1
+                return cached[1], cached[2]
+            self.misses += 1
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        compiled = CompiledTemplate(data.get("template", ""))
+
+        with self._lock:
+            self._entries[prompt_id] = (key, data, compiled)
+            self._entries.move_to_end(prompt_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data, compiled
+
+    def invalidate(self, prompt_id: str) -> None:
+        with self._lock:
+            self._entries.pop(prompt_id, None)
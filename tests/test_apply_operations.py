@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Recursos, prompts y diario del servidor en un directorio temporal
+os.environ["WORD_MCP_DATA_DIR"] = tempfile.mkdtemp(prefix="word-mcp-tests-")
+os.environ["WORD_MCP_JOURNAL"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+
+class ApplyOperationsTest(unittest.TestCase):
+    def setUp(self):
+        server.create_new_document()
+
+    def test_create_table_then_fill_cell_by_field_ref(self):
+        result = server.apply_operations([
+            {"op": "create_table", "args": {"rows": 2, "cols": 2}, "id": "tabla"},
+            {"op": "fill_table_cell", "args": {"table": {"$ref": "tabla", "field": "table_id"}, "row": 0, "col": 1, "content": "Total"}},
+            {"op": "fill_table_cell", "args": {"table": {"$ref": 0, "field": "table_id"}, "row": 1, "col": 0, "content": "10"}},
+        ])
+        self.assertEqual(result["failed"], 0, result)
+        table = server.get_document().tables[-1]
+        self.assertEqual(table.cell(0, 1).text, "Total")
+        self.assertEqual(table.cell(1, 0).text, "10")
+
+    def test_paragraph_ref_without_field(self):
+        result = server.apply_operations([
+            {"op": "add_paragraph", "args": {"content": "Creador: "}, "id": "autor"},
+            {"op": "add_run_to_paragraph", "args": {"p": {"$ref": "autor"}, "content": "Juan Perez"}},
+        ])
+        self.assertEqual(result["failed"], 0, result)
+        self.assertEqual(server.get_document().paragraphs[-1].text, "Creador: Juan Perez")
+
+    def test_missing_field_fails_the_operation(self):
+        result = server.apply_operations([
+            {"op": "create_table", "args": {"rows": 1, "cols": 1}, "id": "tabla"},
+            {"op": "fill_table_cell", "args": {"table": {"$ref": "tabla", "field": "tabla"}, "row": 0, "col": 0, "content": "x"}},
+        ])
+        self.assertEqual(result["failed"], 1)
+        self.assertIn("no tiene el campo 'tabla'", result["results"][1]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()